@@ -1,358 +1,498 @@
 import streamlit as st
-import openpyxl
 import requests
-import json
 import pandas as pd
-from datetime import datetime
-import re
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-import googlemaps
+from datetime import datetime, time as dt_time, timedelta
+import time
+import uuid
+from dataclasses import asdict
 import google.generativeai as genai
-import folium
-from streamlit_folium import folium_static
-import polyline
 from streamlit_js_eval import streamlit_js_eval
+from studybudd.config import get_endpoint, get_setting, get_token_budget, load_credentials
+from studybudd.flashcards import build_deck, source_hash
+from studybudd.gemini_client import GeminiError, get_client as get_gemini_client
+from studybudd.llm_cache import CachedModel
+from studybudd.maps import DEFAULT_PIXEL_TOLERANCE, MAP_HEIGHT, MAP_WIDTH, places_map_html, route_map_html
+from studybudd.nearby import find_candidates, rank_by_travel_time
+from studybudd.normalize import normalize_plan
+from studybudd.bulk_import import extract_activities, extract_activity, parse_csv, parse_ics
+from studybudd.calendar_sync import CalendarSync
+from studybudd.intent import FIND_NEAREST, FIND_ROUTE, parse_intent
+from studybudd.places import validate_places
+from studybudd.question_library import split_questions
+from studybudd.plan_store import cell_text, diff_plan, rebase_updates
+from studybudd.scheduling import from_minutes, schedule_blocks, to_minutes
+from studybudd.streaming import iter_flashcards, iter_lines
+from studybudd.sync_jobs import ACTIVE as SYNC_ACTIVE
+from studybudd.tracing import TracedModel, get_tracer, set_context
+from studybudd.resources import (
+    calendar_batch_uri,
+    calendar_service,
+    configure_genai,
+    get_deck_store,
+    get_maps_client,
+    get_plan_store,
+    get_question_library,
+    get_response_cache,
+    get_sync_worker,
+)
 
 
 FILE_PATH = "StudyPlanner.xlsx"
+PAGE_SIZES = [50, 100, 250, 500]
+IPINFO_URL = get_endpoint("ipinfo") or "https://ipinfo.io/json"
+GEMINI_MODEL = "gemini-2.0-flash"
+GENERATION_CONFIG = {
+    "temperature": 0.3,
+    "topP": 1,
+    "maxOutputTokens": 256
+}
 
 # Set the page layout to wide    
 st.set_page_config(page_title="StudyBudd", layout="wide")
 
-# 📌 Function to call Gemini API
-def load_gemini_api_key():
-    try:
-        with open("credentials.json", "r") as file:
-            credentials = json.load(file)
-            return credentials.get("gemini_api_key", None)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return None  # Return None if file is missing or corrupted
+# Shared on-disk cache in front of every Gemini call
+response_cache = get_response_cache()
+
+# Study plan database; the workbook is imported into it on first run
+plan_store = get_plan_store(FILE_PATH)
+
+# Saved flashcard decks
+deck_store = get_deck_store()
+
+# Saved practice question sets and solutions
+question_library = get_question_library()
 
+# Timings of outbound calls and plan storage, shared by all sessions
+tracer = get_tracer()
+
+# 📌 Function to load the Google Calendar ID
 def load_calendar_id():
-    try:
-        with open("credentials.json", "r") as file:
-            calendar_data = json.load(file)
-            return calendar_data.get("calendar_id", None)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return None  # Return None if file is missing or corrupted
+    return load_credentials().get("calendar_id", None)
+
+# 📌 Function to call Gemini with a JSON response schema (safe to call from worker threads)
+def ask_gemini_json(input_text, response_schema, feature="default"):
+    generation_config = dict(
+        GENERATION_CONFIG,
+        maxOutputTokens=get_token_budget(feature),
+        responseMimeType="application/json",
+        responseSchema=response_schema
+    )
+    return response_cache.cached_call(
+        GEMINI_MODEL,
+        generation_config,
+        input_text,
+        lambda: get_gemini_client().generate(GEMINI_MODEL, input_text, generation_config)
+    )
 
-def load_google_maps_api_key():
+# 📌 Function to stream a Gemini answer with a per-feature output token budget
+def stream_gemini_api_key(input_text, feature):
+    generation_config = dict(GENERATION_CONFIG, maxOutputTokens=get_token_budget(feature))
+    chunks = response_cache.cached_stream(
+        GEMINI_MODEL,
+        generation_config,
+        input_text,
+        lambda: get_gemini_client().stream(GEMINI_MODEL, input_text, generation_config)
+    )
     try:
-        with open("credentials.json", "r") as file:
-            maps_data = json.load(file)
-            return maps_data.get("google_map_api_key", None)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return None  # Return None if file is missing or corrupted
-   
-def ask_gemini_api_key(input_text):
-    api_key = load_gemini_api_key()
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={api_key}"
-    
-    data = {
-        "contents": {
-            "role": "USER",
-            "parts": [{"text": input_text}]
-        },
-        "generation_config": {
-            "temperature": 0.3,
-            "topP": 1,
-            "maxOutputTokens": 256
-        }
-    }
-
-    headers = {"Content-Type": "application/json"}
-    
-    response = requests.post(url, headers=headers, data=json.dumps(data))
-    
-    if response.status_code == 200:
-        json_response = response.json()
-        return json_response["candidates"][0]["content"]["parts"][0]["text"]
-    else:
+        yield from chunks
+    except GeminiError as e:
+        print(f"Details: {e}")
         st.error("Error: API request failed")
-        return None
+
+# 📌 Function to render streamed text, sending LaTeX lines to st.latex
+def write_stream_with_latex(chunks):
+    lines = iter_lines(chunks)
+    written = []
+    latex_line = None
+
+    def text_block():
+        nonlocal latex_line
+        for line in lines:
+            written.append(line)
+            if "$" in line:  # Check if the line contains LaTeX math symbols
+                latex_line = line
+                return
+            yield line + "\n\n"
+
+    while True:
+        latex_line = None
+        st.write_stream(text_block())
+        if latex_line is None:
+            break
+        st.latex(latex_line.strip("$"))  # Render LaTeX
+    return "\n".join(written)
 
 # 📌 Function to extract study details
 def extract_study_details(user_input):
-    prompt = f"""
-    Summarize this study plan in plain text (no Markdown, no formatting). Provide details in this format:
-    
-    Event Name: [event]
-    Date: [date]
-    Time start: [time_start]
-    Time end: [time_end]
-    Time: [time]
-    Priority: [priority]
-    Notes: [notes]
-
-    If only the time start is provided, then set the time end to one hour after the time start.
-    Input: "{user_input}"
-    """
-
-    ai_response = ask_gemini_api_key(prompt)
-    if not ai_response:
+    # Typical phrasings are parsed locally; the rest take one Gemini call that also resolves the date
+    try:
+        return extract_activity(user_input, lambda prompt, schema: ask_gemini_json(prompt, schema))
+    except (GeminiError, ValueError) as e:
+        print(f"Details: {e}")
+        st.error("Error: API request failed")
         return None
 
-    lines = ai_response.split("\n")
-
-    event_info = {
-        "event_name": "",
-        "date": "",
-        "time_start": "",
-        "time_end": "",
-        "priority": "Medium",
-        "notes": "No additional notes"
-    }
-
-    for line in lines:
-        if ":" in line:
-            key, value = line.split(":", 1)
-            event_info[key.strip().lower().replace(" ", "_")] = value.strip()
-
-    # Format the date properly
-    event_info = get_formatted_date(event_info)
-
-    return event_info
 
-# 🎯 Function to extract date in YYYY-MM-DD format from AI's response
-def extract_date_from_response(response):
-    # Match the date pattern YYYY-MM-DD
-    match = re.search(r"\d{4}-\d{2}-\d{2}", response)
-    return match.group(0) if match else None
-
-def get_formatted_date(event_info):
-    if event_info.get("date"):
-        # Get today's date in YYYY-MM-DD format
-        today = datetime.today().strftime("%Y-%m-%d")
-        
-        # Create the prompt for AI model
-        date_prompt = f"Today is {today}. What is the exact date for '{event_info['date']}'? Respond with only the date in YYYY-MM-DD format."
-        
-        # Get AI's response
-        ai_response = ask_gemini_api_key(date_prompt)
-        
-        if ai_response:
-            # Extract the date in YYYY-MM-DD format from AI's response
-            match = extract_date_from_response(ai_response)
-            if match:
-                event_info["date"] = match
-                print(f"Updated Event Info: {event_info}")
-            else:
-                print("AI response did not contain a valid date.")
-        else:
-            print("Failed to get a valid response from the AI.")
-    return event_info
-
-
-# 📌 Function to add the event to the Study_Plan sheet
+# 📌 Function to add the event to the study plan
 def add_to_study_plan(event_name, event_date, event_time_start, event_time_end, priority, notes):
-    wb = openpyxl.load_workbook(FILE_PATH)
+    # SQLite allocates the next ID, so this is a single row insert
+    return plan_store.add(event_name, event_date, event_time_start, event_time_end, priority, notes)
 
-    # Get the 'Study_Plan' sheet
-    study_plan_sheet = wb["Study_Plan"]
-
-    # Check if the sheet is empty or just has headers
-    if study_plan_sheet.max_row == 1:  # Only header exists
-        next_row = 2  # Start from the second row for data
-        last_id_number = 1
-    else:
-        last_row = 1
-        # Manually determine the next row by checking non-empty cells in the first column
-        for row in range(study_plan_sheet.max_row, 1, -1):  # Loop backwards from max_row
-            if study_plan_sheet.cell(row=row, column=1).value is not None:
-                last_row = row
-                break
-        next_row = last_row + 1  # Append after the last non-empty row
-
-        # Extract the last ID number and increment it
-        last_id_cell = study_plan_sheet.cell(row=last_row, column=1).value
-        if last_id_cell and last_id_cell.startswith("ID-"):
-            last_id_number = int(last_id_cell.split('-')[1]) + 1  # Increment the last ID
-        else:
-            last_id_number = 1  # If no valid ID is found, start at 1
-
-    # Generate the new ID
-    new_id = f"ID-{last_id_number}"
-
-    # Add the new entry to the sheet at the next available row
-    study_plan_sheet.append([
-        new_id,  # Insert the new ID at the start of the row
-        event_name,
-        event_date,
-        event_time_start,
-        event_time_end,
-        priority,
-        notes
-    ])
-
-    # Save the updated workbook
-    wb.save(FILE_PATH)
+# 📌 Function to warn when activities overlap ones already in the plan
+def show_conflicts(rows, limit=10):
+    conflicts = plan_store.intervals().conflicts(rows)
+    if not conflicts:
+        return
+    existing = plan_store.load_ids(sorted({plan_id for others in conflicts.values() for plan_id in others}))
+    labels = {
+        row["ID"]: f"{row['Event']} ({row['Date']} {row['Time Start']}-{row['Time End']})"
+        for _, row in existing.iterrows()
+    }
+    names = dict(zip(rows["ID"], rows["Event"]))
+    st.warning(f"⚠️ {len(conflicts)} activit{'y overlaps' if len(conflicts) == 1 else 'ies overlap'} existing plans:")
+    for row_id, others in list(conflicts.items())[:limit]:
+        st.caption(f"{names.get(row_id) or row_id} overlaps " + ", ".join(labels.get(plan_id, plan_id) for plan_id in others[:5]))
+
+# 📌 Cached reads of the study plan; the store's version changes on every write
+@st.cache_data(max_entries=64, show_spinner=False)
+def load_plan_page(version, start_date, end_date, priorities, text, page, page_size):
+    return plan_store.query(start_date, end_date, list(priorities), text, limit=page_size, offset=page * page_size)
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def load_full_plan(version):
+    return plan_store.load()
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def load_priorities(version):
+    return plan_store.priorities()
+
+# 📌 Function to check whether the plan editor holds edits other than ticked rows
+def has_unsaved_edits(editor_key):
+    state = st.session_state.get(editor_key) or {}
+    edited_cells = [set(cells) - {"Select"} for cells in state.get("edited_rows", {}).values()]
+    return bool(state.get("added_rows") or state.get("deleted_rows") or any(edited_cells))
 
 # 📌 Function to display study plan in Streamlit
 def display_study_plan():
-
-    # Load Study_Plan sheet into Pandas DataFrame
-    df = pd.read_excel(FILE_PATH, sheet_name="Study_Plan")
-
-    if df.empty:
+    # Bring in edits made in Google Calendar; with a stored sync token this is one small request
+    if time.time() - st.session_state.get("last_calendar_pull", 0) > get_setting("calendar_pull_interval", 60):
+        st.session_state.last_calendar_pull = time.time()
+        show_pull_result(pull_calendar_changes(), quiet=True)
+
+    version = plan_store.version()
+
+    st.write("📚 **Your Study Plan**")
+    if plan_store.duplicate_ids:
+        st.warning(f"⚠️ {FILE_PATH} repeats {', '.join(plan_store.duplicate_ids)}; the repeated rows were imported with new IDs.")
+
+    # Filters run in SQLite, so only the visible page reaches the editor
+    col1, col2, col3 = st.columns([2, 2, 3])
+    with col1:
+        date_range = st.date_input("Date range", value=(), format="YYYY-MM-DD")
+    with col2:
+        priorities = st.multiselect("Priority", load_priorities(version))
+    with col3:
+        search = st.text_input("Search events and notes")
+    start_date = date_range[0].isoformat() if len(date_range) > 0 else None
+    end_date = date_range[1].isoformat() if len(date_range) > 1 else None
+    filters = (start_date, end_date, tuple(priorities), search.strip())
+
+    col4, col5 = st.columns([1, 1])
+    with col5:
+        page_size = st.selectbox("Rows per page", PAGE_SIZES)
+    if st.session_state.get("plan_filters") != (filters, page_size):
+        # New filters start again from the first page
+        st.session_state.plan_filters = (filters, page_size)
+        st.session_state.plan_page = 1
+    page = st.session_state.get("plan_page", 1)
+    page_df, total = load_plan_page(version, *filters, page - 1, page_size)
+    pages = max(1, -(-total // page_size))
+    if page > pages:
+        page = st.session_state.plan_page = pages
+        page_df, total = load_plan_page(version, *filters, page - 1, page_size)
+    with col4:
+        st.number_input("Page", min_value=1, max_value=pages, key="plan_page")
+
+    if total == 0 and not any(filters):
         st.warning("No study plan data available!")
-    else:
-        st.write("📚 **Your Study Plan**")
-         # Add a checkbox column for selecting events
-        df["Select"] = False  # Add a default column for selection
+        return
 
-        # Use Streamlit's experimental data editor for direct editing
-        # edited_df = st.data_editor(df, num_rows="dynamic", key="editable_table", use_container_width=True)
-        edited_df = st.data_editor(df, num_rows="dynamic", key="editable_table")
+    # Ticked rows are remembered by ID, so the selection survives paging and filtering
+    selected = st.session_state.setdefault("selected_plan_ids", set())
+    # Keyed on the page and filters only, so writes made elsewhere do not discard edits in progress
+    editor_key = f"editable_table_{page}_{page_size}_{abs(hash(filters))}"
+    snapshot = st.session_state.get("plan_page_snapshot")
+    if snapshot is None or snapshot[0] != editor_key or (snapshot[1] != version and not has_unsaved_edits(editor_key)):
+        # The editor resets whenever its input changes, so it keeps the rows it started
+        # from until its edits are saved; the Select column comes from the remembered selection
+        page_df = page_df.copy()
+        # Add a checkbox column for selecting events
+        page_df["Select"] = page_df["ID"].isin(selected)
+        snapshot = st.session_state.plan_page_snapshot = (editor_key, version, page_df)
+    _, loaded_version, page_df = snapshot
+    if loaded_version != version:
+        st.caption("The plan has changed since this page was loaded; saving keeps those changes in cells you have not edited.")
+
+    # Use Streamlit's experimental data editor for direct editing
+    edited_df = st.data_editor(page_df, num_rows="dynamic", key=editor_key)
+    for plan_id, ticked in zip(edited_df["ID"], edited_df["Select"]):
+        if isinstance(plan_id, str) and plan_id:
+            if ticked:
+                selected.add(plan_id)
+            else:
+                selected.discard(plan_id)
+    st.caption(f"{total} events · page {page} of {pages} · {len(selected)} selected")
+    page_edits = edited_df.drop(columns=["Select"])
+
+    # Buttons for syncing events; they send the saved plan, not edits still in the editor
+    if has_unsaved_edits(editor_key):
+        st.caption("Save your changes first to include them in a sync.")
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("Sync Selected Events"):
+            # Selected rows from every page
+            selected_events = plan_store.load_ids(sorted(selected))
+            if not selected_events.empty:
+                # Runs on the background worker; the rows are snapshotted with the job
+                st.session_state.sync_job_id = sync_worker.submit(selected_events, "Selected events")
+            else:
+                st.warning("⚠️ No events selected for syncing.")
 
-        # Buttons for syncing events
-        col1, col2 = st.columns(2)
-        with col1:
-            if st.button("Sync Selected Events"):
-                # Filter selected rows
-                selected_events = edited_df[edited_df["Select"] == True]
-                if not selected_events.empty:
-                    sync_with_google_calendar(selected_events)
-                    st.success("✅ Selected events synced successfully!")
-                else:
-                    st.warning("⚠️ No events selected for syncing.")
+    with col2:
+        if st.button("Sync All Events"):
+            st.session_state.sync_job_id = sync_worker.submit(load_full_plan(version), "All events")
 
-        with col2:
-            if st.button("Sync All Events"):
-                sync_with_google_calendar(edited_df)
-                st.success("✅ All events synced successfully!")
-        
-        # Save changes button
-        if st.button("Save Changes"):
-            # Save the edited DataFrame back to the Excel file
-            edited_df.to_excel(FILE_PATH, sheet_name="Study_Plan", index=False)
-            st.success("✅ Changes saved successfully!")
-                # Display the calendar view below
+    show_sync_jobs()
+    
+    # Save changes button
+    if st.button("Save Changes"):
+        # Only write the rows on this page that were inserted, edited or deleted
+        original = page_df.drop(columns=["Select"])
+        inserted, updated, deleted = diff_plan(original, page_edits)
+        if loaded_version != plan_store.version():
+            # Apply the edited cells on top of the rows as they are now
+            updated = rebase_updates(original, updated, plan_store.load_ids(list(updated["ID"])))
+        plan_store.apply_changes(inserted, updated, deleted)
+        selected.difference_update(deleted)
+        # The next run starts the editor from the saved rows
+        st.session_state.plan_page_snapshot = None
+        st.success(f"✅ Changes saved successfully! ({len(inserted)} added, {len(updated)} updated, {len(deleted)} deleted)")
+
+    # Excel is only an interchange format now
+    if st.button("Export to Excel"):
+        plan_store.export_xlsx(FILE_PATH)
+        st.success(f"✅ Study plan exported to {FILE_PATH}")
+
+
+# 📌 Function to ask Gemini for a time the local parser could not read (safe to call from worker threads)
+def ask_time_conversion(time_text):
+    time_prompt = f"Convert the time '{time_text}' to ISO 8601 format. Respond with only the time in HH:MM:SS format."
+    return response_cache.cached_call(
+        GEMINI_MODEL, GENERATION_CONFIG, time_prompt,
+        lambda: get_gemini_client().generate(GEMINI_MODEL, time_prompt, GENERATION_CONFIG)
+    )
 
+# 📌 Function to write normalized Date/Time values back to the study plan
+def save_normalized_rows(df, original):
+    # Rows saved again since the sync read them keep their newer values
+    columns = ["ID", "Date", "Time Start", "Time End"]
+    plan_store.update_rows(df[columns], expected=original[columns])
+
+# 📌 Function to summarize a calendar sync in Streamlit
+def show_sync_result(result):
+    st.caption(f"{result['inserted']} added, {result['updated']} updated, {result['skipped']} unchanged")
+    for plan_id, error in result["failed"]:
+        st.warning(f"⚠️ {plan_id}: {error}")
+
+# 📌 Function to poll a running sync job; only this fragment reruns while it is active
+@st.fragment(run_every=1)
+def show_sync_progress(job_id):
+    job = sync_worker.jobs.get(job_id)
+    if job["status"] not in SYNC_ACTIVE:
+        # Redraw the page once so polling stops and the result is shown
+        st.rerun()
+    st.progress(job["done"] / max(job["total"], 1), text=f"Syncing {job['label']}: {job['done']}/{job['total']} rows")
+    if job["cancel_requested"]:
+        st.caption("Cancelling after the current chunk...")
+    elif st.button("Cancel Sync"):
+        sync_worker.cancel(job_id)
+
+# 📌 Function to summarize a finished sync job
+def show_sync_job_result(job):
+    if job["status"] == "done":
+        st.success(f"✅ {job['label']} synced successfully!")
+    elif job["status"] == "cancelled":
+        st.warning(f"⚠️ Sync cancelled after {job['done']}/{job['total']} rows.")
+    else:
+        st.error(f"❌ Sync stopped after {job['done']}/{job['total']} rows. Details: {job['error']}")
+    show_sync_result({
+        "inserted": job["inserted"],
+        "updated": job["updated"],
+        "skipped": job["skipped"],
+        "failed": sync_worker.jobs.failures(job["id"]),
+    })
+
+# 📌 Function to show this session's sync job and recent jobs that can be resumed
+def show_sync_jobs():
+    job_id = st.session_state.get("sync_job_id")
+    job = sync_worker.jobs.get(job_id) if job_id else None
+    if job and job["status"] in SYNC_ACTIVE:
+        show_sync_progress(job_id)
+    elif job:
+        show_sync_job_result(job)
+
+    recent_jobs = sync_worker.jobs.recent()
+    if recent_jobs:
+        with st.expander("Recent calendar syncs"):
+            for recent in recent_jobs:
+                col1, col2 = st.columns([4, 1])
+                col1.write(f"#{recent['id']} {recent['label']}: {recent['status']}, {recent['done']}/{recent['total']} rows, {recent['failed']} failed")
+                # Cancelled or failed jobs continue from their first pending row
+                if recent["status"] in ("cancelled", "failed") and recent["done"] < recent["total"]:
+                    if col2.button("Resume", key=f"resume_sync_{recent['id']}"):
+                        sync_worker.resume(recent["id"])
+                        st.session_state.sync_job_id = recent["id"]
+                        st.rerun()
 
 # 📌 Function to sync events with Google Calendar
 def sync_with_google_calendar(df):
-    # Authenticate with Google Calendar API
-    credentials = service_account.Credentials.from_service_account_file(
-        "google_credentials.json",
-        scopes=["https://www.googleapis.com/auth/calendar"]
-    )
     calendarID = load_calendar_id()
-    service = build("calendar", "v3", credentials=credentials)
 
-    # Loop through the DataFrame and add events to the specified calendar
-    for index, row in df.iterrows():
+    # Runs on the sync worker, so Gemini failures are reported on the job's rows rather than with st.error
+    unreadable = {}
+    def time_fallback(time_text):
         try:
-            # Validate and format the date and time
-            event_date = pd.to_datetime(row["Date"]).strftime("%Y-%m-%d")
-            
-            # Prompt AI to convert the time to ISO 8601 format
-            time_start_prompt = f"Convert the time '{row['Time Start']}' to ISO 8601 format. Respond with only the time in HH:MM:SS format."
-            event_time_start = ask_gemini_api_key(time_start_prompt).replace("\n", "")
-
-            # Prompt AI to convert the time to ISO 8601 format
-            time_end_prompt = f"Convert the time '{row['Time End']}' to ISO 8601 format. Respond with only the time in HH:MM:SS format."
-            event_time_end = ask_gemini_api_key(time_end_prompt).replace("\n", "")
-
-            if not event_time_start or not event_time_end:
-                raise ValueError(f"Missing time for event: {row['Event']}")
-                
-            # Construct the event object
-            event = {
-                "summary": row["Event"],
-                "description": row.get("Notes", ""),  # Optional field
-                "start": {
-                    "dateTime": f"{event_date}T{event_time_start}",
-                    "timeZone": "Asia/Kuala_Lumpur",  # Set to Malaysia timezone
-                },
-                "end": {
-                    "dateTime": f"{event_date}T{event_time_end}",
-                    "timeZone": "Asia/Kuala_Lumpur",  # Set to Malaysia timezone
-                },
-            }
-            # Debug: Print the event data being sent
-            print("Syncing event:", event)
-
-            # Insert the event into Google Calendar
-            service.events().insert(calendarId=calendarID, body=event).execute()
-            print(f"Event synced successfully: {row['Event']}")
-
-        except Exception as e:
+            return ask_time_conversion(time_text)
+        except GeminiError as e:
             print(f"Details: {e}")
+            unreadable[time_text] = str(e)
+            return None
+
+    # Normalize Date/Time columns locally; Gemini only sees each unparseable value once
+    original = df
+    df, changed = normalize_plan(df, time_fallback=time_fallback)
+    # Store ISO values back so later syncs skip normalization
+    save_normalized_rows(df[changed], original[changed])
+
+    # Rows with a time Gemini could not convert are not sent
+    failed = []
+    keep = pd.Series(True, index=df.index)
+    for column in ("Time Start", "Time End"):
+        texts = original[column].map(cell_text)
+        unconverted = keep & texts.isin(list(unreadable))
+        failed.extend(
+            (plan_id, f"Could not convert {column} '{text}': {unreadable[text]}")
+            for plan_id, text in zip(df.loc[unconverted, "ID"], texts[unconverted])
+        )
+        keep &= ~unconverted
+    df = df[keep]
+
+    # Upsert in batches; unchanged rows are skipped and re-syncs update in place
+    with calendar_service() as service:
+        result = CalendarSync(service, calendarID, batch_uri=calendar_batch_uri()).sync(df)
+    result["failed"] = failed + result["failed"]
+    print(f"Calendar sync: {result['inserted']} inserted, {result['updated']} updated, {result['skipped']} unchanged")
+    for plan_id, error in result["failed"]:
+        print(f"Details: {plan_id}: {error}")
+    return result
+
+# 📌 Function to merge changes made in Google Calendar into the study plan
+def pull_calendar_changes(import_new=False):
+    try:
+        with calendar_service() as service:
+            calendar_sync = CalendarSync(service, load_calendar_id(), batch_uri=calendar_batch_uri())
+            result = calendar_sync.pull(plan_store)
+            if import_new:
+                # Events created in the calendar itself are only added when asked for
+                result["added"] = calendar_sync.import_events(plan_store)
+            return result
+    except Exception as e:
+        print(f"Details: calendar pull failed: {e}")
+        return None
+
+# 📌 Function to summarize a calendar pull in Streamlit
+def show_pull_result(result, quiet=False):
+    if result is None:
+        if not quiet:
+            st.error("❌ Could not fetch changes from Google Calendar.")
+        return
+    changed = result["updated"] + result["added"] + result["deleted"]
+    if changed or not quiet:
+        st.info(
+            f"📥 From Google Calendar: {result['updated']} updated, {result['added']} added, "
+            f"{result['deleted']} deleted, {result['kept']} kept (edited later in the plan)"
+        )
 
 # 📌 Function to display the Google Calendar
 def display_google_calendar():
     calendarID = load_calendar_id()
     st.subheader("📅 Google Calendar View")
 
+    # Only events changed since the last pull are fetched
+    if st.button("Pull Changes into Study Plan"):
+        st.session_state.last_calendar_pull = time.time()
+        show_pull_result(pull_calendar_changes(import_new=True))
+
     # Embed Google Calendar iframe
     calendar_url = f"https://calendar.google.com/calendar/embed?src={calendarID}&ctz=Asia/Kuala_Lumpur"
     st.components.v1.iframe(calendar_url, width=800, height=600)
 
 # 📌 Streamlit UI
-GOOGLE_MAPS_API_KEY = load_google_maps_api_key()
-gmaps = googlemaps.Client(key=GOOGLE_MAPS_API_KEY)
-genai.configure(api_key=load_gemini_api_key())
+# Clients are created once per process and shared across sessions
+gmaps = get_maps_client()
+configure_genai()
+sync_worker = get_sync_worker(sync_with_google_calendar)
 
-def find_nearest(model, user_location, use_current_location, user_input):
-    #place_type = model.generate_content(f"Answer me in the form in either 'Primary School', 'Secondary School', 'University', 'School', or 'Library' if any form mentioned in '{user_input}', else answer 'Invalid'")
+def find_nearest(model, intent, user_location):
     #place type validation
-    place_type = model.generate_content(f"is any education institution mentioned in '{user_input}'? (answer in form 'Primary School', 'Secondary School', 'University', 'School', or 'Library') else answer 'Invalid'")
-    if 'Invalid' in place_type.text:
+    if not intent.institution_type:
         st.error("Please enter valid types of education institution")
         return
 
-    if 'No' in use_current_location.text:
-            latitude, longitude = user_location.split(",")
+    if intent.uses_current_location:
+        latitude, longitude = user_location.split(",")
     else:
-        result = gmaps.geocode(f"{user_location.text}")
+        result = gmaps.geocode(user_location)
+        if not result:
+            st.error(f"❌ Could not find '{user_location}' on the map.")
+            return
         latitude = result[0]["geometry"]["location"]["lat"]
         longitude = result[0]["geometry"]["location"]["lng"]
 
-        
     if user_location:
         try:
-            # Google Places API: Find nearest places
-            places = gmaps.places_nearby(location= f"{latitude}, {longitude}", radius=5000, type=place_type.text.strip('\n').lower().replace(" ", "_"))
-            
-            if places['results']:
-                st.subheader(f"Nearest {place_type.text.strip()}(s) :")
-                m = folium.Map(location = [latitude, longitude], zoom_start=14)
-                
-                folium.TileLayer(
-                    tiles='https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}',
-                    attr='Esri',
-                    name='Satellite',
-                ).add_to(m)
-                
-                folium.TileLayer('OpenStreetMap').add_to(m)
-                place_list = []
-                
-                for place in places['results']:  # Show top 5 places
-                    if len(place_list) == 5:
-                        break
-                    
-                    name = place['name']                   
-                    is_valid = model.generate_content(f"Is '{name}' really is a {place_type.text.strip()}? (answer in form 'Yes' or 'No')")
-                    
-                    if 'No' in is_valid:
-                        pass
-                    else:
-                        lat = place['geometry']['location']['lat']
-                        lon = place['geometry']['location']['lng']
-                        st.write(f"📍 {name}")
-                        folium.Marker([lat, lon], tooltip=name, popup=name).add_to(m)      
-                        place_list.append(place)                           
-
-                # Add default OpenStreetMap layer (already has attribution)
-                folium.LayerControl().add_to(m)
-
-                folium_static(m)
+            # Google Places API: all result pages, widening the radius until enough places are inside it
+            latitude, longitude = float(latitude), float(longitude)
+            candidates = find_candidates(gmaps, latitude, longitude, intent.place_type)
+
+            if candidates:
+                # The closest few are ordered by travel time with one Distance Matrix call
+                ranked = rank_by_travel_time(gmaps, latitude, longitude, candidates)
+                # Validate candidates concurrently (or in one batch prompt), keeping the ranked order
+                place_list = validate_places(
+                    model,
+                    ranked,
+                    intent.institution_type,
+                    batch=get_setting("validate_places_in_batch", False)
+                )
+                markers = tuple(
+                    (place['name'], place['geometry']['location']['lat'], place['geometry']['location']['lng'])
+                    for place in place_list  # Show top 5 places
+                )
 
                 # Gemini AI: briefly introduce each places
                 ai_response = model.generate_content(f"Introduce in detail among {', '.join([p['name'] for p in place_list])} in list form")
-                st.subheader("Places Description")
-                st.write(ai_response.text)
+
+                # Kept in session state so other widgets' reruns redraw without recomputing
+                st.session_state.locator_result = {
+                    "subheader": f"Nearest {intent.institution_type}(s) :",
+                    "places": [
+                        f"{place['name']} ({place['travel']})" if place.get("travel") else place['name']
+                        for place in place_list
+                    ],
+                    "map_html": places_map_html((latitude, longitude), markers),
+                    "description": ai_response.text,
+                }
 
             else:
                 st.error("❌ No nearby places found.")
@@ -361,224 +501,432 @@ def find_nearest(model, user_location, use_current_location, user_input):
             st.error(f"❌ Error: {e}")
     
     
-def find_route(model, user_location, user_input):
-    #place_type = model.generate_content(f"Answer me in the form 'Valid' if any education institution exists in google map mentioned in '{user_input}', else answer 'Invalid'")
+def find_route(intent, user_location):
     #Validation to make sure user input education institution and not the others 
-    place_type = model.generate_content(f"is any education institution exists in google map mentioned in '{user_input}'? (answer in form 'Valid' or 'Invalid')")
-    if 'Invalid' in place_type.text:
+    if not intent.destination:
         st.error("❌ Please enter valid types of education institution")
         return
     
-    #Get destination from user input
-    destination = model.generate_content(f"From '{user_input}', answer me the ending location only, no other word")
-    directions = gmaps.directions(user_location.text, destination.text, mode="driving")
+    directions = gmaps.directions(user_location, intent.destination, mode="driving")
         
     if directions:
         route = directions[0]['overview_polyline']['points']
-        decoded_route = polyline.decode(route)
-        
-        # Create a map centered on the route
-        m = folium.Map(location=[decoded_route[0][0], decoded_route[0][1]], zoom_start=14)
-        
-        folium.TileLayer(
-                    tiles='https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}',
-                    attr='Esri',
-                    name='Satellite',
-                ).add_to(m)
-                
-        folium.TileLayer('OpenStreetMap').add_to(m)
-        # Add the route to the map
-        folium.PolyLine(
-            locations=decoded_route,
-            color='blue',
-            weight=5
-        ).add_to(m)
-        
-        folium.LayerControl().add_to(m)
-        
+
+        # Simplified to the fitted zoom and cached per route, so long routes stay small
+        map_html, _, _ = route_map_html(route, get_setting("route_simplify_pixels", DEFAULT_PIXEL_TOLERANCE))
+
         # Display distance and duration
         distance = directions[0]['legs'][0]['distance']['text']
         duration = directions[0]['legs'][0]['duration']['text']
-        
-        st.success(f"✅ Route found! Distance: {distance}, Duration: {duration}")
-        folium_static(m)
+
+        st.session_state.locator_result = {
+            "success": f"✅ Route found! Distance: {distance}, Duration: {duration}",
+            "map_html": map_html,
+        }
     
     else:
         st.error("❌ No route found. Check your locations.")
 
+# 📌 Function to show the last locator result without rebuilding its map
+def show_locator_result():
+    result = st.session_state.get("locator_result")
+    if not result:
+        return
+    if result.get("success"):
+        st.success(result["success"])
+    if result.get("subheader"):
+        st.subheader(result["subheader"])
+    for name in result.get("places", []):
+        st.write(f"📍 {name}")
+    st.components.v1.html(result["map_html"], height=MAP_HEIGHT + 10, width=MAP_WIDTH)
+    if result.get("description"):
+        st.subheader("Places Description")
+        st.write(result["description"])
+
+# 📌 Function to show this session's outbound calls in the sidebar
+def show_performance_panel():
+    if not st.sidebar.checkbox("Show performance panel"):
+        return
+
+    session_records = tracer.records(session_id=st.session_state.trace_session_id)
+    rerun_records = [record for record in session_records if record.rerun_id == st.session_state.rerun_id]
+
+    st.sidebar.subheader("⏱️ Performance")
+    st.sidebar.caption(
+        f"This rerun: {len(rerun_records)} calls, {sum(record.latency for record in rerun_records):.2f}s"
+    )
+    if rerun_records:
+        st.sidebar.dataframe(
+            pd.DataFrame([{
+                "Service": record.service,
+                "Operation": record.operation,
+                "ms": round(record.latency * 1000),
+                "Status": record.status,
+                "Retries": record.retries,
+            } for record in rerun_records]),
+            hide_index=True,
+        )
+
+    if session_records:
+        # Which page is spending the time and quota this session
+        calls = pd.DataFrame([asdict(record) for record in session_records])
+        summary = calls.groupby(["flow", "service"], dropna=False).agg(
+            calls=("operation", "size"),
+            seconds=("latency", "sum"),
+            retries=("retries", "sum"),
+            errors=("errors", "sum"),
+            prompt_tokens=("prompt_tokens", "sum"),
+            output_tokens=("output_tokens", "sum"),
+        )
+        st.sidebar.write("This session by flow")
+        st.sidebar.dataframe(summary.round(3))
+
+    st.sidebar.download_button(
+        "Export JSONL", tracer.to_jsonl(session_records), file_name="studybudd_calls.jsonl", mime="application/jsonl"
+    )
+    st.sidebar.download_button(
+        "Export Prometheus metrics", tracer.to_prometheus(), file_name="studybudd_metrics.prom", mime="text/plain"
+    )
+
 # 📌 Streamlit UI
-st.title("📖 AI-Powered Study Planner")
-
-# Sidebar menu
-menu = st.sidebar.selectbox("Choose an option", ["View Study Plan", "Update Study Plan", "View Calendar", "Generate Practice Questions", "Generate Flashcards", "Locate Educational Institution"])
-
-if menu == "View Study Plan":
-    display_study_plan()
-
-elif menu == "Update Study Plan":
- # User input for event description
-    st.subheader("Add a New Study Activity")
-
-    # Text input for the user to describe their activity
-    user_input = st.text_area("Describe your activity (e.g., 'I have a math test tomorrow at 5 pm')", "")
-
-    # Button to process input and add to study plan
-    if st.button("Schedule Study Activity"):
-        if user_input:
-            study_details = extract_study_details(user_input)
-            if study_details:
-                # Add to the study plan
-                add_to_study_plan(
-                    study_details["event_name"],
-                    study_details["date"],
-                    study_details["time_start"],
-                    study_details["time_end"],
-                    study_details["priority"],
-                    study_details["notes"]
-                )
-                st.success("✅ Study activity scheduled successfully!")
-                # Display updated study plan
-                display_study_plan()
+def main():
+    st.title("📖 AI-Powered Study Planner")
+
+    # Sidebar menu
+    menu = st.sidebar.selectbox("Choose an option", ["View Study Plan", "Update Study Plan", "View Calendar", "Generate Practice Questions", "Generate Flashcards", "Locate Educational Institution"])
+
+    # Tag every outbound call in this rerun with the page it came from
+    st.session_state.setdefault("trace_session_id", uuid.uuid4().hex[:8])
+    st.session_state.rerun_id = st.session_state.get("rerun_id", 0) + 1
+    set_context(menu, st.session_state.trace_session_id, st.session_state.rerun_id)
+
+    if menu == "View Study Plan":
+        display_study_plan()
+
+    elif menu == "Update Study Plan":
+     # User input for event description
+        st.subheader("Add a New Study Activity")
+
+        # Text input for the user to describe their activity
+        user_input = st.text_area("Describe your activity (e.g., 'I have a math test tomorrow at 5 pm')", "")
+
+        # Button to process input and add to study plan
+        if st.button("Schedule Study Activity"):
+            if user_input:
+                study_details = extract_study_details(user_input)
+                if study_details:
+                    # Add to the study plan
+                    plan_id = add_to_study_plan(
+                        study_details["event_name"],
+                        study_details["date"],
+                        study_details["time_start"],
+                        study_details["time_end"],
+                        study_details["priority"],
+                        study_details["notes"]
+                    )
+                    st.success("✅ Study activity scheduled successfully!")
+                    show_conflicts(pd.DataFrame([{
+                        "ID": plan_id,
+                        "Event": study_details["event_name"],
+                        "Date": study_details["date"],
+                        "Time Start": study_details["time_start"],
+                        "Time End": study_details["time_end"],
+                    }]))
+                    # Display updated study plan
+                    display_study_plan()
+                else:
+                    st.error("❌ Failed to extract event details. Please try again.")
             else:
-                st.error("❌ Failed to extract event details. Please try again.")
-        else:
-            st.error("❌ Please provide a description of your study activity.")
-
-elif menu == "View Calendar":
-    display_google_calendar()
-
-elif menu == "Generate Practice Questions":
-    st.subheader("Generate Practice Questions")
-
-    # Text input for the user to provide a topic or prompt
-    topic_prompt = st.text_area("Enter a topic or prompt for generating practice questions", "")
-
-    # Button to generate practice questions
-    if st.button("Generate Questions"):
-        if topic_prompt:
-            # Create a prompt for the AI to generate practice questions
-            ai_prompt = f"""
-            Generate 5 practice questions based on the following topic or prompt:
-            "{topic_prompt}"
-            Provide the questions in plain text format, numbered from 1 to 5.
-            """
-            questions = ask_gemini_api_key(ai_prompt)
-
-            if questions:
-                # Store questions in session state to persist across interactions
-                st.session_state.questions = questions
-
-                # Render LaTeX for mathematical equations if present
-                st.write("### Practice Questions:")
-                for line in questions.split("\n"):
-                    if "$" in line:  # Check if the line contains LaTeX math symbols
-                        st.latex(line.strip("$"))  # Render LaTeX
-                    else:
-                        st.write(line)  # Render as plain text
+                st.error("❌ Please provide a description of your study activity.")
+
+        # Free time comes from the plan's interval index, not a scan of every row
+        st.subheader("Find Free Time")
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            finish_before = st.date_input("Finish before", value=datetime.today().date() + timedelta(days=7))
+        with col2:
+            min_hours = st.number_input("At least (hours)", min_value=0.5, max_value=12.0, value=2.0, step=0.5)
+        with col3:
+            day_start = st.time_input("Day starts", value=dt_time(8, 0))
+        with col4:
+            day_end = st.time_input("Day ends", value=dt_time(22, 0))
+        now = to_minutes(datetime.now().replace(second=0, microsecond=0))
+        # Start from the next half hour
+        horizon_start = now + (-now % 30)
+        horizon_end = to_minutes(finish_before)
+        day_window = (day_start.hour * 60 + day_start.minute, day_end.hour * 60 + day_end.minute)
+        if st.button("Find Free Slots"):
+            slots = plan_store.intervals().free_slots(horizon_start, horizon_end, int(min_hours * 60), *day_window)
+            if slots:
+                st.dataframe(pd.DataFrame(
+                    [(*from_minutes(start), from_minutes(end)[1], round((end - start) / 60, 2)) for start, end in slots[:50]],
+                    columns=["Date", "From", "To", "Hours"]
+                ), hide_index=True)
             else:
-                st.error("❌ Failed to generate practice questions. Please try again.")
-        else:
-            st.error("❌ Please provide a topic or prompt.")
-
-    # Button to show suggested solutions
-    if "questions" in st.session_state and st.session_state.questions:
-        if st.button("Show Suggested Solutions"):
-            # Create a prompt for the AI to generate solutions
-            solution_prompt = f"""
-            Provide detailed solutions for the following practice questions:
-            {st.session_state.questions}
-            """
-            solutions = ask_gemini_api_key(solution_prompt)
-
-            if solutions:
-                st.write("### Suggested Solutions:")
-                for line in solutions.split("\n"):
-                    if "$" in line:  # Check if the line contains LaTeX math symbols
-                        st.latex(line.strip("$"))  # Render LaTeX
+                st.warning(f"⚠️ No free {min_hours:g}-hour slot before {finish_before}.")
+
+        st.write("Schedule study blocks into free slots, High priority first:")
+        blocks = st.data_editor(
+            pd.DataFrame({"Event": ["Revision"], "Hours": [2.0], "Priority": ["High"], "Finish Before": [datetime.today().date() + timedelta(days=7)]}),
+            num_rows="dynamic",
+            column_config={
+                "Hours": st.column_config.NumberColumn(min_value=0.25, max_value=12.0, step=0.25),
+                "Priority": st.column_config.SelectboxColumn(options=["High", "Medium", "Low"]),
+                "Finish Before": st.column_config.DateColumn(format="YYYY-MM-DD"),
+            },
+            key="study_blocks",
+        )
+        if st.button("Schedule Blocks"):
+            blocks = blocks.dropna(subset=["Event", "Hours", "Finish Before"]).fillna({"Priority": "Medium"})
+            placed, unplaced = schedule_blocks(
+                plan_store.intervals(),
+                [
+                    {"Event": block["Event"], "Minutes": int(block["Hours"] * 60), "Priority": block["Priority"],
+                     "Deadline": to_minutes(block["Finish Before"])}
+                    for _, block in blocks.iterrows()
+                ],
+                horizon_start,
+                *day_window
+            )
+            for block in unplaced:
+                st.warning(f"⚠️ No free time for {block['Event']} before its deadline.")
+            # Reviewed and added below, like imported activities
+            st.session_state.bulk_rows = placed
+
+        # Many activities at once: review the extracted rows, then add them in one write
+        st.subheader("Bulk Import")
+        paste_tab, file_tab = st.tabs(["Paste text", "Upload CSV / ICS"])
+        with paste_tab:
+            bulk_text = st.text_area("One activity per line (e.g., a syllabus or semester schedule)", "", height=200)
+            if st.button("Extract Activities"):
+                if bulk_text.strip():
+                    progress = st.progress(0.0, text="Extracting activities...")
+                    rows, failed = extract_activities(
+                        bulk_text,
+                        lambda prompt, schema: ask_gemini_json(prompt, schema, "bulk"),
+                        max_workers=get_setting("bulk_workers", 4),
+                        on_progress=lambda done, total: progress.progress(done / total, text=f"Extracted {done}/{total} batches")
+                    )
+                    if failed:
+                        st.warning(f"⚠️ {failed} line(s) could not be extracted.")
+                    st.session_state.bulk_rows = rows
+                else:
+                    st.error("❌ Please paste at least one activity.")
+        with file_tab:
+            uploaded = st.file_uploader("Timetable file", type=["csv", "ics"])
+            if uploaded is not None and st.button("Read File"):
+                # Files are parsed locally; Gemini is not called
+                try:
+                    parse = parse_ics if uploaded.name.lower().endswith(".ics") else parse_csv
+                    st.session_state.bulk_rows = parse(uploaded.getvalue())
+                except Exception as e:
+                    st.error(f"❌ Could not read {uploaded.name}. Details: {e}")
+
+        bulk_rows = st.session_state.get("bulk_rows")
+        if bulk_rows is not None:
+            if bulk_rows.empty:
+                st.info("No activities found.")
+            else:
+                st.write("#### Review and Add")
+                reviewed = st.data_editor(bulk_rows, num_rows="dynamic", use_container_width=True, key="bulk_editor")
+                show_conflicts(reviewed.assign(ID=[f"Row {i + 1}" for i in range(len(reviewed))]))
+                if st.button(f"Add {len(reviewed)} Activities"):
+                    added = plan_store.add_many(reviewed)
+                    st.session_state.bulk_rows = None
+                    st.success(f"✅ Added {len(added)} activities ({added[0]} to {added[-1]})." if added else "No activities added.")
+
+    elif menu == "View Calendar":
+        display_google_calendar()
+
+    elif menu == "Generate Practice Questions":
+        st.subheader("Generate Practice Questions")
+
+        # Text input for the user to provide a topic or prompt
+        topic_prompt = st.text_area("Enter a topic or prompt for generating practice questions", "")
+
+        # Button to generate practice questions
+        col1, col2 = st.columns(2)
+        with col1:
+            generate_clicked = st.button("Generate Questions")
+        with col2:
+            regenerate_clicked = st.button("Generate a New Set")
+        if generate_clicked or regenerate_clicked:
+            if topic_prompt:
+                # The same topic, however it is worded, is served from the library
+                set_id = None if regenerate_clicked else question_library.find(topic_prompt)
+                if set_id is not None:
+                    question_library.mark_opened(set_id)
+                else:
+                    # Create a prompt for the AI to generate practice questions
+                    ai_prompt = f"""
+                    Generate 5 practice questions based on the following topic or prompt:
+                    "{topic_prompt}"
+                    Provide the questions in plain text format, numbered from 1 to 5.
+                    """
+                    saved_id = question_library.find(topic_prompt) if regenerate_clicked else None
+                    if saved_id is not None:
+                        previous = "\n".join(question for question, _ in question_library.get(saved_id)[1])
+                        ai_prompt += f"Make them different from these earlier questions:\n{previous}\n"
+                    # Stream the questions in as they are generated
+                    st.write("### Practice Questions:")
+                    questions = write_stream_with_latex(stream_gemini_api_key(ai_prompt, "questions"))
+
+                    if questions.strip():
+                        set_id = question_library.save(topic_prompt, split_questions(questions))
                     else:
-                        st.write(line)  # Render as plain text
+                        st.error("❌ Failed to generate practice questions. Please try again.")
+                if set_id is not None:
+                    st.session_state.question_set_id = set_id
+                    st.rerun()
             else:
-                st.error("❌ Failed to generate solutions. Please try again.")
-
-
-elif menu == "Generate Flashcards":
-    st.subheader("Generate Flashcards")
-
-    # Text input for the user to provide a topic or content for flashcards
-    flashcard_prompt = st.text_area("Enter a topic or content to generate flashcards", "")
-
-    # Button to generate flashcards
-    if st.button("Generate Flashcards"):
-        if flashcard_prompt:
-            # Create a prompt for the AI to generate flashcards
-            ai_prompt = f"""
-            Generate 10 flashcards based on the following topic or content:
-            "{flashcard_prompt}"
-            Provide the flashcards in the format:
-            Question: [question]
-            Answer: [answer]
-            """
-            flashcards = ask_gemini_api_key(ai_prompt)
-
-            if flashcards:
-                # Parse the flashcards into a structured format
-                flashcard_list = []
-                invalid_cards = []
-                for card in flashcards.split("\n\n"):
-                    if "Question:" in card and "Answer:" in card:
-                        question = re.search(r"Question:\s*(.*)", card)
-                        answer = re.search(r"Answer:\s*(.*)", card)
-                        if question and answer:
-                            flashcard_list.append({
-                                "Question": question.group(1).strip(),
-                                "Answer": answer.group(1).strip()
-                            })
-                        else:
-                            invalid_cards.append(card)
+                st.error("❌ Please provide a topic or prompt.")
+
+        # Keyword search over every saved set
+        library_query = st.text_input("Search saved question sets", "")
+        if library_query.strip():
+            matches = question_library.search(library_query)
+            if matches:
+                set_labels = {
+                    set_id: f"{topic} ({count} questions, {solved} solved)" for set_id, topic, count, solved in matches
+                }
+                selected_set = st.selectbox("Matching sets", list(set_labels), format_func=set_labels.get)
+                if st.button("Open Set"):
+                    question_library.mark_opened(selected_set)
+                    st.session_state.question_set_id = selected_set
+            else:
+                st.info("No saved question sets match your search.")
+
+        question_set = question_library.get(st.session_state.question_set_id) if st.session_state.get("question_set_id") else None
+        if question_set:
+            set_id = st.session_state.question_set_id
+            topic, questions = question_set
+            st.write(f"### Practice Questions: {topic}")
+            for position, (question, solution) in enumerate(questions):
+                write_stream_with_latex([f"{position + 1}. {question}"])
+                # Solutions are generated once per question and kept in the library
+                if solution:
+                    with st.expander(f"Solution {position + 1}"):
+                        write_stream_with_latex([solution])
+                elif st.button(f"Show Solution {position + 1}", key=f"solution_{set_id}_{position}"):
+                    solution_prompt = f"""
+                    Provide a detailed solution for the following practice question:
+                    {question}
+                    """
+                    with st.expander(f"Solution {position + 1}", expanded=True):
+                        solution = write_stream_with_latex(stream_gemini_api_key(solution_prompt, "solutions"))
+                    if solution.strip():
+                        question_library.save_solution(set_id, position, solution)
                     else:
-                        invalid_cards.append(card)
-
-                # Display the flashcards
-                if flashcard_list:
-                    st.write("### Flashcards:")
-                    for i, card in enumerate(flashcard_list, start=1):
-                        with st.expander(f"Flashcard {i}: {card['Question']}"):
-                            st.write(f"**Answer:** {card['Answer']}")
-                else:
+                        st.error("❌ Failed to generate solutions. Please try again.")
+
+
+    elif menu == "Generate Flashcards":
+        st.subheader("Generate Flashcards")
+
+        # Text input for the user to provide a topic or content for flashcards
+        flashcard_prompt = st.text_area("Enter a topic or content to generate flashcards", "")
+
+        # Button to generate flashcards
+        if st.button("Generate Flashcards"):
+            if flashcard_prompt:
+                # Create a prompt for the AI to generate flashcards
+                ai_prompt = f"""
+                Generate 10 flashcards based on the following topic or content:
+                "{flashcard_prompt}"
+                Provide the flashcards in the format:
+                Question: [question]
+                Answer: [answer]
+                """
+                flashcards = stream_gemini_api_key(ai_prompt, "flashcards")
+
+                # Display each flashcard as soon as it has streamed in
+                st.write("### Flashcards:")
+                card_count = 0
+                for i, card in enumerate(iter_flashcards(iter_lines(flashcards)), start=1):
+                    with st.expander(f"Flashcard {i}: {card['Question']}"):
+                        st.write(f"**Answer:** {card['Answer']}")
+                    card_count = i
+
+                if card_count == 0:
                     st.error("❌ Failed to parse flashcards. Or try to use topics which are suitable for flashcards. Please try again.")
-
             else:
-                st.error("❌ Failed to generate flashcards. Please try again.")
-        else:
-            st.error("❌ Please provide a topic or content.")
+                st.error("❌ Please provide a topic or content.")
+
+        # Large decks: sections of the notes are generated in parallel and deduplicated
+        st.write("#### Build a Flashcard Deck")
+        deck_size = st.number_input("Number of flashcards", min_value=10, max_value=500, value=100, step=10)
+        if st.button("Build Deck"):
+            if flashcard_prompt:
+                digest = source_hash(flashcard_prompt, deck_size)
+                deck_id = deck_store.find(digest)
+                if deck_id is None:
+                    progress = st.progress(0.0, text="Generating flashcards...")
+                    cards, failed = build_deck(
+                        flashcard_prompt,
+                        deck_size,
+                        lambda prompt, schema: ask_gemini_json(prompt, schema, "deck"),
+                        max_workers=get_setting("deck_workers", 4),
+                        on_progress=lambda done, total: progress.progress(done / total, text=f"Generated {done}/{total} sections")
+                    )
+                    if failed:
+                        st.warning(f"⚠️ {failed} section(s) failed to generate.")
+                    if cards:
+                        title = flashcard_prompt.strip().splitlines()[0][:60]
+                        deck_id = deck_store.save(title, digest, cards)
+                st.session_state.deck_id = deck_id
+                if deck_id is None:
+                    st.error("❌ Failed to generate flashcards. Please try again.")
+            else:
+                st.error("❌ Please provide a topic or content.")
+
+        # Reopen a saved deck without regenerating it
+        saved_decks = deck_store.list_decks()
+        if saved_decks:
+            deck_labels = {deck_id: f"{title} ({count} cards)" for deck_id, title, count, _ in saved_decks}
+            selected_deck = st.selectbox("Saved decks", list(deck_labels), format_func=deck_labels.get)
+            if st.button("Open Deck"):
+                st.session_state.deck_id = selected_deck
+
+        if st.session_state.get("deck_id"):
+            deck_cards = deck_store.load(st.session_state.deck_id)
+            st.write(f"### Deck: {len(deck_cards)} flashcards")
+            st.dataframe(pd.DataFrame(deck_cards), use_container_width=True, hide_index=True)
+
+    elif menu == "Locate Educational Institution":
+        st.title("🧭 AI-Powered Educational Institution Locator")
+        st.write("Enter an educational institution related description, then AI will find it")
+
+        model = CachedModel(TracedModel(genai.GenerativeModel("gemini-1.5-flash")), response_cache)
+        user_input = st.text_input("Describe the educational institution related information to find nearest or route to it (etc. what are the nearest university from my location? \
+                                   What is the route from Rawang to university XXX ?)")
+        if st.button("Search") and user_input.strip() != "":
+            st.session_state.pop("locator_result", None)
+            # One structured call extracts mode, origin, destination and institution type
+            intent = parse_intent(model, user_input)
+
+            if not intent.valid:
+                st.error("❌ The input is unable to be process, please ask question related to finding nearest educational institution or route to it")
+            else:
+                #Obtaining user current location
+                if intent.uses_current_location:
+                    with tracer.span("ipinfo", "lookup") as call:
+                        response = requests.get(IPINFO_URL, timeout=10)
+                        call.status = response.status_code
+                    result = response.json()
+                    user_location = result['loc']   
+                else:
+                    #Getting user manual type in starting location
+                    user_location = intent.origin
 
-elif menu == "Locate Educational Institution":
-    st.title("🧭 AI-Powered Educational Institution Locator")
-    st.write("Enter an educational institution related description, then AI will find it")
-    
-    model = genai.GenerativeModel("gemini-1.5-flash")
-    user_input = st.text_input("Describe the educational institution related information to find nearest or route to it (etc. what are the nearest university from my location? \
-                               What is the route from Rawang to university XXX ?)")
-    #use_current_location = model.generate_content(f"answer me in the form 'Yes' or 'No', is '{user_input}' mention any starting location that exists in google map")
-    #Validation for getting starting location, either mentioned or user own location by default
-    use_current_location = model.generate_content(f"in '{user_input}', is there mentioned any location that exists in google map? (answer in form 'Yes' or 'No')")
-    if st.button("Search") and user_input.strip() != "":
-    
-    #Obtaining user current location
-        if 'No' in use_current_location.text:
-            response = requests.get('https://ipinfo.io/json')
-            result = response.json()
-            user_location = result['loc']   
-        else:
-            #Getting user manual type in starting location
-            user_location = model.generate_content(f"From '{user_input}', answer me the starting location only, no other word")
-        
-        #Mode validation to know what user want to find
-        mode = model.generate_content(f"answer me in the form 'Find Nearest', 'Find Route', or 'Invalid', from '{user_input}'")
-        
-        if 'Find Nearest' in mode.text:
-            find_nearest(model, user_location, use_current_location, user_input)
-        elif 'Find Route' in mode.text:
-            find_route(model, user_location, user_input)
-        elif 'Invalid' in mode.text:
-            st.error("❌ The input is unable to be process, please ask question related to finding nearest educational institution or route to it")
+                if intent.mode == FIND_NEAREST:
+                    find_nearest(model, intent, user_location)
+                elif intent.mode == FIND_ROUTE:
+                    find_route(intent, user_location)
+
+        show_locator_result()
+
+    show_performance_panel()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Offline benchmarks for StudyBudd against local fake Gemini, Maps and Calendar servers."""
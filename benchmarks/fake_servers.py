@@ -0,0 +1,466 @@
+"""Local stand-ins for the Gemini, Google Maps (plus ipinfo) and Calendar APIs.
+
+Each server answers just enough of its API for the app's flows, sleeps for a
+configurable latency, fails a configurable fraction of requests with 503, and
+counts requests and bytes so the benchmark can report outbound calls.
+
+Run standalone with `python -m benchmarks.fake_servers` to point a local
+`streamlit run app.py` at them (see the printed STUDYBUDD_*_ENDPOINT values).
+"""
+import argparse
+import hashlib
+import json
+import math
+import multiprocessing
+import random
+import re
+import threading
+import time
+from email import policy
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import polyline
+
+
+class CountingServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, handler, latency=0.0, error_rate=0.0, **options):
+        super().__init__(("127.0.0.1", 0), handler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.options = options
+        self.lock = threading.Lock()
+        self.state = {}
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.stats = {"requests": 0, "operations": 0, "errors": 0, "bytes_in": 0, "bytes_out": 0, "paths": {}}
+
+    def count(self, key, amount=1):
+        with self.lock:
+            self.stats[key] += amount
+
+    def count_path(self, name):
+        with self.lock:
+            self.stats["paths"][name] = self.stats["paths"].get(name, 0) + 1
+
+
+class CountingFile:
+    """Wraps a handler's rfile/wfile and counts the bytes that pass through."""
+
+    def __init__(self, file, on_bytes):
+        self._file = file
+        self._on_bytes = on_bytes
+
+    def read(self, *args):
+        data = self._file.read(*args)
+        self._on_bytes(len(data))
+        return data
+
+    def readline(self, *args):
+        data = self._file.readline(*args)
+        self._on_bytes(len(data))
+        return data
+
+    def write(self, data):
+        self._on_bytes(len(data))
+        return self._file.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.pending = {"bytes_in": 0, "bytes_out": 0}
+        self.rfile = CountingFile(self.rfile, lambda n: self._add_pending("bytes_in", n))
+        self.wfile = CountingFile(self.wfile, lambda n: self._add_pending("bytes_out", n))
+
+    def _add_pending(self, key, amount):
+        self.pending[key] += amount
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send(self, status, body, content_type="application/json", headers=None):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body)
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _control(self):
+        """`/__stats`, `/__reset` and `/__clear` are used by the benchmark runner, not counted."""
+        if self.path == "/__stats":
+            self._read_body()
+            with self.server.lock:
+                stats = json.dumps(self.server.stats)
+            self._send(200, stats)
+            return True
+        if self.path == "/__reset":
+            self._read_body()
+            self.server.reset()
+            self._send(200, {})
+            return True
+        if self.path == "/__clear":
+            self._read_body()
+            with self.server.lock:
+                self.server.state.clear()
+            self._send(200, {})
+            return True
+        return False
+
+    def _handle(self, method):
+        try:
+            if self._control():
+                return
+            self._serve(method)
+            # Exact wire bytes, so the runner can subtract them from the process I/O counters
+            self.server.count("bytes_in", self.pending["bytes_in"])
+            self.server.count("bytes_out", self.pending["bytes_out"])
+        finally:
+            self.pending = {"bytes_in": 0, "bytes_out": 0}
+
+    def _serve(self, method):
+        body = self._read_body()
+        self.server.count("requests")
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if random.random() < self.server.error_rate:
+            self.server.count("errors")
+            self._send(503, {"error": {"code": 503, "message": "Injected failure"}}, headers={"Retry-After": "0"})
+            return
+        self.route(method, urlparse(self.path), body)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PUT(self):
+        self._handle("PUT")
+
+    def do_PATCH(self):
+        self._handle("PATCH")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+
+# Gemini --------------------------------------------------------------------
+
+def _prompt_and_config(body):
+    payload = json.loads(body or b"{}")
+    contents = payload.get("contents") or {}
+    if isinstance(contents, list):
+        contents = contents[-1] if contents else {}
+    prompt = " ".join(part.get("text", "") for part in contents.get("parts", []))
+    config = payload.get("generationConfig") or payload.get("generation_config") or {}
+    return prompt, config
+
+
+def gemini_reply(prompt, config):
+    """Deterministic answers shaped like what each app prompt expects."""
+    schema = config.get("responseSchema") or config.get("response_schema")
+    if schema:
+        properties = schema.get("properties") or {}
+        if "mode" in properties:
+            quoted = re.search(r'"([^"]*)"', prompt)
+            if "route" in (quoted.group(1) if quoted else prompt).lower():
+                intent = {"mode": "Find Route", "origin": "Rawang", "destination": "Universiti Malaya",
+                          "institution_type": "University", "valid": True}
+            else:
+                intent = {"mode": "Find Nearest", "origin": None, "destination": None,
+                          "institution_type": "University", "valid": True}
+            return json.dumps(intent)
+        if "valid" in properties:
+            return json.dumps({"valid": True})
+        if schema.get("type", "").upper() == "ARRAY":
+            count = int((re.search(r"Generate (\d+)", prompt) or re.search(r"(\d+)", "10")).group(1))
+            seed = hashlib.md5(prompt.encode("utf-8")).hexdigest()[:6]
+            items = schema.get("items", {}).get("properties", {})
+            if "question" in items:
+                return json.dumps([{"question": f"Question {seed}-{i}?", "answer": f"Answer {i}"} for i in range(count)])
+            if "event_name" in items:
+                lines = re.findall(r"^\s*(\d+)\. (.*)$", prompt, re.MULTILINE)
+                return json.dumps([
+                    {"index": int(index), "event_name": text[:40], "date": "2025-05-01", "time_start": "17:00:00",
+                     "time_end": "18:00:00", "priority": "Medium", "notes": ""}
+                    for index, text in lines
+                ])
+            return json.dumps([])
+        return "{}"
+    if "json" in str(config.get("responseMimeType") or config.get("response_mime_type") or ""):
+        indexes = re.findall(r"^\s*(\d+)\. ", prompt, re.MULTILINE)
+        return json.dumps([{"index": int(index), "valid": True} for index in indexes])
+    if "Convert the time" in prompt:
+        return "17:00:00"
+    if "Introduce in detail" in prompt:
+        return "- A well known institution.\n" * 5
+    return "\n".join(f"{i}. Practice question {i} with $x^{i}$" for i in range(1, 6))
+
+
+class GeminiHandler(FakeHandler):
+    def route(self, method, url, body):
+        prompt, config = _prompt_and_config(body)
+        text = gemini_reply(prompt, config)
+        self.server.count("operations")
+        if ":streamGenerateContent" in url.path:
+            self.server.count_path("streamGenerateContent")
+            events = []
+            for start in range(0, len(text), 40):
+                chunk = {"candidates": [{"content": {"parts": [{"text": text[start:start + 40]}], "role": "model"}}]}
+                events.append(f"data: {json.dumps(chunk)}\r\n\r\n")
+            self._send(200, "".join(events), content_type="text/event-stream")
+            return
+        self.server.count_path("generateContent")
+        self._send(200, {
+            "candidates": [{"content": {"parts": [{"text": text}], "role": "model"}, "finishReason": "STOP", "index": 0}],
+            "usageMetadata": {"promptTokenCount": len(prompt) // 4, "candidatesTokenCount": len(text) // 4,
+                              "totalTokenCount": (len(prompt) + len(text)) // 4},
+        })
+
+
+# Maps and ipinfo -----------------------------------------------------------
+
+def _point_for(text):
+    digest = int(hashlib.md5(text.lower().encode("utf-8")).hexdigest()[:8], 16)
+    return 3.0 + (digest % 1000) / 2000, 101.4 + (digest // 1000 % 1000) / 2000
+
+
+class MapsHandler(FakeHandler):
+    PAGE_SIZE = 20
+
+    def route(self, method, url, body):
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        path = url.path
+        self.server.count("operations")
+        if path.endswith("/ipinfo/json"):
+            self.server.count_path("ipinfo")
+            self._send(200, {"ip": "127.0.0.1", "loc": "3.1390,101.6869", "city": "Kuala Lumpur"})
+        elif path.endswith("/geocode/json"):
+            self.server.count_path("geocode")
+            lat, lng = _point_for(query.get("address", ""))
+            self._send(200, {"status": "OK", "results": [{"formatted_address": query.get("address"),
+                                                          "geometry": {"location": {"lat": lat, "lng": lng}}}]})
+        elif path.endswith("/place/nearbysearch/json"):
+            self.server.count_path("places_nearby")
+            self._send(200, self._nearby(query))
+        elif path.endswith("/directions/json"):
+            self.server.count_path("directions")
+            self._send(200, self._directions(query))
+        elif path.endswith("/distancematrix/json"):
+            self.server.count_path("distance_matrix")
+            self._send(200, self._distance_matrix(query))
+        else:
+            self._send(404, {"status": "NOT_FOUND"})
+
+    def _nearby(self, query):
+        pages = self.server.options.get("nearby_pages", 3)
+        token = query.get("pagetoken")
+        page, location = (int(token.split(":")[0]), token.split(":", 1)[1]) if token else (0, query.get("location"))
+        lat, lng = (float(value) for value in location.split(","))
+        results = []
+        for i in range(self.PAGE_SIZE):
+            n = page * self.PAGE_SIZE + i
+            angle, distance = n * 2.4, 0.004 * (n + 1)
+            results.append({
+                "name": f"{query.get('type', 'place').replace('_', ' ').title()} {n + 1}",
+                "place_id": f"place-{n}",
+                "geometry": {"location": {"lat": lat + distance * math.sin(angle), "lng": lng + distance * math.cos(angle)}},
+            })
+        response = {"status": "OK", "results": results}
+        if page + 1 < pages:
+            response["next_page_token"] = f"{page + 1}:{location}"
+        return response
+
+    def _directions(self, query):
+        start = _point_for(query.get("origin", ""))
+        end = _point_for(query.get("destination", ""))
+        count = self.server.options.get("route_points", 500)
+        points = [
+            (start[0] + (end[0] - start[0]) * i / (count - 1) + 0.001 * math.sin(i / 5),
+             start[1] + (end[1] - start[1]) * i / (count - 1))
+            for i in range(count)
+        ]
+        return {"status": "OK", "routes": [{
+            "overview_polyline": {"points": polyline.encode(points)},
+            "legs": [{"distance": {"text": "24.1 km", "value": 24100}, "duration": {"text": "31 mins", "value": 1860}}],
+        }]}
+
+    def _distance_matrix(self, query):
+        origins = query.get("origins", "").split("|")
+        destinations = query.get("destinations", "").split("|")
+        rows = []
+        for origin in origins:
+            elements = []
+            for destination in destinations:
+                seconds = 120 + int(hashlib.md5(f"{origin}>{destination}".encode()).hexdigest()[:4], 16) % 1800
+                elements.append({"status": "OK", "duration": {"value": seconds, "text": f"{seconds // 60} mins"},
+                                 "distance": {"value": seconds * 10, "text": f"{seconds / 100:.1f} km"}})
+            rows.append({"elements": elements})
+        return {"status": "OK", "origin_addresses": origins, "destination_addresses": destinations, "rows": rows}
+
+
+# Calendar ------------------------------------------------------------------
+
+class CalendarHandler(FakeHandler):
+    EVENT_PATH = re.compile(r"/calendar/v3/calendars/([^/]+)/events(?:/([^/?]+))?")
+
+    def route(self, method, url, body):
+        if url.path.startswith("/batch/"):
+            self.server.count_path("batch")
+            self._batch(body)
+            return
+        status, payload = self.apply(method, url, body)
+        self._send(status, payload)
+
+    def apply(self, method, url, body):
+        """Apply one Calendar operation to the in-memory store."""
+        self.server.count("operations")
+        match = self.EVENT_PATH.match(url.path)
+        if not match:
+            return 404, {"error": {"code": 404}}
+        with self.server.lock:
+            events = self.server.state.setdefault("events", {})
+            changes = self.server.state.setdefault("changes", [])
+            event_id = match.group(2)
+            if method == "POST":
+                self.server.stats["paths"]["insert"] = self.server.stats["paths"].get("insert", 0) + 1
+                event = json.loads(body)
+                event_id = event.setdefault("id", hashlib.sha1(body).hexdigest())
+                if event_id in events:
+                    return 409, {"error": {"code": 409, "message": "The requested identifier already exists."}}
+            elif method == "PUT":
+                self.server.stats["paths"]["update"] = self.server.stats["paths"].get("update", 0) + 1
+                if event_id not in events:
+                    return 404, {"error": {"code": 404, "message": "Not Found"}}
+                event = dict(json.loads(body), id=event_id)
+            elif method == "PATCH":
+                self.server.stats["paths"]["patch"] = self.server.stats["paths"].get("patch", 0) + 1
+                if event_id not in events:
+                    return 404, {"error": {"code": 404, "message": "Not Found"}}
+                event = dict(events[event_id], **json.loads(body))
+            elif method == "DELETE":
+                self.server.stats["paths"]["delete"] = self.server.stats["paths"].get("delete", 0) + 1
+                if event_id not in events:
+                    return 404, {"error": {"code": 404, "message": "Not Found"}}
+                event = dict(events[event_id], status="cancelled")
+            elif method == "GET":
+                self.server.stats["paths"]["list"] = self.server.stats["paths"].get("list", 0) + 1
+                return self._list(parse_qs(url.query), events, changes)
+            else:
+                return 405, {"error": {"code": 405}}
+            now = time.time()
+            event["updated"] = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(now)) + f".{int(now % 1 * 1000):03d}Z"
+            events[event_id] = event
+            changes.append(event_id)
+            return 200, event
+
+    def _list(self, query, events, changes):
+        """events.list: with a syncToken only events changed since it, paged by maxResults."""
+        token = query.get("syncToken", [None])[0]
+        if token:
+            if not token.isdigit() or int(token) > len(changes):
+                return 410, {"error": {"code": 410, "message": "Sync token is no longer valid."}}
+            items = [events[event_id] for event_id in dict.fromkeys(changes[int(token):])]
+        else:
+            items = [event for event in events.values() if event.get("status") != "cancelled"]
+        offset = int(query.get("pageToken", ["0"])[0])
+        page_size = int(query.get("maxResults", ["250"])[0])
+        page = {"kind": "calendar#events", "items": items[offset:offset + page_size]}
+        if offset + page_size < len(items):
+            page["nextPageToken"] = str(offset + page_size)
+        else:
+            page["nextSyncToken"] = str(len(changes))
+        return 200, page
+
+    def _batch(self, body):
+        message = BytesParser(policy=policy.compat32).parsebytes(
+            b"Content-Type: " + self.headers["Content-Type"].encode("utf-8") + b"\r\n\r\n" + body
+        )
+        parts = []
+        for part in message.get_payload():
+            payload = part.get_payload()
+            head, _, inner_body = payload.partition("\r\n\r\n") if "\r\n\r\n" in payload else payload.partition("\n\n")
+            method, path = head.splitlines()[0].split(" ")[:2]
+            status, response = self.apply(method, urlparse(path), inner_body.encode("utf-8"))
+            content_id = part["Content-ID"].replace("<", "<response-", 1)
+            parts.append(
+                f"--batch_boundary\r\nContent-Type: application/http\r\nContent-ID: {content_id}\r\n\r\n"
+                f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\nContent-Type: application/json\r\n\r\n"
+                f"{json.dumps(response)}\r\n"
+            )
+        self._send(200, "".join(parts) + "--batch_boundary--", content_type="multipart/mixed; boundary=batch_boundary")
+
+
+HANDLERS = {"gemini": GeminiHandler, "maps": MapsHandler, "calendar": CalendarHandler}
+
+
+def start_servers(latency=0.0, error_rate=0.0, **options):
+    """Start all fake servers on background threads; returns {name: server}."""
+    servers = {}
+    for name, handler in HANDLERS.items():
+        server = CountingServer(handler, latency=latency, error_rate=error_rate, **options)
+        threading.Thread(target=server.serve_forever, name=f"fake-{name}", daemon=True).start()
+        servers[name] = server
+    return servers
+
+
+def endpoints(ports):
+    """STUDYBUDD_*_ENDPOINT values for servers listening on `ports`."""
+    maps = f"http://127.0.0.1:{ports['maps']}"
+    return {
+        "STUDYBUDD_GEMINI_ENDPOINT": f"http://127.0.0.1:{ports['gemini']}",
+        "STUDYBUDD_MAPS_ENDPOINT": maps,
+        "STUDYBUDD_IPINFO_ENDPOINT": f"{maps}/ipinfo/json",
+        "STUDYBUDD_CALENDAR_ENDPOINT": f"http://127.0.0.1:{ports['calendar']}",
+    }
+
+
+def _serve(ports_queue, latency, error_rate, options):
+    servers = start_servers(latency, error_rate, **options)
+    ports_queue.put({name: server.server_port for name, server in servers.items()})
+    threading.Event().wait()
+
+
+def start_in_process(latency=0.0, error_rate=0.0, **options):
+    """Run the servers in a child process so their I/O is not counted as the app's."""
+    context = multiprocessing.get_context("spawn")
+    ports_queue = context.Queue()
+    process = context.Process(target=_serve, args=(ports_queue, latency, error_rate, options), daemon=True)
+    process.start()
+    return process, ports_queue.get(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0)
+    args = parser.parse_args()
+    servers = start_servers(args.latency_ms / 1000, args.error_rate)
+    for name, value in endpoints({name: server.server_port for name, server in servers.items()}).items():
+        print(f"export {name}={value}")
+    threading.Event().wait()
+
+
+if __name__ == "__main__":
+    main()
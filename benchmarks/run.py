@@ -0,0 +1,342 @@
+"""Offline benchmark for the StudyBudd flows.
+
+Starts the fake Gemini, Maps and Calendar servers in a child process, points
+the app at them through STUDYBUDD_*_ENDPOINT, imports app.py in Streamlit's
+bare mode from a scratch directory and times each flow against seeded plans.
+
+    python -m benchmarks.run --sizes 10,1000,50000 --latency-ms 50 --check
+
+For every flow it reports wall time, outbound calls per service and the file
+bytes the process read/wrote (plan, cache and sync-state storage; stdout is
+silenced while measuring), and `--check` fails when benchmarks/thresholds.json
+is exceeded.
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import math
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from glob import glob
+from urllib.request import Request, urlopen
+
+from benchmarks.fake_servers import endpoints, start_in_process
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+THRESHOLDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "thresholds.json")
+DEFAULT_SIZES = [10, 100, 1000, 10000, 50000]
+SERVICES = ("gemini", "maps", "calendar")
+PRIORITIES = ["High", "Medium", "Low"]
+ADDS_PER_SIZE = 20
+BULK_ACTIVITIES = 100
+PULL_EDITS = 10
+
+EXTRACTION_INPUTS = [
+    "Math test tomorrow at 5 pm, high priority",
+    "Physics revision next Monday from 2 to 4",
+    "Group study for chemistry on Friday at 10am",
+    "Submit the history essay by 3 May, 9 pm",
+    "Biology quiz in two days at 8:30",
+    "Read chapter 4 of economics this Sunday afternoon",
+    "Programming lab next Wednesday 14:00 to 16:00",
+    "Review flashcards tonight at 9",
+    "Statistics assignment due 2025-06-01 noon",
+    "Library session on the 12th from 1 to 3 pm",
+]
+
+
+def read_process_io():
+    """(rchar, wchar) for this process, or (None, None) where /proc is unavailable."""
+    try:
+        with open("/proc/self/io") as f:
+            counters = dict(line.split(": ") for line in f.read().splitlines())
+        return int(counters["rchar"]), int(counters["wchar"])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+
+def seed_plan(path, size):
+    """Replace the plan with `size` generated rows, mixing ISO and free-text dates/times."""
+    rows = []
+    start = date(2025, 1, 6)
+    now = time.time()
+    for i in range(size):
+        day = start + timedelta(days=i % 365)
+        hour = 8 + i % 12
+        date_text = day.isoformat() if i % 4 else day.strftime("%d %B %Y")
+        time_start = f"{hour:02d}:00:00" if i % 3 else f"{hour % 12 or 12} {'pm' if hour >= 12 else 'am'}"
+        rows.append((f"Study session {i + 1}", date_text, time_start, f"{hour + 1:02d}:00:00",
+                     PRIORITIES[i % 3], f"Chapter {i % 20 + 1}", now))
+    with contextlib.closing(sqlite3.connect(path)) as conn, conn:
+        conn.execute("DELETE FROM plan")
+        conn.execute("DELETE FROM sqlite_sequence WHERE name = 'plan'")
+        conn.executemany(
+            "INSERT INTO plan (event, date, time_start, time_end, priority, notes, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+
+
+def clear_local_caches():
+    """Empty the LLM, geo and calendar-sync caches under .studybudd/."""
+    for path in glob(os.path.join(".studybudd", "*.db")):
+        with contextlib.closing(sqlite3.connect(path)) as conn, conn:
+            tables = [name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+            for table in tables:
+                if table != "sqlite_sequence":
+                    conn.execute(f'DELETE FROM "{table}"')
+
+
+class Bench:
+    def __init__(self, ports):
+        self.ports = ports
+        self.results = []
+
+    def _control(self, service, path):
+        request = Request(f"http://127.0.0.1:{self.ports[service]}{path}", data=b"", method="POST")
+        with urlopen(request, timeout=10) as response:
+            return json.loads(response.read() or b"{}")
+
+    def reset(self, clear_state=False):
+        for service in SERVICES:
+            self._control(service, "/__reset")
+            if clear_state:
+                self._control(service, "/__clear")
+
+    def measure(self, flow, fn, rows=None, ops=1):
+        """Run `fn` with stdout silenced and record wall time, outbound calls and storage I/O."""
+        self.reset()
+        read_before, written_before = read_process_io()
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            fn()
+        wall = time.perf_counter() - started
+        read_after, written_after = read_process_io()
+        stats = {service: self._control(service, "/__stats") for service in SERVICES}
+
+        result = {
+            "flow": flow,
+            "rows": rows,
+            "ops": ops,
+            "wall_seconds": round(wall, 4),
+            "calls": {service: stats[service]["requests"] for service in SERVICES},
+            "operations": {service: stats[service]["operations"] for service in SERVICES},
+            "injected_errors": sum(stats[service]["errors"] for service in SERVICES),
+            "network_bytes_sent": sum(stats[service]["bytes_in"] for service in SERVICES),
+            "network_bytes_received": sum(stats[service]["bytes_out"] for service in SERVICES),
+            "bytes_read": None,
+            "bytes_written": None,
+        }
+        if read_before is not None:
+            # Socket send/recv are not counted in rchar/wchar, so this is file I/O
+            result["bytes_read"] = read_after - read_before
+            result["bytes_written"] = written_after - written_before
+        self.results.append(result)
+        return result
+
+
+def load_app(workdir, ports, requests_per_minute):
+    """Import app.py from `workdir` with credentials and endpoints for the fake servers."""
+    os.chdir(workdir)
+    with open("credentials.json", "w") as f:
+        json.dump({
+            "gemini_api_key": "benchmark",
+            "google_map_api_key": "AIzaBenchmark",
+            "calendar_id": "benchmark@group.calendar.google.com",
+            "gemini_requests_per_minute": requests_per_minute,
+        }, f)
+    os.environ.update(endpoints(ports))
+    sys.path.insert(0, REPO_ROOT)
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app
+    # Bare-mode warnings would otherwise be written to stderr on every st.* call
+    for name in list(logging.root.manager.loggerDict):
+        if name.startswith("streamlit"):
+            logging.getLogger(name).setLevel(logging.ERROR)
+    return app
+
+
+def run_flows(bench, app, sizes):
+    import google.generativeai as genai
+
+    from studybudd.calendar_sync import event_id_for
+    from studybudd.intent import FIND_NEAREST, FIND_ROUTE, LocatorIntent
+    from studybudd.llm_cache import CachedModel
+    from studybudd.tracing import TracedModel
+
+    model = CachedModel(TracedModel(genai.GenerativeModel("gemini-1.5-flash")), app.response_cache)
+    nearest = LocatorIntent(FIND_NEAREST, "Kuala Lumpur", None, "University", True)
+    route = LocatorIntent(FIND_ROUTE, "Rawang", "Universiti Malaya", "University", True)
+
+    def extract():
+        for text in EXTRACTION_INPUTS:
+            app.extract_study_details(text)
+
+    # Cold run first, then the same inputs again to show what the caches save
+    for suffix in ("", ":cached"):
+        bench.measure(f"extract_study_details{suffix}", extract, ops=len(EXTRACTION_INPUTS))
+        bench.measure(f"find_nearest{suffix}", lambda: app.find_nearest(model, nearest, "Kuala Lumpur"))
+        bench.measure(f"find_route{suffix}", lambda: app.find_route(route, "Rawang"))
+
+    for size in sizes:
+        clear_local_caches()
+        bench.reset(clear_state=True)
+        seed_plan(app.plan_store.path, size)
+
+        bench.measure("display_study_plan", app.display_study_plan, rows=size)
+        plan = app.plan_store.load()
+        bench.measure("sync_with_google_calendar", lambda: app.sync_with_google_calendar(plan), rows=size)
+        plan = app.plan_store.load()
+        bench.measure("sync_with_google_calendar:unchanged", lambda: app.sync_with_google_calendar(plan), rows=size)
+
+        # The same full sync as a background job, from a calendar and sync state that are empty again
+        clear_local_caches()
+        bench.reset(clear_state=True)
+        plan = app.plan_store.load()
+
+        def sync_job():
+            job_id = app.sync_worker.submit(plan, "All events")
+            while app.sync_worker.jobs.get(job_id)["status"] in ("queued", "running"):
+                time.sleep(0.01)
+
+        bench.measure("sync_job", sync_job, rows=size)
+
+        # Pulling edits made in Google Calendar: a full listing first, then only the delta
+        bench.measure("pull_calendar_changes:full", app.pull_calendar_changes, rows=size)
+        with app.calendar_service() as service:
+            events = service.events()
+            for i in range(1, min(size, PULL_EDITS) + 1):
+                event_id = event_id_for(app.load_calendar_id(), f"ID-{i}")
+                events.patch(calendarId=app.load_calendar_id(), eventId=event_id, body={"summary": f"Moved {i}"}).execute()
+        bench.measure("pull_calendar_changes", app.pull_calendar_changes, rows=size, ops=min(size, PULL_EDITS))
+
+        def add():
+            for i in range(ADDS_PER_SIZE):
+                app.add_to_study_plan(f"Added session {i}", "2025-07-01", "10:00:00", "11:00:00", "Medium", "Benchmark")
+
+        bench.measure("add_to_study_plan", add, rows=size, ops=ADDS_PER_SIZE)
+
+    bulk_text = "\n".join(f"- Week {i % 14 + 1} tutorial {i} on Friday at 2 pm" for i in range(BULK_ACTIVITIES))
+
+    def bulk_import():
+        rows, _ = app.extract_activities(bulk_text, lambda prompt, schema: app.ask_gemini_json(prompt, schema, "bulk"))
+        app.plan_store.add_many(rows)
+
+    bench.measure("bulk_import", bulk_import, ops=BULK_ACTIVITIES)
+
+
+def warm_up(bench, app):
+    """Run the flows once so lazy imports and discovery documents are not counted."""
+    run_flows(bench, app, [10])
+    bench.results.clear()
+    clear_local_caches()
+    bench.reset(clear_state=True)
+
+
+def _limit_for(limit, rows):
+    if isinstance(limit, dict):
+        return limit.get(str(rows))
+    return limit
+
+
+def check(results, thresholds):
+    """Return a list of human-readable threshold violations."""
+    failures = []
+    for result in results:
+        limits = thresholds.get(result["flow"], {})
+        label = f"{result['flow']} ({result['rows']} rows)" if result["rows"] is not None else result["flow"]
+
+        wall_limit = _limit_for(limits.get("max_wall_seconds"), result["rows"])
+        if wall_limit is not None and result["wall_seconds"] > wall_limit:
+            failures.append(f"{label}: {result['wall_seconds']:.2f}s > {wall_limit}s")
+
+        for service, limit in limits.get("max_calls", {}).items():
+            if result["calls"][service] > limit:
+                failures.append(f"{label}: {result['calls'][service]} {service} calls > {limit}")
+
+        for service, per_row in limits.get("max_calls_per_row", {}).items():
+            limit = math.ceil(per_row * (result["rows"] or 0))
+            if result["calls"][service] > limit:
+                failures.append(f"{label}: {result['calls'][service]} {service} calls > {limit}")
+
+        per_op = limits.get("max_bytes_written_per_op")
+        if per_op is not None and result["bytes_written"] is not None:
+            if result["bytes_written"] > per_op * result["ops"]:
+                failures.append(f"{label}: wrote {result['bytes_written']} bytes > {per_op * result['ops']}")
+
+        read_limit = _limit_for(limits.get("max_bytes_read"), result["rows"])
+        if read_limit is not None and result["bytes_read"] is not None and result["bytes_read"] > read_limit:
+            failures.append(f"{label}: read {result['bytes_read']} bytes > {read_limit}")
+    return failures
+
+
+def _kib(value):
+    return "-" if value is None else f"{value / 1024:,.1f}"
+
+
+def print_report(results):
+    header = f"{'flow':<38}{'rows':>8}{'wall s':>10}{'gemini':>8}{'maps':>6}{'cal':>6}{'read KiB':>12}{'written KiB':>13}"
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        calls = result["calls"]
+        print(
+            f"{result['flow']:<38}{result['rows'] if result['rows'] is not None else '-':>8}"
+            f"{result['wall_seconds']:>10.3f}{calls['gemini']:>8}{calls['maps']:>6}{calls['calendar']:>6}"
+            f"{_kib(result['bytes_read']):>12}{_kib(result['bytes_written']):>13}"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline StudyBudd benchmark against fake API servers.")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma-separated plan sizes (default: %(default)s)")
+    parser.add_argument("--latency-ms", type=float, default=20, help="latency added by every fake server")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests failed with 503")
+    parser.add_argument("--route-points", type=int, default=500, help="points in each fake directions polyline")
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    parser.add_argument("--check", action="store_true", help="exit non-zero when thresholds.json is exceeded")
+    parser.add_argument("--thresholds", default=THRESHOLDS_PATH)
+    args = parser.parse_args(argv)
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+
+    process, ports = start_in_process(args.latency_ms / 1000, args.error_rate, route_points=args.route_points)
+    cwd = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory(prefix="studybudd-bench-") as workdir:
+            # Keep the client-side rate limiter out of the way of the measurements
+            app = load_app(workdir, ports, requests_per_minute=60000)
+            bench = Bench(ports)
+            warm_up(bench, app)
+            run_flows(bench, app, sizes)
+            os.chdir(cwd)
+    finally:
+        process.terminate()
+
+    print_report(bench.results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "config": {"sizes": sizes, "latency_ms": args.latency_ms, "error_rate": args.error_rate},
+                "results": bench.results,
+            }, f, indent=2)
+
+    if args.check:
+        with open(args.thresholds) as f:
+            failures = check(bench.results, json.load(f))
+        for failure in failures:
+            print(f"FAIL {failure}")
+        if failures:
+            return 1
+        print("All thresholds met.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
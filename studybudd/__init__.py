@@ -0,0 +1 @@
+"""Support modules for the StudyBudd Streamlit app."""
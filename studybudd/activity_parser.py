@@ -0,0 +1,257 @@
+"""Rule-based parsing of one typed study activity.
+
+The common phrasings ("Math test tomorrow at 5 pm", "Physics revision on
+Monday from 2 to 4", "Essay due 3 May, 9 pm") are read with regular
+expressions against today's date, so they need no Gemini call. Each date,
+time and priority phrase is cut out of the text and what remains is the
+event name. Input that is ambiguous (no date or time, a second date, words
+like "afternoon" or "every", "next Monday" when it could mean two dates)
+returns None so the caller can ask Gemini.
+"""
+import calendar
+import re
+from datetime import date, timedelta
+
+
+DEFAULT_LENGTH = 60  # Minutes, when only the start time is given
+NO_NOTES = "No additional notes"
+
+NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10,
+}
+WEEKDAYS = {name.lower(): i for i, name in enumerate(calendar.day_name)}
+WEEKDAYS.update({name.lower(): i for i, name in enumerate(calendar.day_abbr)})
+WEEKDAYS.update({"tues": 1, "thur": 3, "thurs": 3})
+MONTHS = {name.lower(): i for i, name in enumerate(calendar.month_name) if name}
+MONTHS.update({name.lower(): i for i, name in enumerate(calendar.month_abbr) if name})
+MONTHS["sept"] = 9
+WORD_TIMES = {"noon": 12 * 60, "midday": 12 * 60, "midnight": 0}
+
+
+def _alternatives(words):
+    # Longest first, so "thursday" is not read as "thu"
+    return "|".join(sorted(words, key=len, reverse=True))
+
+
+NUMBER = rf"\d+|{_alternatives(NUMBER_WORDS)}"
+WEEKDAY = _alternatives(WEEKDAYS)
+MONTH = _alternatives(MONTHS)
+ORDINAL = r"(?:st|nd|rd|th)"
+TIME = r"(?:\d{1,2}(?:[:.]\d{2})?(?:\s*[ap]\.?m\b\.?)?|noon|midday|midnight)"
+EXPLICIT_TIME = r"(?:\d{1,2}(?:[:.]\d{2})?\s*[ap]\.?m\b\.?|\d{1,2}:\d{2}|noon|midday|midnight)"
+
+PRIORITY_PATTERN = re.compile(
+    r"\b(?:with\s+)?(?:(?P<before>high|medium|low)\s+priority|priority\s*[:=-]?\s*(?P<after>high|medium|low))\b", re.I
+)
+DATE_PATTERNS = [
+    ("iso", re.compile(r"\b(?P<year>\d{4})-(?P<month>\d{1,2})-(?P<day>\d{1,2})\b")),
+    ("day_month", re.compile(
+        rf"\b(?:the\s+)?(?P<day>\d{{1,2}}){ORDINAL}?(?:\s+of)?\s+(?P<month>{MONTH})\b\.?(?:,?\s+(?P<year>\d{{4}}))?", re.I
+    )),
+    ("month_day", re.compile(
+        rf"\b(?P<month>{MONTH})\.?\s+(?:the\s+)?(?P<day>\d{{1,2}}){ORDINAL}?\b(?:,?\s+(?P<year>\d{{4}}))?", re.I
+    )),
+    ("day_of_month", re.compile(rf"\bthe\s+(?P<day>\d{{1,2}}){ORDINAL}\b", re.I)),
+    ("relative", re.compile(r"\b(?P<word>(?:the\s+)?day\s+after\s+tomorrow|tomorrow|today|tonight)\b", re.I)),
+    ("offset", re.compile(rf"\bin\s+(?P<count>{NUMBER})\s+(?P<unit>day|week)s?\b", re.I)),
+    ("weekday", re.compile(rf"\b(?:(?P<which>next|this|coming)\s+)?(?P<weekday>{WEEKDAY})\b\.?", re.I)),
+]
+RANGE_PATTERN = re.compile(
+    rf"(?:\b(?P<lead>from|between)\s+)?(?P<start>{TIME})\s*(?:-|–|\bto\b|\buntil\b|\btill\b|\band\b)\s*(?P<end>{TIME})(?!\w)",
+    re.I,
+)
+AT_PATTERN = re.compile(rf"(?:\b(?:at|by|from)\s+|@\s*)(?P<start>{TIME})(?!\w)", re.I)
+EXPLICIT_PATTERN = re.compile(rf"(?<![\w:])(?P<start>{EXPLICIT_TIME})(?!\w)", re.I)
+DURATION_PATTERN = re.compile(
+    rf"\bfor\s+(?P<count>{NUMBER}|\d+\.\d+|half\s+an)\s+(?P<unit>hours?|hrs?|h|minutes?|mins?)\b", re.I
+)
+CLOCK_PATTERN = re.compile(r"(?P<hour>\d{1,2})(?:[:.](?P<minute>\d{2}))?\s*(?:(?P<meridiem>[ap])\.?m\b\.?)?", re.I)
+
+# Anything still in the event name that suggests a time or date the rules did not read
+LEFTOVER_PATTERN = re.compile(
+    rf"\b(?:morning|afternoon|evening|night|noon|midday|midnight|tonight|today|tomorrow|yesterday|weekend|weeks?"
+    rf"|months?|years?|daily|weekly|monthly|every|each|until|till|before|after|later|soon|next|last|ago|am|pm"
+    rf"|o'?clock|hours?|hrs?|minutes?|mins?|{WEEKDAY}|{MONTH})s?\b|\d{{1,2}}:\d{{2}}|\d\s*[ap]\.?m\b|\d{{1,2}}{ORDINAL}\b"
+    rf"|\b(?:on|at|by|due)\s+\d{{1,2}}\b",
+    re.I,
+)
+LEADING_WORDS = re.compile(
+    r"^(?:(?:i\s+(?:have|need\s+to|want\s+to|will|must)|i've\s+got|there\s+is|remind\s+me\s+(?:to|about)"
+    r"|please\s+(?:add|schedule)|add|schedule)\s+)+(?:(?:a|an)\s+)?",
+    re.I,
+)
+TRAILING_WORDS = re.compile(r"(?:[\s,;:.\-–]+|\b(?:on|at|by|due|for|from|in|this|the|of|and|with)\b)+$", re.I)
+
+
+def _number(text):
+    text = text.lower()
+    return NUMBER_WORDS[text] if text in NUMBER_WORDS else int(text)
+
+
+def _add_months(day, months):
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, day.day)
+
+
+def _resolve_date(kind, match, today):
+    """The date a DATE_PATTERNS match refers to, or None if it is not a real date."""
+    groups = match.groupdict()
+    try:
+        if kind == "iso":
+            return date(int(groups["year"]), int(groups["month"]), int(groups["day"]))
+        if kind in ("day_month", "month_day"):
+            month = MONTHS[groups["month"].lower()]
+            if groups["year"]:
+                return date(int(groups["year"]), month, int(groups["day"]))
+            # Without a year, the next time that day comes round
+            resolved = date(today.year, month, int(groups["day"]))
+            return resolved if resolved >= today else date(today.year + 1, month, int(groups["day"]))
+        if kind == "day_of_month":
+            resolved = date(today.year, today.month, int(groups["day"]))
+            return resolved if resolved >= today else _add_months(resolved, 1)
+    except ValueError:
+        return None
+    if kind == "relative":
+        word = groups["word"].lower()
+        return today + timedelta(days=2 if word.endswith("after tomorrow") else 1 if word == "tomorrow" else 0)
+    if kind == "offset":
+        count = _number(groups["count"])
+        return today + timedelta(days=count * 7 if groups["unit"].lower() == "week" else count)
+    # "Friday" and "this Friday" may be today. "Next Friday" said on a Friday is a week
+    # away; on any other day it may mean the coming Friday or the one after, so it is unsure
+    ahead = (WEEKDAYS[groups["weekday"].lower()] - today.weekday()) % 7
+    if groups["which"] and groups["which"].lower() == "next":
+        return today + timedelta(days=7) if ahead == 0 else None
+    return today + timedelta(days=ahead)
+
+
+def _clock_choices(text):
+    """Minutes after midnight a time token can mean: one value, or (am, pm) for a bare 1-12 hour."""
+    text = text.strip().lower()
+    if text in WORD_TIMES:
+        return [WORD_TIMES[text]]
+    match = CLOCK_PATTERN.fullmatch(text)
+    if not match:
+        return []
+    hour, minute = int(match["hour"]), int(match["minute"] or 0)
+    if minute > 59 or hour > 23:
+        return []
+    if match["meridiem"]:
+        if not 1 <= hour <= 12:
+            return []
+        return [(hour % 12 + (12 if match["meridiem"].lower() == "p" else 0)) * 60 + minute]
+    if hour == 0 or hour > 12 or match["hour"].startswith("0"):
+        return [hour * 60 + minute]
+    return [hour % 12 * 60 + minute, (hour % 12 + 12) * 60 + minute]
+
+
+def _default_choice(choices, evening):
+    if len(choices) == 1:
+        return choices[0]
+    am, pm = choices
+    # Study sessions rarely start between midnight and 8 in the morning, and "12" is noon
+    return pm if evening or am < 8 * 60 else am
+
+
+def _format(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}:00"
+
+
+def _cut(text, match):
+    return text[:match.start()] + " " + text[match.end():]
+
+
+def _read_times(text, evening):
+    """(start, end or None, remaining text) in minutes, or None when no time is given."""
+    match = RANGE_PATTERN.search(text)
+    if match:
+        start_text, end_text = match["start"], match["end"]
+        separator = text[match.end("start"):match.start("end")].strip().lower()
+        explicit = any(re.fullmatch(EXPLICIT_TIME, value.strip(), re.I) for value in (start_text, end_text))
+        # "chapters 3 to 5" is not a time range; "from 2 to 4" and "2pm to 4" are
+        if (match["lead"] or explicit) and (separator != "and" or (match["lead"] or "").lower() == "between"):
+            starts, ends = _clock_choices(start_text), _clock_choices(end_text)
+            if starts and ends:
+                if len(starts) > 1 and len(ends) == 1:
+                    earlier = [choice for choice in starts if choice < ends[0]]
+                    start = max(earlier) if earlier else _default_choice(starts, evening)
+                else:
+                    start = _default_choice(starts, evening)
+                later = [choice for choice in ends if choice > start]
+                end = min(later) if later else ends[0]
+                return start, end, _cut(text, match)
+
+    for pattern in (AT_PATTERN, EXPLICIT_PATTERN):
+        match = pattern.search(text)
+        if match:
+            starts = _clock_choices(match["start"])
+            if starts:
+                return _default_choice(starts, evening), None, _cut(text, match)
+    return None
+
+
+def _read_duration(text):
+    match = DURATION_PATTERN.search(text)
+    if not match:
+        return None, text
+    count = match["count"].lower()
+    count = 0.5 if count.startswith("half") else float(count) if "." in count else _number(count)
+    minutes = count if match["unit"].lower().startswith("m") else count * 60
+    return int(minutes), _cut(text, match)
+
+
+def parse_activity(text, today=None):
+    """Read one activity into the fields `extract_study_details` returns, or None if unsure.
+
+    Both a date and a start time are required; the end time defaults to an
+    hour after the start, the priority to Medium. Activities that run past
+    midnight return None.
+    """
+    today = today or date.today()
+    text = " ".join(str(text).split())
+    if not text:
+        return None
+
+    priority = "Medium"
+    match = PRIORITY_PATTERN.search(text)
+    if match:
+        priority = (match["before"] or match["after"]).capitalize()
+        text = _cut(text, match)
+
+    event_date = None
+    evening = False
+    for kind, pattern in DATE_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            event_date = _resolve_date(kind, match, today)
+            evening = kind == "relative" and match["word"].lower() == "tonight"
+            text = _cut(text, match)
+            break
+    if event_date is None or any(pattern.search(text) for _, pattern in DATE_PATTERNS):
+        return None
+
+    times = _read_times(text, evening)
+    if times is None:
+        return None
+    start, end, text = times
+    duration, text = _read_duration(text)
+    if end is None:
+        end = start + (duration or DEFAULT_LENGTH)
+    if not start < end < 24 * 60:
+        # Ends at or after midnight ("11:30 pm", "11pm to 1am"); the row holds a single date
+        return None
+
+    text = TRAILING_WORDS.sub("", LEADING_WORDS.sub("", text.strip())).strip()
+    text = re.sub(r"\s+([,;.])", r"\1", " ".join(text.split()))
+    if not text or LEFTOVER_PATTERN.search(text):
+        return None
+
+    return {
+        "event_name": text[0].upper() + text[1:],
+        "date": event_date.isoformat(),
+        "time_start": _format(start),
+        "time_end": _format(end),
+        "priority": priority,
+        "notes": NO_NOTES,
+    }
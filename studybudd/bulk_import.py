@@ -0,0 +1,390 @@
+"""Bulk import of many study activities at once.
+
+Pasted semester text is split into one line per activity. Lines the local
+parser reads (see activity_parser) need no model call; the rest are extracted
+in batches with a JSON response schema; the prompt carries today's date so the
+model resolves relative dates in the same call. CSV and ICS timetables are
+parsed locally without Gemini. Every importer returns a DataFrame with the
+plan's columns (minus `ID`), ready for `PlanStore.add_many`.
+"""
+import csv
+import io
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import pandas as pd
+
+from studybudd.activity_parser import parse_activity
+from studybudd.normalize import normalize_plan
+from studybudd.plan_store import cell_text
+from studybudd.tracing import in_trace_context
+
+
+TIME_ZONE = "Asia/Kuala_Lumpur"
+ACTIVITIES_PER_CALL = 20
+MAX_WORKERS = 4
+MAX_OCCURRENCES = 200
+PRIORITIES = ["High", "Medium", "Low"]
+IMPORT_COLUMNS = ["Event", "Date", "Time Start", "Time End", "Priority", "Notes"]
+DAY_END_TEXT = "23:59:59"  # Latest end time a row can hold
+DAY_END = pd.Timedelta(DAY_END_TEXT)
+
+ACTIVITY_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "index": {"type": "INTEGER"},
+            "event_name": {"type": "STRING"},
+            "date": {"type": "STRING"},
+            "time_start": {"type": "STRING"},
+            "time_end": {"type": "STRING"},
+            "priority": {"type": "STRING", "format": "enum", "enum": PRIORITIES},
+            "notes": {"type": "STRING"},
+        },
+        "required": ["index", "event_name", "date"],
+    },
+}
+
+# Lower-cased CSV header -> plan column
+CSV_ALIASES = {
+    "event": "Event",
+    "event name": "Event",
+    "title": "Event",
+    "summary": "Event",
+    "subject": "Event",
+    "activity": "Event",
+    "date": "Date",
+    "day": "Date",
+    "start": "Time Start",
+    "time start": "Time Start",
+    "start time": "Time Start",
+    "end": "Time End",
+    "time end": "Time End",
+    "end time": "Time End",
+    "priority": "Priority",
+    "notes": "Notes",
+    "note": "Notes",
+    "description": "Notes",
+}
+
+WEEKDAYS = {"MO": 0, "TU": 1, "WE": 2, "TH": 3, "FR": 4, "SA": 5, "SU": 6}
+
+
+def split_activities(text):
+    """One activity per non-empty line, with bullets and numbering stripped."""
+    activities = []
+    for line in text.splitlines():
+        line = re.sub(r"^\s*(?:[-*•]+|\(?\d+[.)]|[a-z][.)])\s+", "", line).strip()
+        if line:
+            activities.append(line)
+    return activities
+
+
+def activity_prompt(numbered, today):
+    """Prompt for `(index, line)` pairs; the model echoes each index back."""
+    listed = "\n".join(f"{index}. {activity}" for index, activity in numbered)
+    return f"""
+    Today is {today.isoformat()} ({today.strftime("%A")}).
+    Extract one study activity from each numbered line below and return them as a JSON array.
+    For each line give its number as "index", a short "event_name", the exact "date" as YYYY-MM-DD
+    (resolve relative dates such as "next Friday" or "week 3" from today), "time_start" and "time_end"
+    as HH:MM:SS, a "priority" of High, Medium or Low, and any remaining details as "notes".
+    If only the start time is given, set the end time to one hour after it.
+    Lines:
+    {listed}
+    """
+
+
+def _one_hour_after(values):
+    times = pd.to_datetime(values, format="%H:%M:%S", errors="coerce")
+    ends = times + pd.Timedelta(hours=1)
+    # A row holds one date, so a late start ends at midnight instead of wrapping to the small hours
+    ends = ends.where(ends.dt.normalize() == times.dt.normalize(), times.dt.normalize() + DAY_END)
+    return ends.dt.strftime("%H:%M:%S").astype("string")
+
+
+def finish_rows(df):
+    """Normalize dates/times locally, default the end time to start + 1 hour and fill blanks."""
+    df = df.reindex(columns=IMPORT_COLUMNS)
+    df, _ = normalize_plan(df)
+    missing_end = df["Time End"].isna() | (df["Time End"].astype("string").str.strip() == "")
+    df.loc[missing_end, "Time End"] = _one_hour_after(df.loc[missing_end, "Time Start"])
+    # An end before the start ran past midnight ("23:00" to "01:00"); it is cut off at the end of the day
+    start, end = df["Time Start"].astype("string"), df["Time End"].astype("string")
+    df.loc[(start.notna() & end.notna() & (end < start)).fillna(False), "Time End"] = DAY_END_TEXT
+    priority = df["Priority"].astype("string").str.strip().str.capitalize()
+    df["Priority"] = priority.where(priority.isin(PRIORITIES), "Medium")
+    df["Notes"] = df["Notes"].where(df["Notes"].notna() & (df["Notes"].astype("string") != ""), "No additional notes")
+    return df[df["Event"].notna() & (df["Event"].astype("string").str.strip() != "")].reset_index(drop=True)
+
+
+def parse_activities(response_text, indexes):
+    """Map the model's array back onto the batch's lines, ignoring unknown indexes."""
+    rows = {}
+    for item in json.loads(response_text):
+        index = item.get("index")
+        if isinstance(index, int) and index in indexes:
+            rows[index] = {
+                "Event": str(item.get("event_name") or "").strip(),
+                "Date": item.get("date"),
+                "Time Start": item.get("time_start"),
+                "Time End": item.get("time_end"),
+                "Priority": item.get("priority"),
+                "Notes": item.get("notes"),
+            }
+    return rows
+
+
+def _details_row(details):
+    return {
+        "Event": details["event_name"],
+        "Date": details["date"],
+        "Time Start": details["time_start"],
+        "Time End": details["time_end"],
+        "Priority": details["priority"],
+        "Notes": details["notes"],
+    }
+
+
+def extract_activities(text, generate_json, today=None, batch_size=ACTIVITIES_PER_CALL, max_workers=MAX_WORKERS, on_progress=None):
+    """Extract every activity in `text`, asking Gemini only about lines the local parser can't read.
+
+    Those lines go out `batch_size` to a call. `generate_json(prompt, schema)`
+    returns the model's JSON text, as for `build_deck`. Returns (DataFrame of
+    activities in input order, number of lines that could not be extracted).
+    """
+    today = today or date.today()
+    activities = split_activities(text)
+    rows = {}
+    pending = []
+    for index, activity in enumerate(activities, start=1):
+        details = parse_activity(activity, today)
+        if details:
+            rows[index] = _details_row(details)
+        else:
+            pending.append((index, activity))
+    batches = [pending[start:start + batch_size] for start in range(0, len(pending), batch_size)]
+    generate = in_trace_context(generate_json)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(generate, activity_prompt(batch, today), ACTIVITY_SCHEMA): {index for index, _ in batch}
+            for batch in batches
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            try:
+                rows.update(parse_activities(future.result(), futures[future]))
+            except Exception as e:
+                print(f"Details: {e}")
+            if on_progress:
+                on_progress(done, len(batches))
+
+    df = finish_rows(pd.DataFrame([rows[index] for index in sorted(rows)], columns=IMPORT_COLUMNS))
+    return df, len(activities) - len(df)
+
+
+def extract_activity(text, generate_json, today=None):
+    """One typed activity as `extract_study_details` fields, or None.
+
+    Common phrasings are parsed locally; anything else takes a single Gemini
+    call whose prompt carries today's date, so relative dates are resolved in
+    the same call.
+    """
+    today = today or date.today()
+    details = parse_activity(text, today)
+    if details:
+        return details
+    rows = parse_activities(generate_json(activity_prompt([(1, " ".join(text.split()))], today), ACTIVITY_SCHEMA), {1})
+    df = finish_rows(pd.DataFrame(list(rows.values()), columns=IMPORT_COLUMNS))
+    if df.empty:
+        return None
+    row = df.iloc[0]
+    return {
+        "event_name": row["Event"],
+        "date": cell_text(row["Date"]),
+        "time_start": cell_text(row["Time Start"]),
+        "time_end": cell_text(row["Time End"]),
+        "priority": row["Priority"],
+        "notes": row["Notes"],
+    }
+
+
+def parse_csv(data):
+    """Read a CSV timetable, matching headers like "Title" or "Start time" to plan columns."""
+    if isinstance(data, bytes):
+        data = data.decode("utf-8-sig")
+    reader = csv.DictReader(io.StringIO(data))
+    columns = {header: CSV_ALIASES.get(header.strip().lower()) for header in reader.fieldnames or []}
+    records = []
+    for record in reader:
+        row = {}
+        for header, value in record.items():
+            column = columns.get(header)
+            if column and column not in row and value not in (None, ""):
+                row[column] = value.strip()
+        if row:
+            records.append(row)
+    return finish_rows(pd.DataFrame(records, columns=IMPORT_COLUMNS))
+
+
+def _unfold(text):
+    # RFC 5545: a line starting with a space or tab continues the previous one
+    return re.sub(r"\r?\n[ \t]", "", text).splitlines()
+
+
+def _unescape(value):
+    return re.sub(r"\\([\\;,nN])", lambda m: "\n" if m.group(1) in "nN" else m.group(1), value)
+
+
+def _zone(name):
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo(TIME_ZONE)
+
+
+def _ics_datetime(params, value):
+    """DTSTART/DTEND/EXDATE value -> (datetime, whether it is a whole day).
+
+    UTC and TZID times stay aware in their own zone, so repeats are expanded
+    on the source calendar's clock; floating times and dates stay naive.
+    """
+    if params.get("VALUE") == "DATE" or re.fullmatch(r"\d{8}", value):
+        return datetime.strptime(value[:8], "%Y%m%d"), True
+    moment = datetime.strptime(value.rstrip("Z")[:15], "%Y%m%dT%H%M%S")
+    if value.endswith("Z"):
+        return moment.replace(tzinfo=ZoneInfo("UTC")), False
+    if "TZID" in params:
+        return moment.replace(tzinfo=_zone(params["TZID"])), False
+    return moment, False
+
+
+def _local(moment, local_zone):
+    """A parsed ICS time on the plan's clock; floating times are already local."""
+    return moment.astimezone(local_zone).replace(tzinfo=None) if moment.tzinfo else moment
+
+
+def _ics_priority(value):
+    # RFC 5545: 1-4 high, 5 medium, 6-9 low, 0 undefined
+    if value and value.isdigit() and int(value):
+        level = int(value)
+        return "High" if level < 5 else "Medium" if level == 5 else "Low"
+    return None
+
+
+def _occurrences(start, rule):
+    """Start times for a DAILY or WEEKLY RRULE (other rules yield only `start`), in `start`'s own zone."""
+    parts = dict(part.split("=", 1) for part in rule.split(";") if "=" in part)
+    frequency = parts.get("FREQ")
+    if frequency not in ("DAILY", "WEEKLY"):
+        return [start]
+    interval = int(parts.get("INTERVAL", 1))
+    count = min(int(parts.get("COUNT", MAX_OCCURRENCES)), MAX_OCCURRENCES)
+    until = None
+    if "UNTIL" in parts:
+        # UNTIL is inclusive; a date-only UNTIL covers that whole day
+        until, whole_day = _ics_datetime({}, parts["UNTIL"])
+        until += timedelta(days=1) if whole_day else timedelta(seconds=1)
+        if start.tzinfo is None:
+            until = until.astimezone(ZoneInfo(TIME_ZONE)).replace(tzinfo=None) if until.tzinfo else until
+        elif until.tzinfo is None:
+            until = until.replace(tzinfo=start.tzinfo)
+
+    weekdays = [start.weekday()]
+    if frequency == "WEEKLY" and "BYDAY" in parts:
+        weekdays = sorted(WEEKDAYS[day[-2:]] for day in parts["BYDAY"].split(",") if day[-2:] in WEEKDAYS)
+
+    occurrences = []
+    if frequency == "DAILY":
+        candidates = (start + timedelta(days=i * interval) for i in range(MAX_OCCURRENCES))
+    else:
+        week = start - timedelta(days=start.weekday())
+        candidates = (
+            week + timedelta(weeks=i * interval, days=day)
+            for i in range(MAX_OCCURRENCES)
+            for day in weekdays
+        )
+    for moment in candidates:
+        if len(occurrences) >= count or (until and moment >= until):
+            break
+        if moment >= start:
+            occurrences.append(moment)
+    return occurrences
+
+
+def parse_ics(data):
+    """Read the VEVENTs of an iCalendar file, expanding simple daily/weekly repeats less their EXDATEs."""
+    if isinstance(data, bytes):
+        data = data.decode("utf-8-sig")
+    local_zone = ZoneInfo(TIME_ZONE)
+    events, event = [], None
+    for line in _unfold(data):
+        if line == "BEGIN:VEVENT":
+            event = {"EXDATE": []}
+        elif line == "END:VEVENT" and event is not None:
+            if "DTSTART" in event:
+                events.append(event)
+            event = None
+        elif event is not None and ":" in line:
+            name, value = line.split(":", 1)
+            name, *param_text = name.split(";")
+            params = dict(param.split("=", 1) for param in param_text if "=" in param)
+            if name.upper() == "EXDATE":
+                # May repeat, and each one may list several dates
+                event["EXDATE"].extend((params, part) for part in value.split(",") if part)
+            else:
+                event[name.upper()] = (params, value)
+
+    # A moved or edited occurrence is its own VEVENT with a RECURRENCE-ID; the series skips that date
+    moved = {}
+    for event in events:
+        if "RECURRENCE-ID" in event and "UID" in event:
+            moved.setdefault(event["UID"][1], []).append(event["RECURRENCE-ID"])
+    records = []
+    for event in events:
+        if "RECURRENCE-ID" not in event:
+            event["EXDATE"].extend(moved.get(event.get("UID", ({}, ""))[1], []))
+        records.extend(_ics_rows(event, local_zone))
+    return finish_rows(pd.DataFrame(records, columns=IMPORT_COLUMNS))
+
+
+def _ics_rows(event, local_zone):
+    start, all_day = _ics_datetime(*event["DTSTART"])
+    duration = None
+    if "DTEND" in event:
+        end, _ = _ics_datetime(*event["DTEND"])
+        duration = _local(end, local_zone) - _local(start, local_zone)
+    summary = _unescape(event.get("SUMMARY", ({}, ""))[1]).strip()
+    notes = _unescape(event.get("DESCRIPTION", ({}, ""))[1]).strip() or None
+    priority = _ics_priority(event.get("PRIORITY", ({}, ""))[1])
+
+    rule = event.get("RRULE", ({}, ""))[1]
+    excluded = [_ics_datetime(params, value) for params, value in event["EXDATE"]] if rule else []
+    # Compared on the plan's clock, so a UTC EXDATE matches a TZID start and floating times match too
+    excluded_times = {_local(moment, local_zone) for moment, whole_day in excluded if not whole_day}
+    excluded_days = {moment.date() for moment, whole_day in excluded if whole_day}
+    rows = []
+    for occurrence in _occurrences(start, rule) if rule else [start]:
+        # Whole-day exclusions name the date on the event's own calendar
+        if occurrence.date() in excluded_days:
+            continue
+        moment = _local(occurrence, local_zone)
+        if moment in excluded_times:
+            continue
+        end = None
+        if not all_day and duration is not None:
+            # Events running past midnight end with the day they start on
+            end = min(moment + duration, datetime.combine(moment.date(), datetime.max.time()))
+        rows.append({
+            "Event": summary,
+            "Date": moment.strftime("%Y-%m-%d"),
+            # Whole-day events keep empty times; the end time is left to the one-hour default
+            "Time Start": None if all_day else moment.strftime("%H:%M:%S"),
+            "Time End": end.strftime("%H:%M:%S") if end else None,
+            "Priority": priority,
+            "Notes": notes,
+        })
+    return rows
@@ -0,0 +1,420 @@
+"""Two-way Google Calendar sync for study plan rows.
+
+Each plan row maps to a stable event ID derived from its `ID-n` value, so
+repeated syncs update events instead of duplicating them. Rows whose content
+hash matches the last successful sync are skipped, and the rest are sent as
+Calendar batch requests.
+
+Edits made in Google Calendar are pulled with `events.list` and a stored
+`syncToken`, so each pull only returns events changed since the last one.
+They are merged into the plan by the stored event-to-row mapping, and when
+both sides changed the later edit wins. Events created in the calendar
+itself are only imported on request, from a bounded window ahead.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+import httplib2
+import pandas as pd
+from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+from googleapiclient.http import BatchHttpRequest
+
+from studybudd.plan_store import cell_text
+from studybudd.tracing import get_tracer
+
+
+STATE_PATH = os.path.join(".studybudd", "calendar_sync.db")
+TIME_ZONE = "Asia/Kuala_Lumpur"
+BATCH_SIZE = 50  # Calendar API recommends at most 50 calls per batch
+LIST_PAGE_SIZE = 2500  # Largest page events.list allows
+IMPORT_DAYS = 90  # How far ahead events created in the calendar are imported
+
+
+def event_id_for(calendar_id, plan_id):
+    """Stable Calendar event ID for a plan row (hex digits are valid base32hex)."""
+    return hashlib.sha1(f"{calendar_id}:{plan_id}".encode("utf-8")).hexdigest()
+
+
+def _text(value, default=""):
+    return default if value is None or pd.isna(value) else str(value)
+
+
+def build_event(row):
+    """Build the Calendar event body for a normalized plan row."""
+    if pd.isna(row.get("Time Start")) or pd.isna(row.get("Time End")) or pd.isna(row.get("Date")):
+        raise ValueError(f"Missing date or time for event: {row.get('Event')}")
+    return {
+        "summary": _text(row.get("Event")),
+        "description": _text(row.get("Notes")),
+        "start": {"dateTime": f"{row['Date']}T{row['Time Start']}", "timeZone": TIME_ZONE},
+        "end": {"dateTime": f"{row['Date']}T{row['Time End']}", "timeZone": TIME_ZONE},
+        # Restores events that were deleted (cancelled) in Google Calendar
+        "status": "confirmed",
+        "extendedProperties": {"private": {"studybudd_id": _text(row.get("ID"))}},
+    }
+
+
+def _local_time(value):
+    """Event start/end -> (date, time) strings in TIME_ZONE; time is None for all-day events."""
+    if "dateTime" not in value:
+        return value.get("date"), None
+    moment = pd.Timestamp(value["dateTime"])
+    if moment.tzinfo is not None:
+        moment = moment.tz_convert(TIME_ZONE)
+    return moment.strftime("%Y-%m-%d"), moment.strftime("%H:%M:%S")
+
+
+def event_row(event):
+    """Plan column values for a Calendar event (the inverse of `build_event`)."""
+    event_date, time_start = _local_time(event.get("start", {}))
+    _, time_end = _local_time(event.get("end", {}))
+    return {
+        "Event": event.get("summary") or None,
+        "Date": event_date,
+        "Time Start": time_start,
+        "Time End": time_end,
+        "Notes": event.get("description") or None,
+    }
+
+
+def event_updated_at(event):
+    """Epoch seconds of the event's last modification in Google Calendar."""
+    return pd.Timestamp(event["updated"]).timestamp() if event.get("updated") else 0.0
+
+
+def content_hash(event):
+    return hashlib.sha256(json.dumps(event, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def synced_hash(row):
+    """Hash of the event a push would send for `row`, or "" if it cannot be pushed as is."""
+    try:
+        return content_hash(build_event(row))
+    except ValueError:
+        return ""
+
+
+def build_calendar_service(credentials=None, api_endpoint=None):
+    """Build a Calendar v3 client, optionally pointed at a local fake endpoint."""
+    client_options = {"api_endpoint": api_endpoint} if api_endpoint else None
+    if credentials is None:
+        return build("calendar", "v3", http=httplib2.Http(), client_options=client_options, static_discovery=True)
+    return build("calendar", "v3", credentials=credentials, client_options=client_options, static_discovery=True)
+
+
+class SyncState:
+    """Records which plan rows were last pushed to which event, with what content.
+
+    The same table maps events pulled from Google Calendar back to plan rows,
+    and the last `nextSyncToken` per calendar is kept for incremental pulls.
+    """
+
+    def __init__(self, path=STATE_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS synced_events (
+                    calendar_id TEXT NOT NULL,
+                    plan_id TEXT NOT NULL,
+                    event_id TEXT NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    synced_at REAL NOT NULL,
+                    PRIMARY KEY (calendar_id, plan_id)
+                );
+                CREATE INDEX IF NOT EXISTS idx_synced_events_event ON synced_events (calendar_id, event_id);
+                CREATE TABLE IF NOT EXISTS sync_tokens (
+                    calendar_id TEXT PRIMARY KEY,
+                    token TEXT NOT NULL,
+                    pulled_at REAL NOT NULL
+                );
+                """
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _select(self, columns, key, calendar_id, values):
+        """`SELECT columns` for rows whose `key` is in `values` (every row if None)."""
+        query = f"SELECT {columns} FROM synced_events WHERE calendar_id = ?"
+        with self._connect() as conn:
+            if values is None:
+                return conn.execute(query, (calendar_id,)).fetchall()
+            values = list(values)
+            rows = []
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(values), 500):
+                chunk = values[start:start + 500]
+                rows.extend(conn.execute(
+                    f"{query} AND {key} IN ({', '.join('?' * len(chunk))})", [calendar_id] + chunk
+                ))
+        return rows
+
+    def known_events(self, calendar_id, plan_ids=None):
+        """`{plan_id: (event_id, content_hash)}` for every synced row or only `plan_ids`."""
+        rows = self._select("plan_id, event_id, content_hash", "plan_id", calendar_id, plan_ids)
+        return {plan_id: (event_id, digest) for plan_id, event_id, digest in rows}
+
+    def plan_ids_for(self, calendar_id, event_ids):
+        """`{event_id: plan_id}` for events that are linked to a plan row."""
+        return {event_id: plan_id for event_id, plan_id in self._select("event_id, plan_id", "event_id", calendar_id, event_ids)}
+
+    def record(self, calendar_id, synced):
+        """Store `(plan_id, event_id, content_hash)` tuples after a successful push or pull."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO synced_events VALUES (?, ?, ?, ?, ?)",
+                [(calendar_id, plan_id, event_id, digest, now) for plan_id, event_id, digest in synced],
+            )
+
+    def forget(self, calendar_id, plan_ids):
+        with self._connect() as conn:
+            conn.executemany(
+                "DELETE FROM synced_events WHERE calendar_id = ? AND plan_id = ?",
+                [(calendar_id, plan_id) for plan_id in plan_ids],
+            )
+
+    def sync_token(self, calendar_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT token FROM sync_tokens WHERE calendar_id = ?", (calendar_id,)).fetchone()
+        return row[0] if row else None
+
+    def save_sync_token(self, calendar_id, token):
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO sync_tokens VALUES (?, ?, ?)", (calendar_id, token, time.time()))
+
+
+class CalendarSync:
+    def __init__(self, service, calendar_id, state=None, batch_size=BATCH_SIZE, batch_uri=None):
+        self.service = service
+        self.calendar_id = calendar_id
+        self.state = state or SyncState()
+        self.batch_size = batch_size
+        self.batch_uri = batch_uri
+        # Building the events() resource re-reads the discovery document, so do it once
+        self._events = service.events()
+
+    def _new_batch(self, callback):
+        if self.batch_uri:
+            return BatchHttpRequest(callback=callback, batch_uri=self.batch_uri)
+        return self.service.new_batch_http_request(callback=callback)
+
+    def _request(self, operation, event_id, event):
+        if operation == "insert":
+            return self._events.insert(calendarId=self.calendar_id, body=dict(event, id=event_id))
+        return self._events.update(calendarId=self.calendar_id, eventId=event_id, body=event)
+
+    def _execute(self, operation, pending):
+        """Send `{plan_id: (event_id, event)}` in batches; return (succeeded, errors by plan ID)."""
+        succeeded, errors = [], {}
+
+        def callback(plan_id, response, exception):
+            if exception is None:
+                succeeded.append(plan_id)
+            else:
+                errors[plan_id] = exception
+
+        items = list(pending.items())
+        for start in range(0, len(items), self.batch_size):
+            batch = self._new_batch(callback)
+            chunk = items[start:start + self.batch_size]
+            for plan_id, (event_id, event) in chunk:
+                batch.add(self._request(operation, event_id, event), request_id=plan_id)
+            with get_tracer().span("calendar", f"events.{operation} batch") as record:
+                record.items = len(chunk)
+                try:
+                    batch.execute()
+                    record.status = 200
+                except Exception as e:
+                    # The whole round trip failed; report every row in it
+                    record.status = getattr(getattr(e, "resp", None), "status", None) or type(e).__name__
+                    for plan_id, _ in chunk:
+                        errors.setdefault(plan_id, e)
+                record.errors = sum(plan_id in errors for plan_id, _ in chunk)
+        return succeeded, errors
+
+    def sync(self, df):
+        """Upsert every row of `df`; returns counts plus a list of `(plan_id, error)` failures."""
+        result = {"inserted": 0, "updated": 0, "skipped": 0, "failed": []}
+        known = self.state.known_events(self.calendar_id, {_text(plan_id) for plan_id in df.get("ID", []) if _text(plan_id)})
+
+        inserts, updates, digests, event_ids = {}, {}, {}, {}
+        for _, row in df.iterrows():
+            plan_id = _text(row.get("ID"))
+            if not plan_id:
+                result["failed"].append((row.get("Event"), "Save the plan before syncing new rows"))
+                continue
+            try:
+                event = build_event(row)
+            except ValueError as e:
+                result["failed"].append((plan_id, str(e)))
+                continue
+
+            digest = content_hash(event)
+            if plan_id in known and known[plan_id][1] == digest:
+                result["skipped"] += 1
+                continue
+            digests[plan_id] = digest
+            # Rows pulled from events created in Google Calendar keep that event's ID
+            event_ids[plan_id] = known[plan_id][0] if plan_id in known else event_id_for(self.calendar_id, plan_id)
+            target = updates if plan_id in known else inserts
+            target[plan_id] = (event_ids[plan_id], event)
+
+        def run(operation, pending, fallback_status, fallback_operation):
+            done, errors = self._execute(operation, pending)
+            # Our local state can disagree with the calendar: an insert may find the
+            # event already there (409) or an update may find it gone (404/410)
+            retry = {
+                plan_id: pending[plan_id] for plan_id, error in errors.items()
+                if getattr(getattr(error, "resp", None), "status", None) in fallback_status
+            }
+            failed = {plan_id: error for plan_id, error in errors.items() if plan_id not in retry}
+            if retry:
+                retried, retry_errors = self._execute(fallback_operation, retry)
+                failed.update(retry_errors)
+                return done, retried, failed
+            return done, [], failed
+
+        inserted, fallback_updated, insert_failed = run("insert", inserts, (409,), "update")
+        updated, fallback_inserted, update_failed = run("update", updates, (404, 410), "insert")
+
+        synced = inserted + fallback_updated + updated + fallback_inserted
+        self.state.record(
+            self.calendar_id,
+            [(plan_id, event_ids[plan_id], digests[plan_id]) for plan_id in synced],
+        )
+        result["inserted"] = len(inserted) + len(fallback_inserted)
+        result["updated"] = len(updated) + len(fallback_updated)
+        result["failed"].extend((plan_id, str(error)) for plan_id, error in {**insert_failed, **update_failed}.items())
+        return result
+
+    def _list_changes(self, sync_token):
+        """Events changed since `sync_token` (every event if None); returns (events, next token)."""
+        return self._list({"syncToken": sync_token} if sync_token else {})
+
+    def _list(self, options):
+        """Every page of `events.list` with `options`; returns (events, next sync token or None)."""
+        events, page_token = [], None
+        while True:
+            params = dict(options, calendarId=self.calendar_id, maxResults=LIST_PAGE_SIZE)
+            if page_token:
+                params["pageToken"] = page_token
+            with get_tracer().span("calendar", "events.list") as record:
+                response = self._events.list(**params).execute()
+                record.status = 200
+                record.items = len(response.get("items", []))
+            events.extend(response.get("items", []))
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                return events, response.get("nextSyncToken")
+
+    def pull(self, store):
+        """Merge events changed in Google Calendar into the plan held by `store` (a PlanStore).
+
+        Only events linked to a plan row are merged; other events in the
+        calendar are left to `import_events`. Returns counts of rows updated,
+        added and deleted, rows left alone because the plan was edited later
+        ("kept") and events that already matched the plan.
+        """
+        result = {"updated": 0, "added": 0, "deleted": 0, "kept": 0, "unchanged": 0, "full": False}
+        sync_token = self.state.sync_token(self.calendar_id)
+        try:
+            events, next_token = self._list_changes(sync_token)
+        except HttpError as e:
+            if getattr(e.resp, "status", None) != 410:
+                raise
+            # The token expired; Google asks for a full listing instead
+            sync_token = None
+            events, next_token = self._list_changes(None)
+        result["full"] = sync_token is None
+
+        linked = self.state.plan_ids_for(self.calendar_id, [event["id"] for event in events])
+        for event in events:
+            # Events pushed by another install of StudyBudd carry the row ID themselves
+            private = event.get("extendedProperties", {}).get("private", {})
+            if event["id"] not in linked and private.get("studybudd_id"):
+                linked[event["id"]] = private["studybudd_id"]
+
+        current = store.load_ids(list(set(linked.values())))
+        rows = {row["ID"]: row for _, row in current.iterrows()}
+        modified = store.modified_times(list(rows))
+
+        updates, deleted, synced, kept = [], [], [], []
+        for event in events:
+            plan_id = linked.get(event["id"])
+            cancelled = event.get("status") == "cancelled"
+            if plan_id not in rows:
+                # Rows deleted from the plan stay deleted
+                continue
+            merged = dict(rows[plan_id], **event_row(event))
+            if not cancelled and all(cell_text(merged[name]) == cell_text(rows[plan_id][name]) for name in event_row(event)):
+                # Usually our own push coming back
+                result["unchanged"] += 1
+                synced.append((plan_id, event["id"], synced_hash(merged)))
+            elif event_updated_at(event) <= modified[plan_id]:
+                # The plan was edited after the calendar; the next push overwrites the event
+                kept.append((plan_id, event["id"], ""))
+            elif cancelled:
+                deleted.append(plan_id)
+            else:
+                updates.append(merged)
+                synced.append((plan_id, event["id"], synced_hash(merged)))
+
+        if updates:
+            store.update_rows(pd.DataFrame(updates))
+        if deleted:
+            store.apply_changes(pd.DataFrame(), pd.DataFrame(), deleted)
+            self.state.forget(self.calendar_id, deleted)
+        # The empty hash of kept rows makes the next push send the plan's version
+        self.state.record(self.calendar_id, synced + kept)
+        if next_token:
+            self.state.save_sync_token(self.calendar_id, next_token)
+
+        result.update(updated=len(updates), deleted=len(deleted), kept=len(kept))
+        return result
+
+    def import_events(self, store, days=IMPORT_DAYS):
+        """Add events from today through the next `days` days that are not linked to a plan row.
+
+        Recurring events are expanded, so each occurrence becomes its own
+        row. The new rows are linked to their events, so later pulls merge
+        edits to them. Returns the number of rows added.
+        """
+        today = pd.Timestamp.now(tz=TIME_ZONE).normalize()
+        events, _ = self._list({
+            "timeMin": today.isoformat(),
+            "timeMax": (today + pd.Timedelta(days=days)).isoformat(),
+            "singleEvents": True,
+        })
+        linked = self.state.plan_ids_for(self.calendar_id, [event["id"] for event in events])
+        new_events = [
+            event for event in events
+            if event["id"] not in linked
+            and event.get("status") != "cancelled"
+            # Events pushed by another install of StudyBudd are merged by `pull` instead
+            and not event.get("extendedProperties", {}).get("private", {}).get("studybudd_id")
+        ]
+        if not new_events:
+            return 0
+        added = pd.DataFrame([dict(event_row(event), Priority="Medium") for event in new_events])
+        self.state.record(self.calendar_id, [
+            (plan_id, event["id"], synced_hash(dict(row, ID=plan_id)))
+            for plan_id, event, (_, row) in zip(store.add_many(added), new_events, added.iterrows())
+        ])
+        return len(new_events)
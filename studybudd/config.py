@@ -0,0 +1,42 @@
+"""Credentials and settings loaded once per process from credentials.json."""
+import json
+import os
+from functools import lru_cache
+
+
+CREDENTIALS_PATH = "credentials.json"
+
+
+@lru_cache(maxsize=None)
+def load_credentials(path=CREDENTIALS_PATH):
+    try:
+        with open(path, "r") as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}  # Missing or corrupted file behaves like an empty one
+
+
+def get_setting(name, default=None):
+    """Read an optional key from credentials.json, e.g. `gemini_timeout`."""
+    return load_credentials().get(name, default)
+
+
+def get_endpoint(name):
+    """URL override for an external API, e.g. STUDYBUDD_MAPS_ENDPOINT for local fake servers."""
+    return os.environ.get(f"STUDYBUDD_{name.upper()}_ENDPOINT")
+
+
+# Output token budget per feature; override with "output_token_budgets" in credentials.json
+OUTPUT_TOKEN_BUDGETS = {
+    "default": 256,
+    "questions": 1024,
+    "solutions": 2048,
+    "flashcards": 1024,
+    "deck": 4096,
+    "bulk": 4096,
+}
+
+
+def get_token_budget(feature):
+    budgets = dict(OUTPUT_TOKEN_BUDGETS, **get_setting("output_token_budgets", {}))
+    return budgets.get(feature, budgets["default"])
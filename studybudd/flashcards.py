@@ -0,0 +1,235 @@
+"""Large flashcard decks built from long notes.
+
+The notes are split into sections, cards are generated for the sections in
+parallel with a JSON response schema, near-duplicate questions are dropped
+with a word-shingle index, and the finished deck is saved to SQLite so it
+can be reopened without calling Gemini again.
+"""
+import hashlib
+import json
+import math
+import os
+import re
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+
+from studybudd.tracing import in_trace_context
+
+
+DECK_PATH = os.path.join(".studybudd", "decks.db")
+SECTION_CHARS = 2500
+CARDS_PER_CALL = 25
+MAX_WORKERS = 4
+SHINGLE_SIZE = 3
+DUPLICATE_SIMILARITY = 0.7
+
+CARD_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "question": {"type": "STRING"},
+            "answer": {"type": "STRING"},
+        },
+        "required": ["question", "answer"],
+    },
+}
+
+
+def split_sections(text, max_chars=SECTION_CHARS):
+    """Pack paragraphs (or headed blocks) into sections of at most `max_chars`."""
+    paragraphs = [p.strip() for p in re.split(r"\n\s*\n|\n(?=#+\s)", text) if p.strip()]
+    sections, current = [], ""
+    for paragraph in paragraphs:
+        # Very long paragraphs are cut on sentence boundaries
+        while len(paragraph) > max_chars:
+            cut = paragraph.rfind(". ", 0, max_chars)
+            cut = cut + 1 if cut > 0 else max_chars
+            if current:
+                sections.append(current)
+                current = ""
+            sections.append(paragraph[:cut].strip())
+            paragraph = paragraph[cut:].strip()
+        if current and len(current) + len(paragraph) + 2 > max_chars:
+            sections.append(current)
+            current = ""
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        sections.append(current)
+    return sections
+
+
+def plan_requests(sections, total_cards, cards_per_call=CARDS_PER_CALL):
+    """Spread `total_cards` over sections by length; returns (section, part, parts, count) tuples."""
+    total_chars = sum(len(section) for section in sections) or 1
+    requests = []
+    for section in sections:
+        section_cards = max(1, math.ceil(total_cards * len(section) / total_chars))
+        parts = math.ceil(section_cards / cards_per_call)
+        for part in range(parts):
+            count = min(cards_per_call, section_cards - part * cards_per_call)
+            requests.append((section, part + 1, parts, count))
+    return requests
+
+
+def card_prompt(section, part, parts, count):
+    focus = ""
+    if parts > 1:
+        focus = f"This is batch {part} of {parts} for the same notes; cover different facts than the other batches would."
+    return f"""
+    Generate {count} flashcards from the following notes. {focus}
+    Each flashcard has a short question and a concise answer.
+    Notes:
+    \"\"\"{section}\"\"\"
+    """
+
+
+def normalize_question(question):
+    return re.sub(r"\s+", " ", re.sub(r"[^\w\s]", " ", question.lower())).strip()
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    words = text.split()
+    if len(words) < size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def deduplicate(cards, threshold=DUPLICATE_SIMILARITY):
+    """Drop cards whose question is a near-duplicate (shingle Jaccard >= threshold) of an earlier one."""
+    kept, kept_shingles, index = [], [], {}
+    seen_exact = set()
+    for card in cards:
+        normalized = normalize_question(card["Question"])
+        if not normalized or normalized in seen_exact:
+            continue
+        card_shingles = shingles(normalized)
+        # Only compare against earlier cards sharing at least one shingle
+        candidates = {i for shingle in card_shingles for i in index.get(shingle, ())}
+        if any(
+            len(card_shingles & kept_shingles[i]) / len(card_shingles | kept_shingles[i]) >= threshold
+            for i in candidates
+        ):
+            continue
+        seen_exact.add(normalized)
+        for shingle in card_shingles:
+            index.setdefault(shingle, []).append(len(kept))
+        kept.append(card)
+        kept_shingles.append(card_shingles)
+    return kept
+
+
+def parse_cards(response_text):
+    cards = []
+    for item in json.loads(response_text):
+        question = str(item.get("question", "")).strip()
+        answer = str(item.get("answer", "")).strip()
+        if question and answer:
+            cards.append({"Question": question, "Answer": answer})
+    return cards
+
+
+def build_deck(text, total_cards, generate_json, max_workers=MAX_WORKERS, on_progress=None):
+    """Generate about `total_cards` unique cards from `text`.
+
+    `generate_json(prompt, schema)` returns the model's JSON text. Sections run
+    on a bounded pool; results are merged in section order. Returns
+    (cards, failed request count).
+    """
+    # Ask for a few extra cards to make up for duplicates dropped later
+    requests = plan_requests(split_sections(text), math.ceil(total_cards * 1.15))
+    results = [None] * len(requests)
+    failed = 0
+    generate = in_trace_context(generate_json)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(generate, card_prompt(*request), CARD_SCHEMA): position
+            for position, request in enumerate(requests)
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            try:
+                results[futures[future]] = parse_cards(future.result())
+            except Exception as e:
+                print(f"Details: {e}")
+                failed += 1
+            if on_progress:
+                on_progress(done, len(requests))
+
+    cards = [card for section_cards in results if section_cards for card in section_cards]
+    return deduplicate(cards)[:total_cards], failed
+
+
+def source_hash(text, total_cards):
+    return hashlib.sha256(f"{total_cards}:{text.strip()}".encode("utf-8")).hexdigest()
+
+
+class DeckStore:
+    def __init__(self, path=DECK_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS decks (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    title TEXT NOT NULL,
+                    source_hash TEXT NOT NULL,
+                    card_count INTEGER NOT NULL,
+                    created_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_decks_source ON decks (source_hash);
+                CREATE TABLE IF NOT EXISTS cards (
+                    deck_id INTEGER NOT NULL REFERENCES decks (id) ON DELETE CASCADE,
+                    position INTEGER NOT NULL,
+                    question TEXT NOT NULL,
+                    answer TEXT NOT NULL,
+                    PRIMARY KEY (deck_id, position)
+                );
+                """
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def save(self, title, digest, cards):
+        with self._connect() as conn:
+            deck_id = conn.execute(
+                "INSERT INTO decks (title, source_hash, card_count, created_at) VALUES (?, ?, ?, ?)",
+                (title, digest, len(cards), time.time()),
+            ).lastrowid
+            conn.executemany(
+                "INSERT INTO cards VALUES (?, ?, ?, ?)",
+                [(deck_id, position, card["Question"], card["Answer"]) for position, card in enumerate(cards)],
+            )
+        return deck_id
+
+    def find(self, digest):
+        """Most recent deck built from the same notes and size, or None."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id FROM decks WHERE source_hash = ? ORDER BY id DESC LIMIT 1", (digest,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def list_decks(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT id, title, card_count, created_at FROM decks ORDER BY id DESC").fetchall()
+
+    def load(self, deck_id):
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT question, answer FROM cards WHERE deck_id = ? ORDER BY position", (deck_id,)
+            ).fetchall()
+        return [{"Question": question, "Answer": answer} for question, answer in rows]
@@ -0,0 +1,196 @@
+"""Shared HTTP client for the Gemini REST API.
+
+One pooled `requests.Session` is reused for every call, with connect/read
+timeouts, exponential backoff with jitter on 429/5xx (honouring Retry-After),
+and a client-side token bucket so bursts stay under the quota.
+"""
+import json
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from studybudd.config import get_endpoint, get_setting, load_credentials
+from studybudd.tracing import get_tracer
+
+
+GEMINI_BASE_URL = "https://generativelanguage.googleapis.com/v1beta"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class GeminiError(Exception):
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class RateLimiter:
+    """Token bucket: `rate` requests per second with bursts of up to `burst`."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def retry_after_seconds(response):
+    """Parse a Retry-After header given either as seconds or as an HTTP date."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class GeminiClient:
+    def __init__(
+        self,
+        api_key,
+        base_url=GEMINI_BASE_URL,
+        connect_timeout=5,
+        read_timeout=60,
+        max_retries=4,
+        backoff_base=0.5,
+        backoff_max=20,
+        requests_per_minute=60,
+        burst=10,
+        pool_size=16,
+    ):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.rate_limiter = RateLimiter(requests_per_minute / 60, burst)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Content-Type": "application/json", "x-goog-api-key": api_key or ""})
+
+    def _backoff(self, attempt, response=None):
+        # Full jitter, but never sooner than the server asked for
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        retry_after = retry_after_seconds(response) if response is not None else None
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_max))
+        time.sleep(delay)
+
+    def post(self, path, payload, **kwargs):
+        """POST to `path` with rate limiting and retries; returns the final `requests.Response`."""
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            try:
+                response = self.session.post(url, json=payload, timeout=self.timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.max_retries:
+                    raise GeminiError(f"Gemini request failed: {e}") from e
+                self._backoff(attempt)
+                continue
+
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                response.close()
+                self._backoff(attempt, response)
+                continue
+            response.retries = attempt
+            return response
+
+    @staticmethod
+    def _payload(prompt, generation_config):
+        return {
+            "contents": {"role": "USER", "parts": [{"text": prompt}]},
+            "generation_config": generation_config or {},
+        }
+
+    @staticmethod
+    def _record_usage(record, body):
+        usage = body.get("usageMetadata") or {}
+        record.prompt_tokens = usage.get("promptTokenCount", record.prompt_tokens)
+        record.output_tokens = usage.get("candidatesTokenCount", record.output_tokens)
+
+    def generate(self, model, prompt, generation_config=None):
+        """Call `generateContent` and return the first candidate's text."""
+        with get_tracer().span("gemini", f"generateContent {model}") as record:
+            response = self.post(f"models/{model}:generateContent", self._payload(prompt, generation_config))
+            record.status, record.retries = response.status_code, response.retries
+            if response.status_code != 200:
+                raise GeminiError(f"Gemini returned HTTP {response.status_code}", response.status_code)
+            try:
+                body = response.json()
+                self._record_usage(record, body)
+                return body["candidates"][0]["content"]["parts"][0]["text"]
+            except (KeyError, IndexError, ValueError) as e:
+                raise GeminiError(f"Unexpected Gemini response: {e}", response.status_code) from e
+
+    def stream(self, model, prompt, generation_config=None):
+        """Call `streamGenerateContent` over SSE, yielding text chunks as they arrive."""
+        with get_tracer().span("gemini", f"streamGenerateContent {model}") as record:
+            response = self.post(
+                f"models/{model}:streamGenerateContent",
+                self._payload(prompt, generation_config),
+                params={"alt": "sse"},
+                stream=True,
+            )
+            record.status, record.retries = response.status_code, response.retries
+            with response:
+                if response.status_code != 200:
+                    raise GeminiError(f"Gemini returned HTTP {response.status_code}", response.status_code)
+                response.encoding = response.encoding or "utf-8"
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith("data:"):
+                        continue
+                    try:
+                        event = json.loads(line[len("data:"):])
+                        self._record_usage(record, event)
+                        parts = event["candidates"][0]["content"]["parts"]
+                    except (KeyError, IndexError, ValueError):
+                        continue  # e.g. a final chunk that only carries usage metadata
+                    for part in parts:
+                        if part.get("text"):
+                            yield part["text"]
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Process-wide GeminiClient configured from credentials.json."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            endpoint = get_endpoint("gemini")
+            _client = GeminiClient(
+                load_credentials().get("gemini_api_key"),
+                base_url=f"{endpoint}/v1beta" if endpoint else GEMINI_BASE_URL,
+                read_timeout=get_setting("gemini_timeout", 60),
+                max_retries=get_setting("gemini_max_retries", 4),
+                requests_per_minute=get_setting("gemini_requests_per_minute", 60),
+            )
+        return _client
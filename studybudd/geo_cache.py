@@ -0,0 +1,322 @@
+"""Persistent cache for Google Maps geocode, nearby search and directions.
+
+Keys are chosen so that repeated searches hit the same entry:
+
+- geocode: the normalized query string
+- places_nearby: a geohash cell around the search centre, plus radius and
+  type; later result pages by their page token
+- directions: the normalized (origin, destination, mode) triple
+- distance_matrix: the origin's geohash cell, mode and destinations
+
+Each kind has its own TTL and size bound. Expired entries are kept (until
+evicted) so they can still be served while the Maps API is failing.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+
+CACHE_PATH = os.path.join(".studybudd", "geo_cache.db")
+DAY = 24 * 60 * 60
+
+TTLS = {
+    "geocode": 30 * DAY,
+    "places_nearby": 1 * DAY,
+    "directions": 60 * 60,
+    "distance_matrix": 60 * 60,
+}
+MAX_ENTRIES = {
+    "geocode": 5000,
+    "places_nearby": 2000,
+    "directions": 2000,
+    "distance_matrix": 2000,
+}
+# Precision 7 cells are about 150 m across
+NEARBY_GEOHASH_PRECISION = 7
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash_encode(latitude, longitude, precision=NEARBY_GEOHASH_PRECISION):
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        target, value = (lng_range, longitude) if even else (lat_range, latitude)
+        mid = (target[0] + target[1]) / 2
+        bits <<= 1
+        if value >= mid:
+            bits |= 1
+            target[0] = mid
+        else:
+            target[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits, bit_count = 0, 0
+    return "".join(chars)
+
+
+def geohash_decode(geohash):
+    """Centre (lat, lng) of a geohash cell."""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = _BASE32.index(char)
+        for shift in range(4, -1, -1):
+            target = lng_range if even else lat_range
+            mid = (target[0] + target[1]) / 2
+            if (value >> shift) & 1:
+                target[0] = mid
+            else:
+                target[1] = mid
+            even = not even
+    return (lat_range[0] + lat_range[1]) / 2, (lng_range[0] + lng_range[1]) / 2
+
+
+def normalize_query(text):
+    return re.sub(r"\s+", " ", str(text)).strip().lower()
+
+
+def parse_location(location):
+    """Accept "lat, lng", (lat, lng) or {"lat": .., "lng": ..}."""
+    if isinstance(location, str):
+        latitude, longitude = location.split(",")
+        return float(latitude), float(longitude)
+    if isinstance(location, dict):
+        return float(location["lat"]), float(location["lng"])
+    return float(location[0]), float(location[1])
+
+
+def geocode_key(address):
+    return normalize_query(address)
+
+
+def nearby_key(location, radius, place_type):
+    latitude, longitude = parse_location(location)
+    return f"{geohash_encode(latitude, longitude)}:{radius}:{place_type or ''}"
+
+
+def directions_key(origin, destination, mode):
+    return json.dumps([normalize_query(origin), normalize_query(destination), mode or "driving"])
+
+
+def distance_matrix_key(origin, destinations, mode):
+    latitude, longitude = parse_location(origin)
+    return f"{geohash_encode(latitude, longitude)}:{mode or 'driving'}:{'|'.join(destinations)}"
+
+
+class GeoCache:
+    def __init__(self, path=CACHE_PATH, ttls=None, max_entries=None):
+        self.path = path
+        self.ttls = dict(TTLS, **(ttls or {}))
+        self.max_entries = dict(MAX_ENTRIES, **(max_entries or {}))
+        self.counters = {kind: {"hits": 0, "misses": 0, "stale": 0} for kind in self.ttls}
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS geo_entries (
+                    kind TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    PRIMARY KEY (kind, key)
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_geo_last_access ON geo_entries (kind, last_access)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _count(self, kind, counter):
+        with self._lock:
+            self.counters[kind][counter] += 1
+
+    def get(self, kind, key, allow_stale=False):
+        """Cached value for `key`, or None. Expired values are returned only with `allow_stale`."""
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value, expires_at FROM geo_entries WHERE kind = ? AND key = ?", (kind, key)
+            ).fetchone()
+            if row is None or (row[1] <= now and not allow_stale):
+                return None
+            conn.execute("UPDATE geo_entries SET last_access = ? WHERE kind = ? AND key = ?", (now, kind, key))
+        return json.loads(row[0])
+
+    def set(self, kind, key, value):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO geo_entries VALUES (?, ?, ?, ?, ?)",
+                (kind, key, json.dumps(value), now + self.ttls[kind], now),
+            )
+            # Per-kind LRU bound; expired rows stay until pushed out so outages can use them
+            conn.execute(
+                """
+                DELETE FROM geo_entries WHERE kind = ? AND key IN (
+                    SELECT key FROM geo_entries WHERE kind = ? ORDER BY last_access DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (kind, kind, self.max_entries[kind]),
+            )
+
+    def fetch(self, kind, key, call, refresh=False):
+        """Serve `key` from cache (unless `refresh`), else run `call()`; on API failure fall back to a stale entry."""
+        cached = None if refresh else self.get(kind, key)
+        if cached is not None:
+            self._count(kind, "hits")
+            return cached
+        self._count(kind, "misses")
+        try:
+            value = call()
+        except Exception:
+            stale = self.get(kind, key, allow_stale=True)
+            if stale is None:
+                raise
+            self._count(kind, "stale")
+            return stale
+        self.set(kind, key, value)
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {kind: dict(counts) for kind, counts in self.counters.items()}
+
+
+class CachedMapsClient:
+    """Drop-in wrapper for `googlemaps.Client` that caches geocode, nearby search and directions.
+
+    Nearby pages are stored with the time they were fetched (`fetched_at`),
+    since the `next_page_token` in a cached page may have expired.
+    """
+
+    def __init__(self, client, cache):
+        self.client = client
+        self.cache = cache
+
+    def geocode(self, address, **kwargs):
+        if kwargs:
+            return self.client.geocode(address, **kwargs)
+        return self.cache.fetch("geocode", geocode_key(address), lambda: self.client.geocode(address))
+
+    def places_nearby(self, location=None, radius=None, type=None, refresh=False, **kwargs):
+        if list(kwargs) == ["page_token"] and location is None:
+            # The first page is cached with its token, so the pages after it are reachable from the cache too
+            token = kwargs["page_token"]
+            return self.cache.fetch(
+                "places_nearby",
+                f"page:{token}",
+                lambda: dict(self.client.places_nearby(page_token=token), fetched_at=time.time()),
+                refresh,
+            )
+        if kwargs or location is None:
+            # Other options are not cacheable
+            return self.client.places_nearby(location=location, radius=radius, type=type, **kwargs)
+        key = nearby_key(location, radius, type)
+        # Search from the cell centre so the cached answer is the same for the whole cell
+        centre = geohash_decode(key.split(":", 1)[0])
+        return self.cache.fetch(
+            "places_nearby",
+            key,
+            lambda: dict(self.client.places_nearby(location=centre, radius=radius, type=type), fetched_at=time.time()),
+            refresh,
+        )
+
+    def directions(self, origin, destination, mode="driving", **kwargs):
+        if kwargs:
+            return self.client.directions(origin, destination, mode=mode, **kwargs)
+        return self.cache.fetch(
+            "directions",
+            directions_key(origin, destination, mode),
+            lambda: self.client.directions(origin, destination, mode=mode),
+        )
+
+    def distance_matrix(self, origins, destinations, mode="driving", **kwargs):
+        if kwargs or len(origins) != 1:
+            return self.client.distance_matrix(origins, destinations, mode=mode, **kwargs)
+        key = distance_matrix_key(origins[0], destinations, mode)
+        # Measure from the cell centre so the cached answer is the same for the whole cell
+        centre = geohash_decode(key.split(":", 1)[0])
+        return self.cache.fetch(
+            "distance_matrix", key, lambda: self.client.distance_matrix([centre], destinations, mode=mode)
+        )
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+class RecordedMapsClient:
+    """Replays Maps responses from a JSON fixture; with `client` set, records misses into it.
+
+    The fixture maps method name -> cache key -> response, using the same keys
+    as GeoCache, so tests and benchmarks can run without a Maps API key.
+    """
+
+    def __init__(self, path, client=None):
+        self.path = path
+        self.client = client
+        self.calls = []
+        if os.path.exists(path):
+            with open(path, "r") as file:
+                self.fixtures = json.load(file)
+        else:
+            self.fixtures = {}
+
+    def _replay(self, method, key, call):
+        self.calls.append((method, key))
+        recorded = self.fixtures.setdefault(method, {})
+        if key not in recorded:
+            if self.client is None:
+                raise KeyError(f"No recorded {method} response for {key!r}")
+            recorded[key] = call()
+        return recorded[key]
+
+    def geocode(self, address):
+        return self._replay("geocode", geocode_key(address), lambda: self.client.geocode(address))
+
+    def places_nearby(self, location=None, radius=None, type=None, page_token=None):
+        if page_token:
+            return self._replay(
+                "places_nearby", f"page:{page_token}", lambda: self.client.places_nearby(page_token=page_token)
+            )
+        return self._replay(
+            "places_nearby",
+            nearby_key(location, radius, type),
+            lambda: self.client.places_nearby(location=location, radius=radius, type=type),
+        )
+
+    def directions(self, origin, destination, mode="driving"):
+        return self._replay(
+            "directions",
+            directions_key(origin, destination, mode),
+            lambda: self.client.directions(origin, destination, mode=mode),
+        )
+
+    def distance_matrix(self, origins, destinations, mode="driving"):
+        return self._replay(
+            "distance_matrix",
+            distance_matrix_key(origins[0], destinations, mode),
+            lambda: self.client.distance_matrix(origins, destinations, mode=mode),
+        )
+
+    def save(self):
+        with open(self.path, "w") as file:
+            json.dump(self.fixtures, file, indent=2)
@@ -0,0 +1,84 @@
+"""Structured intent extraction for the educational institution locator.
+
+One Gemini call with a JSON response schema returns everything the locator
+needs (mode, origin, destination, institution type and validity), replacing
+the chain of yes/no prompts that were substring-matched.
+"""
+import json
+from dataclasses import dataclass
+from typing import Optional
+
+
+FIND_NEAREST = "Find Nearest"
+FIND_ROUTE = "Find Route"
+INVALID = "Invalid"
+MODES = (FIND_NEAREST, FIND_ROUTE, INVALID)
+INSTITUTION_TYPES = ("Primary School", "Secondary School", "University", "School", "Library")
+
+INTENT_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "mode": {"type": "STRING", "format": "enum", "enum": list(MODES)},
+        "origin": {"type": "STRING", "nullable": True},
+        "destination": {"type": "STRING", "nullable": True},
+        "institution_type": {"type": "STRING", "format": "enum", "enum": list(INSTITUTION_TYPES), "nullable": True},
+        "valid": {"type": "BOOLEAN"},
+    },
+    "required": ["mode", "valid"],
+}
+
+
+@dataclass
+class LocatorIntent:
+    mode: str
+    origin: Optional[str]
+    destination: Optional[str]
+    institution_type: Optional[str]
+    valid: bool
+
+    @property
+    def uses_current_location(self):
+        return not self.origin
+
+    @property
+    def place_type(self):
+        """Places API type, e.g. "Primary School" -> "primary_school"."""
+        return self.institution_type.lower().replace(" ", "_") if self.institution_type else None
+
+
+def _clean(value):
+    if not isinstance(value, str):
+        return None
+    value = value.strip()
+    return value if value and value.lower() not in ("null", "none", "n/a") else None
+
+
+def intent_from_json(text):
+    """Build a LocatorIntent from the model's JSON, treating anything malformed as invalid."""
+    try:
+        data = json.loads(text)
+    except (TypeError, ValueError):
+        return LocatorIntent(INVALID, None, None, None, False)
+    if not isinstance(data, dict):
+        return LocatorIntent(INVALID, None, None, None, False)
+
+    mode = data.get("mode") if data.get("mode") in MODES else INVALID
+    institution_type = data.get("institution_type") if data.get("institution_type") in INSTITUTION_TYPES else None
+    valid = bool(data.get("valid")) and mode != INVALID
+    return LocatorIntent(mode, _clean(data.get("origin")), _clean(data.get("destination")), institution_type, valid)
+
+
+def parse_intent(model, user_input):
+    prompt = f"""
+    Extract the intent of this request to an educational institution locator: "{user_input}"
+    - mode: 'Find Nearest' to search for institutions near a location, 'Find Route' for directions to a specific institution, otherwise 'Invalid'.
+    - origin: the starting location if one that exists in Google Maps is mentioned, otherwise null (the user's current location is used).
+    - destination: for 'Find Route', the ending location only, otherwise null.
+    - institution_type: the kind of education institution mentioned, one of {', '.join(INSTITUTION_TYPES)}, otherwise null.
+    - valid: true only if the request is about an education institution that exists in Google Maps.
+    """
+    response = model.generate_content(
+        prompt,
+        generation_config={"response_mime_type": "application/json", "response_schema": INTENT_SCHEMA},
+    )
+    return intent_from_json(response.text)
@@ -0,0 +1,159 @@
+"""Persistent, content-addressed cache for Gemini responses.
+
+Entries are keyed by model name, generation config and a hash of the prompt,
+stored in SQLite, and evicted by TTL and least-recent use.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+
+CACHE_PATH = os.path.join(".studybudd", "llm_cache.db")
+DEFAULT_TTL = 7 * 24 * 60 * 60  # One week
+DEFAULT_MAX_ENTRIES = 5000
+
+# Prompts such as activity_prompt embed the current day, so their answers
+# are only valid until midnight.
+TODAY_PATTERN = re.compile(r"Today is (\d{4}-\d{2}-\d{2})")
+
+
+class CachedResponse:
+    """Minimal stand-in for a genai response; callers only read `.text`."""
+
+    def __init__(self, text):
+        self.text = text
+
+
+class ResponseCache:
+    def __init__(self, path=CACHE_PATH, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses (last_access)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def make_key(model_name, generation_config, prompt):
+        prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        payload = json.dumps([model_name, generation_config or {}, prompt_hash], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _expiry_for(self, prompt, now):
+        expires_at = now + self.ttl
+        match = TODAY_PATTERN.search(prompt)
+        if match:
+            # Date-aware invalidation: "Today is ..." answers die at the end of that day
+            day = datetime.strptime(match.group(1), "%Y-%m-%d")
+            expires_at = min(expires_at, (day + timedelta(days=1)).timestamp())
+        return expires_at
+
+    def get(self, key):
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT response, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def set(self, key, model_name, prompt, response):
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model_name, response, now, self._expiry_for(prompt, now), now),
+            )
+            self._evict(conn, now)
+
+    def _evict(self, conn, now):
+        conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+        # LRU size bound: keep only the most recently used entries
+        conn.execute(
+            """
+            DELETE FROM responses WHERE key IN (
+                SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_entries,),
+        )
+
+    def cached_call(self, model_name, generation_config, prompt, call):
+        """Return the cached response for this prompt, or run `call()` and store it."""
+        key = self.make_key(model_name, generation_config, prompt)
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+        response = call()
+        if response is not None:
+            self.set(key, model_name, prompt, response)
+        return response
+
+    def cached_stream(self, model_name, generation_config, prompt, stream):
+        """Like cached_call for a chunk generator: replay the cached text or stream and store it."""
+        key = self.make_key(model_name, generation_config, prompt)
+        cached = self.get(key)
+        if cached is not None:
+            yield cached
+            return
+        chunks = []
+        for chunk in stream():
+            chunks.append(chunk)
+            yield chunk
+        if chunks:
+            self.set(key, model_name, prompt, "".join(chunks))
+
+    def clear(self):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM responses")
+
+
+class CachedModel:
+    """Wraps a `genai.GenerativeModel` so `generate_content` goes through the cache."""
+
+    def __init__(self, model, cache):
+        self.model = model
+        self.cache = cache
+
+    def generate_content(self, prompt, generation_config=None):
+        text = self.cache.cached_call(
+            self.model.model_name,
+            generation_config,
+            prompt,
+            lambda: self.model.generate_content(prompt, generation_config=generation_config).text,
+        )
+        return CachedResponse(text)
@@ -0,0 +1,124 @@
+"""Folium maps for the locator, rendered once per route or place set.
+
+Routes are simplified with a vectorized Douglas–Peucker pass whose tolerance
+is a fraction of a pixel a few zoom levels past the one that fits the whole
+route, so long routes stay visually identical when the user zooms in while
+the page shrinks. Rendered HTML is
+cached by encoded polyline or place set.
+"""
+import math
+from functools import lru_cache
+
+import folium
+import numpy as np
+import polyline
+
+
+EARTH_RADIUS_M = 6371008.8
+MAP_WIDTH = 700
+MAP_HEIGHT = 500
+MAX_ZOOM = 18
+# Zoom levels past the fitted view at which the simplified route still holds up
+ZOOM_HEADROOM = 3
+DEFAULT_PIXEL_TOLERANCE = 1.0
+SATELLITE_TILES = "https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}"
+
+
+def project(points):
+    """Equirectangular projection of (lat, lng) rows to metres around their mean latitude."""
+    points = np.asarray(points, dtype=float)
+    latitudes = np.radians(points[:, 0])
+    longitudes = np.radians(points[:, 1])
+    scale = math.cos(float(latitudes.mean()))
+    return np.column_stack((longitudes * scale, latitudes)) * EARTH_RADIUS_M
+
+
+def simplify(points, tolerance_m):
+    """Douglas–Peucker simplification; returns the kept (lat, lng) rows in order."""
+    points = np.asarray(points, dtype=float)
+    if len(points) < 3 or tolerance_m <= 0:
+        return points
+    xy = project(points)
+    keep = np.zeros(len(points), dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        segment = xy[end] - xy[start]
+        offsets = xy[start + 1:end] - xy[start]
+        length = np.hypot(*segment)
+        if length == 0:
+            distances = np.hypot(offsets[:, 0], offsets[:, 1])
+        else:
+            # Perpendicular distance of every inner point to the chord at once
+            distances = np.abs(segment[0] * offsets[:, 1] - segment[1] * offsets[:, 0]) / length
+        farthest = int(distances.argmax())
+        if distances[farthest] > tolerance_m:
+            split = start + 1 + farthest
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return points[keep]
+
+
+def fit_zoom(points, width=MAP_WIDTH, height=MAP_HEIGHT):
+    """Largest web-mercator zoom at which all points fit in a `width` x `height` map."""
+    points = np.asarray(points, dtype=float)
+    lat_min, lng_min = points.min(axis=0)
+    lat_max, lng_max = points.max(axis=0)
+
+    def mercator_y(latitude):
+        sine = math.sin(math.radians(latitude))
+        return math.log((1 + sine) / (1 - sine)) / 2
+
+    lng_fraction = (lng_max - lng_min) / 360
+    lat_fraction = (mercator_y(lat_max) - mercator_y(lat_min)) / (2 * math.pi)
+    zooms = [MAX_ZOOM]
+    if lng_fraction > 0:
+        zooms.append(math.log2(width / 256 / lng_fraction))
+    if lat_fraction > 0:
+        zooms.append(math.log2(height / 256 / lat_fraction))
+    return max(0, min(MAX_ZOOM, int(math.floor(min(zooms)))))
+
+
+def metres_per_pixel(latitude, zoom):
+    return 2 * math.pi * EARTH_RADIUS_M * math.cos(math.radians(latitude)) / (256 * 2 ** zoom)
+
+
+def base_map(location, zoom):
+    m = folium.Map(location=location, zoom_start=zoom)
+    folium.TileLayer(tiles=SATELLITE_TILES, attr="Esri", name="Satellite").add_to(m)
+    folium.TileLayer("OpenStreetMap").add_to(m)
+    return m
+
+
+def render(m):
+    """HTML for `st.components.v1.html`, as `folium_static` would produce."""
+    return folium.Figure().add_child(m).render()
+
+
+@lru_cache(maxsize=32)
+def route_map_html(encoded_polyline, pixel_tolerance=DEFAULT_PIXEL_TOLERANCE):
+    """Render a route map; returns (html, decoded point count, drawn point count)."""
+    points = np.asarray(polyline.decode(encoded_polyline), dtype=float)
+    zoom = fit_zoom(points)
+    center = (points.min(axis=0) + points.max(axis=0)) / 2
+    detail_zoom = min(MAX_ZOOM, zoom + ZOOM_HEADROOM)
+    simplified = simplify(points, pixel_tolerance * metres_per_pixel(center[0], detail_zoom))
+
+    m = base_map(center.tolist(), zoom)
+    folium.PolyLine(locations=simplified.tolist(), color="blue", weight=5).add_to(m)
+    folium.LayerControl().add_to(m)
+    return render(m), len(points), len(simplified)
+
+
+@lru_cache(maxsize=32)
+def places_map_html(center, places):
+    """Render markers for `places`, a tuple of (name, lat, lng), around `center`."""
+    m = base_map(list(center), 14)
+    for name, latitude, longitude in places:
+        folium.Marker([latitude, longitude], tooltip=name, popup=name).add_to(m)
+    folium.LayerControl().add_to(m)
+    return render(m)
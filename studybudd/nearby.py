@@ -0,0 +1,150 @@
+"""Candidate search and ranking for the nearest-institution locator.
+
+Nearby Search returns up to three pages of 20 places in prominence order,
+chained by `next_page_token` (a new token only works after a short delay).
+Candidates are measured with a vectorized haversine. The radius widens
+only while too few candidates lie inside it and the last page had no
+`next_page_token`, i.e. the smaller radius returned every place it holds.
+Only the closest few are ranked by travel time, with a single
+`distance_matrix` call, so a search costs at most `len(RADII) * MAX_PAGES`
+nearby requests plus one matrix request.
+"""
+import time
+
+import googlemaps
+import numpy as np
+
+
+RADII = (5000, 10000, 20000, 40000)  # Metres; Nearby Search allows up to 50 km
+MAX_PAGES = 3
+MIN_CANDIDATES = 5
+RANKED_CANDIDATES = 10
+TOKEN_RETRIES = 5
+TOKEN_DELAY = 1.0  # Seconds to wait for a fresh page token to become valid
+TOKEN_LIFETIME = 60  # Seconds a page token is trusted to still work after its page was fetched
+EARTH_RADIUS = 6371008.8  # Metres
+
+
+def haversine(latitude, longitude, latitudes, longitudes):
+    """Great-circle distances in metres from one point to arrays of points."""
+    lat1, lng1 = np.radians(latitude), np.radians(longitude)
+    lat2, lng2 = np.radians(np.asarray(latitudes, dtype=float)), np.radians(np.asarray(longitudes, dtype=float))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(a))
+
+
+def _is_fresh(response):
+    """Whether a page's token may just not be valid yet; pages from the geo cache carry their fetch time."""
+    return time.time() - response.get("fetched_at", time.time()) < TOKEN_LIFETIME
+
+
+def _next_page(client, token, fresh):
+    """The page after the one that returned `token`, or None if it cannot be fetched.
+
+    A new token is rejected for a short while, so INVALID_REQUEST is retried
+    only while the token is fresh; an expired one never becomes valid.
+    """
+    retries = TOKEN_RETRIES if fresh else 1
+    for attempt in range(retries):
+        try:
+            return client.places_nearby(page_token=token)
+        except googlemaps.exceptions.ApiError as e:
+            if e.status != "INVALID_REQUEST" or attempt == retries - 1:
+                print(f"Details: nearby page failed: {e}")
+                return None
+            time.sleep(TOKEN_DELAY)
+
+
+def _search(client, latitude, longitude, radius, place_type, max_pages, refresh=False):
+    """Results of up to `max_pages` pages for one radius, and the token for the page after them (or None)."""
+    options = {"refresh": True} if refresh else {}
+    response = client.places_nearby(location=f"{latitude}, {longitude}", radius=radius, type=place_type, **options)
+    results = list(response.get("results", []))
+    token = response.get("next_page_token")
+    for _ in range(max_pages - 1):
+        if not token:
+            break
+        fresh = _is_fresh(response)
+        response = _next_page(client, token, fresh)
+        if response is None:
+            if not fresh and not refresh:
+                # The cached page outlived its token; fetch the chain again as a cache miss
+                return _search(client, latitude, longitude, radius, place_type, max_pages, refresh=True)
+            return results, None
+        results.extend(response.get("results", []))
+        token = response.get("next_page_token")
+    return results, token
+
+
+def _place_key(place):
+    return place.get("place_id") or place["name"]
+
+
+def _measure(places, latitude, longitude, found):
+    """Add `places` to `found` (by place ID) with their straight-line `distance` in metres."""
+    places = {_place_key(place): place for place in places}
+    places = [(key, place) for key, place in places.items() if key not in found]
+    if not places:
+        return
+    distances = haversine(
+        latitude,
+        longitude,
+        [place["geometry"]["location"]["lat"] for _, place in places],
+        [place["geometry"]["location"]["lng"] for _, place in places],
+    )
+    for (key, place), distance in zip(places, distances):
+        found[key] = dict(place, distance=float(distance))
+
+
+def find_candidates(client, latitude, longitude, place_type, radii=RADII, min_candidates=MIN_CANDIDATES, max_pages=MAX_PAGES):
+    """Places of `place_type` inside the first radius holding `min_candidates` of them, closest first."""
+    found = {}
+    candidates = []
+    for radius in radii:
+        results, token = _search(client, latitude, longitude, radius, place_type, max_pages)
+        _measure(results, latitude, longitude, found)
+        candidates = sorted(
+            (place for place in found.values() if place["distance"] <= radius), key=lambda place: place["distance"]
+        )
+        if len(candidates) >= min_candidates or token:
+            # A chain cut off at `max_pages` means the radius already holds more places than are fetched
+            break
+    return candidates
+
+
+def _destination(place):
+    """Distance Matrix destination for a place: its place ID, else its coordinates."""
+    if place.get("place_id"):
+        return f"place_id:{place['place_id']}"
+    location = place["geometry"]["location"]
+    return f"{location['lat']},{location['lng']}"
+
+
+def rank_by_travel_time(client, latitude, longitude, candidates, mode="driving", limit=RANKED_CANDIDATES):
+    """Order the closest `limit` candidates by travel time, adding `duration` (seconds) and `travel` text.
+
+    The rest keep their straight-line order after them. If the Distance
+    Matrix call fails, the straight-line order is kept.
+    """
+    top, rest = candidates[:limit], candidates[limit:]
+    if not top:
+        return candidates
+    try:
+        matrix = client.distance_matrix(
+            [f"{latitude},{longitude}"], [_destination(place) for place in top], mode=mode
+        )
+        elements = matrix["rows"][0]["elements"]
+    except Exception as e:
+        print(f"Details: distance matrix failed: {e}")
+        return candidates
+    ranked = []
+    for place, element in zip(top, elements):
+        if element.get("status") == "OK":
+            place = dict(
+                place,
+                duration=element["duration"]["value"],
+                travel=f"{element['duration']['text']}, {element['distance']['text']}",
+            )
+        ranked.append(place)
+    ranked.sort(key=lambda place: (place.get("duration", float("inf")), place["distance"]))
+    return ranked + rest
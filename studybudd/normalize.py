@@ -0,0 +1,134 @@
+"""Local date/time normalization for study plan rows.
+
+Values are parsed column-at-a-time with pandas string ops. Only values that
+the local parser cannot read are handed to an optional fallback (Gemini),
+once per distinct string.
+"""
+import re
+
+import pandas as pd
+
+
+ISO_TIME_PATTERN = r"^\d{2}:\d{2}:\d{2}$"
+ISO_DATE_PATTERN = r"^\d{4}-\d{2}-\d{2}$"
+
+# 5pm, 5 pm, 5:30 p.m., 17:00, 17.00, 17:00:00, 1700
+TIME_PATTERN = (
+    r"^(?P<hour>\d{1,2})(?:[:.]?(?P<minute>\d{2}))?(?::(?P<second>\d{2}))?"
+    r"\s*(?:(?P<meridiem>[ap])\.?\s*m?\.?)?$"
+)
+WORD_TIMES = {
+    "noon": "12:00:00",
+    "midday": "12:00:00",
+    "midnight": "00:00:00",
+}
+
+
+def _clean_time_text(values):
+    text = pd.Series(values).astype("string").str.strip().str.lower()
+    # Drop a leading date ("2025-04-01 17:00:00") and trailing "o'clock"/"hrs"
+    text = text.str.replace(r"^\d{4}-\d{2}-\d{2}[ t]", "", regex=True)
+    text = text.str.replace(r"\s*(?:o'?clock|hrs?|hours)$", "", regex=True)
+    return text
+
+
+def parse_time_column(values):
+    """Parse a column of free-form times into "HH:MM:SS" strings (NA if unparseable)."""
+    text = _clean_time_text(values)
+    result = text.map(WORD_TIMES).astype("string")
+
+    parts = text.str.extract(TIME_PATTERN)
+    hour = pd.to_numeric(parts["hour"], errors="coerce")
+    minute = pd.to_numeric(parts["minute"], errors="coerce").fillna(0)
+    second = pd.to_numeric(parts["second"], errors="coerce").fillna(0)
+    meridiem = parts["meridiem"]
+
+    is_pm = meridiem.eq("p").fillna(False)
+    is_am = meridiem.eq("a").fillna(False)
+    valid = hour.notna() & minute.between(0, 59) & second.between(0, 59)
+    # A 12-hour clock reading cannot go past 12
+    valid &= ~((is_pm | is_am) & ((hour > 12) | (hour == 0)))
+
+    hour = hour.where(~(is_pm & (hour < 12)), hour + 12)
+    hour = hour.where(~(is_am & (hour == 12)), 0)
+    valid &= hour.between(0, 23) & result.isna()
+
+    if valid.any():
+        result[valid] = (
+            hour[valid].astype(int).astype(str).str.zfill(2)
+            + ":" + minute[valid].astype(int).astype(str).str.zfill(2)
+            + ":" + second[valid].astype(int).astype(str).str.zfill(2)
+        )
+    return result
+
+
+def parse_time(value):
+    """Single-value convenience wrapper around parse_time_column."""
+    if value is None:
+        return None
+    parsed = parse_time_column([value]).iloc[0]
+    return None if pd.isna(parsed) else parsed
+
+
+def parse_date_column(values):
+    """Parse a column of dates into "YYYY-MM-DD" strings (NA if unparseable)."""
+    dates = pd.to_datetime(pd.Series(values), errors="coerce", format="mixed")
+    return dates.dt.strftime("%Y-%m-%d").astype("string")
+
+
+def _resolve_with_fallback(values, parsed, fallback, parse_response):
+    unresolved = parsed.isna() & values.notna()
+    if fallback is None or not unresolved.any():
+        return parsed
+
+    raw = values[unresolved].astype(str).str.strip()
+    # Each distinct string is sent to the fallback exactly once
+    answers = {}
+    for value in raw.unique():
+        response = fallback(value)
+        answers[value] = parse_response(response) if response else None
+
+    parsed = parsed.copy()
+    parsed[unresolved] = raw.map(answers)
+    return parsed.astype("string")
+
+
+def normalize_time_column(values, fallback=None):
+    """Normalize times locally, sending only unparseable distinct values to `fallback`."""
+    values = pd.Series(values)
+    if values.astype("string").str.fullmatch(ISO_TIME_PATTERN).fillna(False).all():
+        # Already normalized by an earlier sync
+        return values.astype("string")
+    parsed = parse_time_column(values)
+    return _resolve_with_fallback(values, parsed, fallback, parse_time)
+
+
+def normalize_date_column(values, fallback=None):
+    values = pd.Series(values)
+    if values.astype("string").str.fullmatch(ISO_DATE_PATTERN).fillna(False).all():
+        return values.astype("string")
+    parsed = parse_date_column(values)
+
+    def parse_response(response):
+        match = re.search(r"\d{4}-\d{2}-\d{2}", response)
+        return match.group(0) if match else None
+
+    return _resolve_with_fallback(values, parsed, fallback, parse_response)
+
+
+def normalize_plan(df, time_fallback=None, date_fallback=None):
+    """Return a copy of `df` with ISO Date/Time Start/Time End and a mask of rows that changed."""
+    normalized = df.copy()
+    changed = pd.Series(False, index=df.index)
+    for column, normalize, fallback in (
+        ("Date", normalize_date_column, date_fallback),
+        ("Time Start", normalize_time_column, time_fallback),
+        ("Time End", normalize_time_column, time_fallback),
+    ):
+        if column not in df.columns:
+            continue
+        values = normalize(df[column], fallback)
+        original = df[column].astype("string")
+        changed |= (values.notna() & (values != original)).fillna(False)
+        normalized[column] = values.where(values.notna(), df[column])
+    return normalized, changed
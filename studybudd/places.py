@@ -0,0 +1,104 @@
+"""Validation of Places API results for the educational institution locator.
+
+Candidates are checked by Gemini either concurrently (one prompt per place on
+a bounded thread pool) or in a single batch prompt, with a JSON verdict per
+place in both modes. Both modes keep the API's result order and stop once enough valid
+places are known.
+"""
+import json
+import re
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from studybudd.tracing import in_trace_context
+
+
+MAX_PLACES = 5
+MAX_WORKERS = 8
+
+
+VERDICT_CONFIG = {
+    "response_mime_type": "application/json",
+    "response_schema": {"type": "OBJECT", "properties": {"valid": {"type": "BOOLEAN"}}, "required": ["valid"]},
+}
+
+
+def _validation_prompt(name, place_type):
+    return f'Is \'{name}\' really a {place_type}? Respond with a JSON object {{"valid": <true or false>}}.'
+
+
+def _is_valid(response_text):
+    """The model's verdict; a reply that is not the requested JSON only counts if its first word is "yes"."""
+    try:
+        verdict = json.loads(response_text)
+    except (TypeError, ValueError):
+        words = re.findall(r"[a-z]+", (response_text or "").lower())
+        return bool(words) and words[0] == "yes"
+    return isinstance(verdict, dict) and verdict.get("valid") is True
+
+
+def _accepted_prefix(places, verdicts, limit):
+    """Valid places from the longest decided prefix, or None if that is not yet enough."""
+    accepted = []
+    for index, place in enumerate(places):
+        if index not in verdicts:
+            return None
+        if verdicts[index]:
+            accepted.append(place)
+            if len(accepted) == limit:
+                return accepted
+    return accepted
+
+
+def validate_concurrently(model, places, place_type, limit=MAX_PLACES, max_workers=MAX_WORKERS):
+    """Validate places on a bounded pool, returning the first `limit` valid ones in order."""
+    if not places:
+        return []
+    verdicts = {}
+    generate = in_trace_context(model.generate_content)
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {
+            executor.submit(generate, _validation_prompt(place["name"], place_type), generation_config=VERDICT_CONFIG): index
+            for index, place in enumerate(places)
+        }
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    verdicts[futures[future]] = _is_valid(future.result().text)
+                except Exception as e:
+                    print(f"Details: {e}")
+                    verdicts[futures[future]] = False
+            accepted = _accepted_prefix(places, verdicts, limit)
+            if accepted is not None and len(accepted) == limit:
+                return accepted
+        return _accepted_prefix(places, verdicts, limit)
+    finally:
+        # Don't wait for validations that are no longer needed
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def validate_in_batch(model, places, place_type, limit=MAX_PLACES):
+    """Validate every place with one structured prompt returning a JSON verdict per place."""
+    if not places:
+        return []
+    listing = "\n".join(f"{index}. {place['name']}" for index, place in enumerate(places))
+    prompt = (
+        f"For each numbered place below, decide whether it really is a {place_type}.\n"
+        f"{listing}\n"
+        'Respond with a JSON array of objects {"index": <number>, "valid": <true or false>}, one per place.'
+    )
+    response = model.generate_content(prompt, generation_config={"response_mime_type": "application/json"})
+    try:
+        verdicts = {int(item["index"]): bool(item["valid"]) for item in json.loads(response.text)}
+    except (TypeError, ValueError, KeyError) as e:
+        print(f"Details: {e}")
+        return validate_concurrently(model, places, place_type, limit)
+    return [place for index, place in enumerate(places) if verdicts.get(index)][:limit]
+
+
+def validate_places(model, places, place_type, limit=MAX_PLACES, batch=False):
+    if batch:
+        return validate_in_batch(model, places, place_type, limit)
+    return validate_concurrently(model, places, place_type, limit)
@@ -0,0 +1,447 @@
+"""SQLite storage for the study plan.
+
+The plan lives in a WAL-mode SQLite database with an autoincrement ID, so
+inserts are a single row write and concurrent sessions cannot hand out the
+same `ID-n`. StudyPlanner.xlsx is imported once and can be re-exported on
+demand as an interchange format.
+"""
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, time as dt_time
+
+import openpyxl
+import pandas as pd
+
+from studybudd.scheduling import PlanIntervals
+from studybudd.tracing import traced
+
+
+DB_PATH = "StudyPlanner.db"
+SHEET_NAME = "Study_Plan"
+PLAN_COLUMNS = ["ID", "Event", "Date", "Time Start", "Time End", "Priority", "Notes"]
+
+TIMED_COLUMNS = ["Date", "Time Start", "Time End"]
+
+# Display column -> database column
+FIELDS = {
+    "Event": "event",
+    "Date": "date",
+    "Time Start": "time_start",
+    "Time End": "time_end",
+    "Priority": "priority",
+    "Notes": "notes",
+}
+
+
+SELECT_PLAN = "SELECT 'ID-' || id AS ID, " + ", ".join(f'{column} AS "{name}"' for name, column in FIELDS.items()) + " FROM plan"
+
+
+def parse_plan_id(plan_id):
+    """`"ID-12"` -> 12, or None for anything else."""
+    if isinstance(plan_id, str) and plan_id.startswith("ID-") and plan_id[3:].isdigit():
+        return int(plan_id[3:])
+    return None
+
+
+def format_plan_id(row_id):
+    return f"ID-{row_id}"
+
+
+def cell_text(value):
+    """Normalize a spreadsheet/DataFrame cell into the text stored in SQLite."""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, (datetime, pd.Timestamp)):
+        return value.strftime("%Y-%m-%d") if value.time() == dt_time() else value.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, date):
+        return value.strftime("%Y-%m-%d")
+    if isinstance(value, dt_time):
+        return value.strftime("%H:%M:%S")
+    return str(value).strip()
+
+
+def _row_values(row):
+    return tuple(cell_text(row.get(name)) for name in FIELDS)
+
+
+def diff_plan(original, edited):
+    """Row-level diff keyed on `ID`: returns (inserted rows, updated rows, deleted IDs)."""
+    before = {row["ID"]: _row_values(row) for _, row in original.iterrows()}
+    if edited.empty:
+        return edited, edited, list(before)
+    known = edited["ID"].isin(list(before))
+
+    # Rows added in the editor have no ID yet; ignore ones left completely blank
+    blank = edited.apply(lambda row: all(value is None for value in _row_values(row)), axis=1)
+    inserted = edited[~known & ~blank]
+
+    changed = edited.apply(lambda row: row["ID"] in before and before[row["ID"]] != _row_values(row), axis=1)
+    updated = edited[known & changed]
+
+    kept = set(edited.loc[known, "ID"])
+    deleted = [plan_id for plan_id in before if plan_id not in kept]
+    return inserted, updated, deleted
+
+
+def rebase_updates(original, updated, current):
+    """Re-apply `updated` rows onto `current`, taking only the cells that differ from `original`.
+
+    Cells changed elsewhere since `original` was read are kept unless they
+    were edited too; rows deleted since then are dropped.
+    """
+    before = {row["ID"]: row for _, row in original.iterrows()}
+    latest = {row["ID"]: row for _, row in current.iterrows()}
+    rows = []
+    for _, row in updated.iterrows():
+        if row["ID"] not in latest:
+            continue
+        merged = latest[row["ID"]].copy()
+        for name in FIELDS:
+            if cell_text(row.get(name)) != cell_text(before[row["ID"]].get(name)):
+                merged[name] = row[name]
+        rows.append(merged)
+    return pd.DataFrame(rows, columns=PLAN_COLUMNS)
+
+
+class PlanStore:
+    def __init__(self, path=DB_PATH, xlsx_path=None):
+        self.path = path
+        self._intervals = None
+        self._intervals_lock = threading.Lock()
+        self.duplicate_ids = []  # IDs the workbook import found more than once
+        with self._connect() as conn:
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS plan (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    event TEXT,
+                    date TEXT,
+                    time_start TEXT,
+                    time_end TEXT,
+                    priority TEXT,
+                    notes TEXT,
+                    updated_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_plan_date ON plan (date);
+                CREATE INDEX IF NOT EXISTS idx_plan_priority ON plan (priority);
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                );
+                """
+            )
+        if xlsx_path and os.path.exists(xlsx_path):
+            self.import_xlsx(xlsx_path)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _bump_version(conn):
+        """Bump the write counter inside the caller's transaction and return its new value."""
+        conn.execute(
+            "INSERT INTO meta VALUES ('version', 1) "
+            "ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+        )
+        return int(conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0])
+
+    def intervals(self):
+        """Interval index of dated, timed rows; rebuilt only when another process wrote to the plan."""
+        version = self.version()
+        with self._intervals_lock:
+            if self._intervals is None or self._intervals.version != version:
+                with self._connect() as conn:
+                    df = pd.read_sql_query(
+                        "SELECT 'ID-' || id AS ID, date AS \"Date\", time_start AS \"Time Start\", "
+                        "time_end AS \"Time End\" FROM plan WHERE date IS NOT NULL AND time_start IS NOT NULL",
+                        conn,
+                    )
+                self._intervals = PlanIntervals.from_frame(df, version)
+            return self._intervals
+
+    def _drop_intervals(self):
+        """Forget the interval index; it is rebuilt on next use."""
+        with self._intervals_lock:
+            self._intervals = None
+
+    def _update_intervals(self, version, upserted=None, deleted=()):
+        """Apply one committed write to the interval index, or drop it if writes interleaved."""
+        with self._intervals_lock:
+            index = self._intervals
+            if index is None:
+                return
+            if index.version != version - 1:
+                self._intervals = None
+                return
+            index.remove(deleted)
+            if upserted is not None and not upserted.empty:
+                index.upsert(upserted)
+            index.version = version
+
+    def version(self):
+        """Counter bumped by every write, for keying caches of plan reads."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        return int(row[0]) if row else 0
+
+    @traced("storage", "plan.import_xlsx")
+    def import_xlsx(self, xlsx_path, sheet_name=SHEET_NAME, force=False):
+        """Copy the plan sheet into SQLite once; returns the number of rows imported."""
+        wb = openpyxl.load_workbook(xlsx_path, read_only=True)
+        try:
+            if sheet_name not in wb.sheetnames:
+                return 0
+            rows = wb[sheet_name].iter_rows(values_only=True)
+            headers = [cell_text(value) for value in next(rows, [])]
+            records = [dict(zip(headers, values)) for values in rows]
+        finally:
+            wb.close()
+
+        now = time.time()
+        with self._connect() as conn:
+            # BEGIN IMMEDIATE so two sessions starting together don't both import
+            conn.execute("BEGIN IMMEDIATE")
+            if not force and conn.execute("SELECT 1 FROM meta WHERE key = 'imported_from'").fetchone():
+                return 0
+            keyed, unkeyed, duplicates = {}, [], []
+            for record in records:
+                if all(cell_text(value) is None for value in record.values()):
+                    continue
+                values = [cell_text(record.get(column)) for column in FIELDS] + [now]
+                plan_id = parse_plan_id(record.get("ID"))
+                if plan_id is None:
+                    unkeyed.append(values)
+                elif plan_id in keyed:
+                    # Keep the row under a new ID rather than overwrite the first one
+                    duplicates.append(f"ID-{plan_id}")
+                    unkeyed.append(values)
+                else:
+                    keyed[plan_id] = values
+            # Rows with their own IDs first, so new IDs are allocated above all of them
+            conn.executemany(
+                "INSERT OR REPLACE INTO plan (id, event, date, time_start, time_end, priority, notes, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [[plan_id] + values for plan_id, values in keyed.items()],
+            )
+            conn.executemany(
+                "INSERT INTO plan (event, date, time_start, time_end, priority, notes, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                unkeyed,
+            )
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('imported_from', ?)", (os.path.abspath(xlsx_path),))
+            self._bump_version(conn)
+        if duplicates:
+            print(f"Details: {xlsx_path} repeats {', '.join(sorted(set(duplicates)))}; the repeats were given new IDs")
+        self.duplicate_ids = sorted(set(duplicates))
+        self._drop_intervals()
+        return len(keyed) + len(unkeyed)
+
+    @traced("storage", "plan.add")
+    def add(self, event_name, event_date, event_time_start, event_time_end, priority, notes):
+        """Append one activity and return its new `ID-n`."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO plan (event, date, time_start, time_end, priority, notes, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [cell_text(value) for value in (event_name, event_date, event_time_start, event_time_end, priority, notes)]
+                + [time.time()],
+            )
+            version = self._bump_version(conn)
+        plan_id = format_plan_id(cursor.lastrowid)
+        self._update_intervals(version, pd.DataFrame(
+            [{"ID": plan_id, "Date": event_date, "Time Start": event_time_start, "Time End": event_time_end}]
+        ))
+        return plan_id
+
+    @traced("storage", "plan.add_many")
+    def add_many(self, df):
+        """Append every row of `df` in one transaction and return their new `ID-n` values in order."""
+        if df.empty:
+            return []
+        now = time.time()
+        with self._connect() as conn:
+            # Reserve the whole ID range once instead of per row
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'plan'").fetchone()
+            start = max(row[0] if row else 0, conn.execute("SELECT COALESCE(MAX(id), 0) FROM plan").fetchone()[0])
+            row_ids = list(range(start + 1, start + len(df) + 1))
+            conn.executemany(
+                "INSERT INTO plan (id, event, date, time_start, time_end, priority, notes, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    [row_id] + [cell_text(row.get(name)) for name in FIELDS] + [now]
+                    for row_id, (_, row) in zip(row_ids, df.iterrows())
+                ],
+            )
+            version = self._bump_version(conn)
+        plan_ids = [format_plan_id(row_id) for row_id in row_ids]
+        self._update_intervals(version, df.assign(ID=plan_ids))
+        return plan_ids
+
+    @traced("storage", "plan.load")
+    def load(self):
+        """The whole plan as a DataFrame with the spreadsheet's column names."""
+        with self._connect() as conn:
+            df = pd.read_sql_query(f"{SELECT_PLAN} ORDER BY plan.id", conn)
+        return df[PLAN_COLUMNS]
+
+    @traced("storage", "plan.query")
+    def query(self, start_date=None, end_date=None, priorities=None, text=None, limit=None, offset=0):
+        """One page of rows matching the filters; returns (page DataFrame, total matching rows).
+
+        Dates compare as ISO text, so rows whose date is not yet normalized
+        only match when no date range is given.
+        """
+        conditions, params = [], []
+        if start_date:
+            conditions.append("date >= ?")
+            params.append(str(start_date))
+        if end_date:
+            conditions.append("date <= ?")
+            params.append(str(end_date))
+        if priorities:
+            conditions.append(f"priority IN ({', '.join('?' * len(priorities))})")
+            params.extend(priorities)
+        if text:
+            pattern = "%" + text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            conditions.append("(event LIKE ? ESCAPE '\\' OR notes LIKE ? ESCAPE '\\')")
+            params.extend([pattern, pattern])
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        with self._connect() as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM plan{where}", params).fetchone()[0]
+            df = pd.read_sql_query(
+                f"{SELECT_PLAN}{where} ORDER BY plan.id LIMIT ? OFFSET ?",
+                conn,
+                params=params + [-1 if limit is None else limit, offset],
+            )
+        return df[PLAN_COLUMNS], total
+
+    @traced("storage", "plan.load_ids")
+    def load_ids(self, plan_ids):
+        """Rows for the given `ID-n` values, in ID order."""
+        row_ids = [row_id for row_id in map(parse_plan_id, plan_ids) if row_id is not None]
+        frames = []
+        with self._connect() as conn:
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(row_ids), 500):
+                chunk = row_ids[start:start + 500]
+                frames.append(pd.read_sql_query(
+                    f"{SELECT_PLAN} WHERE id IN ({', '.join('?' * len(chunk))})", conn, params=chunk
+                ))
+        if not frames:
+            return pd.DataFrame(columns=PLAN_COLUMNS)
+        df = pd.concat(frames, ignore_index=True)
+        return df.sort_values("ID", key=lambda ids: ids.map(parse_plan_id), ignore_index=True)[PLAN_COLUMNS]
+
+    def modified_times(self, plan_ids):
+        """`{plan_id: updated_at}` (epoch seconds of the last write) for existing rows."""
+        row_ids = [row_id for row_id in map(parse_plan_id, plan_ids) if row_id is not None]
+        times = {}
+        with self._connect() as conn:
+            for start in range(0, len(row_ids), 500):
+                chunk = row_ids[start:start + 500]
+                rows = conn.execute(f"SELECT id, updated_at FROM plan WHERE id IN ({', '.join('?' * len(chunk))})", chunk)
+                times.update((format_plan_id(row_id), updated_at) for row_id, updated_at in rows)
+        return times
+
+    def priorities(self):
+        with self._connect() as conn:
+            rows = conn.execute("SELECT DISTINCT priority FROM plan WHERE priority IS NOT NULL ORDER BY priority")
+            return [priority for (priority,) in rows]
+
+    @traced("storage", "plan.update_rows")
+    def update_rows(self, df, expected=None):
+        """Update the columns present in `df` for each row, matched on its `ID`.
+
+        With `expected` (the same rows before the change), a row is only
+        updated while its stored values in those columns still match.
+        """
+        columns = [name for name in FIELDS if name in df.columns]
+        if df.empty or not columns:
+            return
+        assignments = ", ".join(f"{FIELDS[name]} = ?" for name in columns)
+        condition = "".join(f" AND {FIELDS[name]} IS ?" for name in columns) if expected is not None else ""
+        now = time.time()
+        params = [
+            [cell_text(row[name]) for name in columns] + [now, parse_plan_id(row["ID"])]
+            + ([cell_text(expected.at[index, name]) for name in columns] if expected is not None else [])
+            for index, row in df.iterrows()
+            if parse_plan_id(row["ID"]) is not None
+        ]
+        with self._connect() as conn:
+            cursor = conn.executemany(f"UPDATE plan SET {assignments}, updated_at = ? WHERE id = ?{condition}", params)
+            version = self._bump_version(conn)
+        timed = [name for name in TIMED_COLUMNS if name in columns]
+        if cursor.rowcount != len(params):
+            # Some rows changed in the meantime and were left alone
+            self._drop_intervals()
+        elif len(timed) == len(TIMED_COLUMNS):
+            self._update_intervals(version, df)
+        elif timed:
+            # Only part of a row's time changed; rebuild on next use
+            self._drop_intervals()
+        else:
+            self._update_intervals(version)
+
+    @traced("storage", "plan.apply_changes")
+    def apply_changes(self, inserted, updated, deleted):
+        """Apply a `diff_plan` result in a single transaction."""
+        now = time.time()
+        assignments = ", ".join(f"{column} = ?" for column in FIELDS.values())
+        with self._connect() as conn:
+            inserted_ids = [
+                format_plan_id(conn.execute(
+                    "INSERT INTO plan (event, date, time_start, time_end, priority, notes, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [cell_text(row.get(name)) for name in FIELDS] + [now],
+                ).lastrowid)
+                for _, row in inserted.iterrows()
+            ]
+            conn.executemany(
+                f"UPDATE plan SET {assignments}, updated_at = ? WHERE id = ?",
+                [
+                    [cell_text(row.get(name)) for name in FIELDS] + [now, parse_plan_id(row["ID"])]
+                    for _, row in updated.iterrows()
+                ],
+            )
+            conn.executemany(
+                "DELETE FROM plan WHERE id = ?",
+                [(parse_plan_id(plan_id),) for plan_id in deleted if parse_plan_id(plan_id) is not None],
+            )
+            version = self._bump_version(conn)
+        changed = [frame for frame in (inserted.assign(ID=inserted_ids), updated) if not frame.empty]
+        self._update_intervals(version, pd.concat(changed, ignore_index=True) if changed else None, deleted)
+
+    @traced("storage", "plan.export_xlsx")
+    def export_xlsx(self, xlsx_path, sheet_name=SHEET_NAME):
+        """Write the plan to `sheet_name` in `xlsx_path`, leaving any other sheets untouched."""
+        df = self.load()
+        if os.path.exists(xlsx_path):
+            wb = openpyxl.load_workbook(xlsx_path)
+            if sheet_name in wb.sheetnames:
+                index = wb.sheetnames.index(sheet_name)
+                wb.remove(wb[sheet_name])
+                sheet = wb.create_sheet(sheet_name, index)
+            else:
+                sheet = wb.create_sheet(sheet_name)
+        else:
+            wb = openpyxl.Workbook()
+            sheet = wb.active
+            sheet.title = sheet_name
+
+        sheet.append(PLAN_COLUMNS)
+        for row in df.itertuples(index=False):
+            sheet.append([None if pd.isna(value) else value for value in row])
+        wb.save(xlsx_path)
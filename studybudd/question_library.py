@@ -0,0 +1,182 @@
+"""Saved practice question sets and their solutions.
+
+Each generated set is stored under a normalized form of its topic, so the
+same topic asked again (in any session, with any casing or word order) is
+answered from SQLite instead of Gemini. Solutions are generated one
+question at a time when first opened and stored next to the question.
+Topic and question words go into an inverted index for keyword search.
+"""
+import os
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+
+
+LIBRARY_PATH = os.path.join(".studybudd", "questions.db")
+TOPIC_WEIGHT = 2  # A search word found in the topic counts for more than one found in a question
+QUESTION_WEIGHT = 1
+STOPWORDS = {
+    "a", "about", "an", "and", "are", "as", "at", "be", "by", "for", "from", "give", "how", "in", "is", "it",
+    "me", "of", "on", "or", "practice", "question", "questions", "some", "the", "to", "what", "with",
+}
+POSSESSIVE = re.compile(r"['\u2019]s\b")
+NUMBERED_LINE = re.compile(r"^\s*(?:\*\*)?(?:Question\s+)?(\d+)[.):]\s*(?:\*\*)?\s*(.*)$", re.I)
+
+
+def words(text):
+    # Single letters and digits are kept, so "World War 1" and "World War 2" get different keys
+    text = POSSESSIVE.sub("", text.lower())
+    return [word for word in re.findall(r"[a-z0-9]+", text) if word not in STOPWORDS]
+
+
+def topic_key(topic):
+    """"Newton's Laws of Motion" and "motion: newton laws" share a key."""
+    return " ".join(sorted(set(words(topic))))
+
+
+def split_questions(text):
+    """Numbered questions from the model's plain-text list; unnumbered lines continue the previous one."""
+    questions = []
+    for line in text.splitlines():
+        match = NUMBERED_LINE.match(line)
+        if match and match.group(2).strip():
+            questions.append(match.group(2).strip())
+        elif questions and line.strip():
+            questions[-1] = f"{questions[-1]}\n{line.strip()}"
+    if not questions and text.strip():
+        questions.append(text.strip())
+    return questions
+
+
+class QuestionLibrary:
+    def __init__(self, path=LIBRARY_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS question_sets (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    topic TEXT NOT NULL,
+                    topic_key TEXT NOT NULL UNIQUE,
+                    question_count INTEGER NOT NULL,
+                    opened INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS questions (
+                    set_id INTEGER NOT NULL REFERENCES question_sets (id) ON DELETE CASCADE,
+                    position INTEGER NOT NULL,
+                    question TEXT NOT NULL,
+                    solution TEXT,
+                    PRIMARY KEY (set_id, position)
+                );
+                CREATE TABLE IF NOT EXISTS terms (
+                    term TEXT NOT NULL,
+                    set_id INTEGER NOT NULL REFERENCES question_sets (id) ON DELETE CASCADE,
+                    weight INTEGER NOT NULL,
+                    PRIMARY KEY (term, set_id)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS idx_terms_set ON terms (set_id);
+                """
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def find(self, topic):
+        """ID of the set saved for this topic, or None."""
+        key = topic_key(topic)
+        if not key:
+            return None
+        with self._connect() as conn:
+            row = conn.execute("SELECT id FROM question_sets WHERE topic_key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def save(self, topic, questions):
+        """Store `questions` for `topic`, replacing an earlier set (and its solutions) for the same key."""
+        key = topic_key(topic) or topic.strip().lower()
+        terms = {term: TOPIC_WEIGHT for term in words(topic)}
+        for question in questions:
+            for term in words(question):
+                terms.setdefault(term, QUESTION_WEIGHT)
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM question_sets WHERE topic_key = ?", (key,))
+            set_id = conn.execute(
+                "INSERT INTO question_sets (topic, topic_key, question_count, created_at) VALUES (?, ?, ?, ?)",
+                (topic.strip(), key, len(questions), time.time()),
+            ).lastrowid
+            conn.executemany(
+                "INSERT INTO questions (set_id, position, question) VALUES (?, ?, ?)",
+                [(set_id, position, question) for position, question in enumerate(questions)],
+            )
+            conn.executemany(
+                "INSERT INTO terms VALUES (?, ?, ?)", [(term, set_id, weight) for term, weight in terms.items()]
+            )
+        return set_id
+
+    def mark_opened(self, set_id):
+        """Count a reuse of the set; often reused sets rank first among equal search matches."""
+        with self._connect() as conn:
+            conn.execute("UPDATE question_sets SET opened = opened + 1 WHERE id = ?", (set_id,))
+
+    def get(self, set_id):
+        """(topic, [(question, solution or None), ...]) or None."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT topic FROM question_sets WHERE id = ?", (set_id,)).fetchone()
+            if row is None:
+                return None
+            questions = conn.execute(
+                "SELECT question, solution FROM questions WHERE set_id = ? ORDER BY position", (set_id,)
+            ).fetchall()
+        return row[0], [tuple(question) for question in questions]
+
+    def save_solution(self, set_id, position, solution):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE questions SET solution = ? WHERE set_id = ? AND position = ?", (solution, set_id, position)
+            )
+
+    def search(self, query, limit=20):
+        """Sets matching the query's words, best first, as (id, topic, questions, solved) tuples.
+
+        The last word also matches as a prefix, so results appear while typing.
+        """
+        query_words = list(dict.fromkeys(words(query)))
+        if not query_words:
+            return []
+        scores = {}
+        with self._connect() as conn:
+            for position, word in enumerate(query_words):
+                if position == len(query_words) - 1:
+                    # Terms are [a-z0-9], all of which sort before "{"
+                    matches = conn.execute(
+                        "SELECT set_id, MAX(weight) FROM terms WHERE term >= ? AND term < ? GROUP BY set_id",
+                        (word, word + "{"),
+                    )
+                else:
+                    matches = conn.execute("SELECT set_id, weight FROM terms WHERE term = ?", (word,))
+                for set_id, weight in matches:
+                    scores[set_id] = scores.get(set_id, 0) + weight
+            if not scores:
+                return []
+            # Enough candidates for `limit` results once ties are broken by how often sets were opened
+            ids = sorted(scores, key=scores.get, reverse=True)[:max(limit * 10, 100)]
+            rows = conn.execute(
+                f"SELECT s.id, s.topic, s.question_count, COUNT(q.solution), s.opened FROM question_sets s "
+                f"LEFT JOIN questions q ON q.set_id = s.id WHERE s.id IN ({', '.join('?' * len(ids))}) GROUP BY s.id",
+                ids,
+            ).fetchall()
+        rows.sort(key=lambda row: (-scores[row[0]], -row[4], -row[0]))
+        return [row[:4] for row in rows[:limit]]
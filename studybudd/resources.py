@@ -0,0 +1,162 @@
+"""Process-wide clients shared across Streamlit sessions and reruns.
+
+Everything here is created once per server process with `st.cache_resource`,
+so a rerun no longer re-reads credentials or rebuilds API clients.
+"""
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+import google.generativeai as genai
+import googlemaps
+import streamlit as st
+from google.auth.transport.requests import Request
+from google.oauth2 import service_account
+
+from studybudd.calendar_sync import build_calendar_service
+from studybudd.config import get_endpoint, load_credentials
+from studybudd.flashcards import DeckStore
+from studybudd.geo_cache import CachedMapsClient, GeoCache
+from studybudd.llm_cache import ResponseCache
+from studybudd.question_library import QuestionLibrary
+from studybudd.tracing import TracedMapsClient
+from studybudd.plan_store import PlanStore
+from studybudd.sync_jobs import SyncJobStore, SyncWorker
+
+
+SERVICE_ACCOUNT_FILE = "google_credentials.json"
+CALENDAR_SCOPES = ["https://www.googleapis.com/auth/calendar"]
+TOKEN_REFRESH_INTERVAL = 60  # seconds between expiry checks
+TOKEN_REFRESH_MARGIN = timedelta(minutes=5)
+
+
+@st.cache_resource
+def get_response_cache():
+    return ResponseCache()
+
+
+@st.cache_resource
+def get_plan_store(xlsx_path):
+    return PlanStore(xlsx_path=xlsx_path)
+
+
+@st.cache_resource
+def get_deck_store():
+    return DeckStore()
+
+
+@st.cache_resource
+def get_question_library():
+    return QuestionLibrary()
+
+
+@st.cache_resource
+def get_sync_worker(_sync_rows):
+    """The single background Calendar sync worker; resumes jobs a restart interrupted."""
+    worker = SyncWorker(SyncJobStore(), _sync_rows)
+    worker.resume_unfinished()
+    return worker
+
+
+@st.cache_resource
+def get_geo_cache():
+    return GeoCache()
+
+
+@st.cache_resource
+def get_maps_client():
+    endpoint = get_endpoint("maps")
+    options = {"base_url": endpoint} if endpoint else {}
+    client = googlemaps.Client(key=load_credentials().get("google_map_api_key"), **options)
+    # Only cache misses reach the traced client
+    return CachedMapsClient(TracedMapsClient(client), get_geo_cache())
+
+
+@st.cache_resource
+def configure_genai():
+    endpoint = get_endpoint("gemini")
+    if endpoint:
+        genai.configure(
+            api_key=load_credentials().get("gemini_api_key"),
+            transport="rest",
+            client_options={"api_endpoint": endpoint},
+        )
+    else:
+        genai.configure(api_key=load_credentials().get("gemini_api_key"))
+    return True
+
+
+def _needs_refresh(credentials):
+    if not credentials.valid or credentials.expiry is None:
+        return True
+    # google-auth stores expiry as a naive UTC datetime
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    return credentials.expiry - now < TOKEN_REFRESH_MARGIN
+
+
+def _refresh_in_background(credentials):
+    def refresh_loop():
+        while True:
+            try:
+                if _needs_refresh(credentials):
+                    credentials.refresh(Request())
+            except Exception as e:
+                print(f"Details: token refresh failed: {e}")
+            time.sleep(TOKEN_REFRESH_INTERVAL)
+
+    threading.Thread(target=refresh_loop, name="calendar-token-refresh", daemon=True).start()
+
+
+@st.cache_resource(show_spinner=False)
+def get_calendar_credentials():
+    credentials = service_account.Credentials.from_service_account_file(
+        SERVICE_ACCOUNT_FILE, scopes=CALENDAR_SCOPES
+    )
+    # Keep a valid token ready so syncs never wait on an OAuth round trip
+    _refresh_in_background(credentials)
+    return credentials
+
+
+class ServicePool:
+    """Reusable Calendar clients; httplib2 connections must not be shared between threads."""
+
+    def __init__(self, factory, size=4):
+        self.factory = factory
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    @contextmanager
+    def get(self):
+        try:
+            service = self._idle.get_nowait()
+        except queue.Empty:
+            service = self.factory()
+        try:
+            yield service
+        finally:
+            try:
+                self._idle.put_nowait(service)
+            except queue.Full:
+                pass
+
+
+@st.cache_resource(show_spinner=False)  # Also created from the sync worker thread
+def get_calendar_pool():
+    endpoint = get_endpoint("calendar")
+    if endpoint:
+        # Local fake Calendar servers are unauthenticated
+        return ServicePool(lambda: build_calendar_service(api_endpoint=f"{endpoint}/calendar/v3/"))
+    # Uses the bundled static discovery document, so no discovery fetch
+    return ServicePool(lambda: build_calendar_service(get_calendar_credentials()))
+
+
+def calendar_batch_uri():
+    """Batch URI for an overridden Calendar endpoint, or None for the real API."""
+    endpoint = get_endpoint("calendar")
+    return f"{endpoint}/batch/calendar/v3" if endpoint else None
+
+
+def calendar_service():
+    """Context manager yielding a pooled Calendar v3 client."""
+    return get_calendar_pool().get()
@@ -0,0 +1,202 @@
+"""Interval index over the study plan, free-slot search and a block scheduler.
+
+Each dated, timed row becomes a (start, end, plan ID) interval in minutes,
+kept in one list sorted by start. An overlap query bisects to the first
+interval that could still be running (no row is longer than the longest
+one indexed) and scans only up to the query's end. That costs O(log n + k)
+plus the rows that start within one longest-interval of the query; the
+longest length is tracked through removals, so one long row that is later
+deleted or shortened does not widen every scan. PlanStore keeps the index
+current on every insert, edit and delete instead of rebuilding it.
+"""
+import threading
+from bisect import bisect_left, insort
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from studybudd.normalize import ISO_DATE_PATTERN, ISO_TIME_PATTERN, parse_date_column, parse_time_column
+
+
+MINUTES_PER_DAY = 24 * 60
+DEFAULT_LENGTH = 60  # Rows without an end time last an hour, as in add_to_study_plan
+DAY_START = 8 * 60
+DAY_END = 22 * 60
+PRIORITY_ORDER = {"High": 0, "Medium": 1, "Low": 2}
+EPOCH = pd.Timestamp("1970-01-01")
+
+
+def to_minutes(moment):
+    """A date/datetime (naive, plan time zone) -> minutes since 1970-01-01."""
+    return int((pd.Timestamp(moment) - EPOCH) // pd.Timedelta(minutes=1))
+
+
+def from_minutes(minutes):
+    """Minutes since 1970-01-01 -> ("YYYY-MM-DD", "HH:MM:SS")."""
+    moment = EPOCH + pd.Timedelta(minutes=int(minutes))
+    return moment.strftime("%Y-%m-%d"), moment.strftime("%H:%M:%S")
+
+
+def _iso(values, pattern, parse):
+    """Values as ISO text; only distinct values that aren't ISO yet go through `parse`."""
+    values = values.astype("string")
+    iso = values.str.fullmatch(pattern).fillna(False)
+    rest = values[~iso & values.notna()]
+    if len(rest):
+        distinct = rest.unique()
+        values = values.copy()
+        values[rest.index] = rest.map(dict(zip(distinct, parse(distinct))))
+    return values
+
+
+def _day_minutes(values):
+    dates = pd.to_datetime(_iso(values, ISO_DATE_PATTERN, parse_date_column), format="%Y-%m-%d", errors="coerce")
+    return ((dates - EPOCH) // pd.Timedelta(minutes=1)).to_numpy(dtype=float)
+
+
+def _clock_minutes(values):
+    text = _iso(values, ISO_TIME_PATTERN, parse_time_column)
+    hours = pd.to_numeric(text.str.slice(0, 2), errors="coerce").to_numpy(dtype=float)
+    minutes = pd.to_numeric(text.str.slice(3, 5), errors="coerce").to_numpy(dtype=float)
+    return np.where((hours < 24) & (minutes < 60), hours * 60 + minutes, np.nan)
+
+
+def row_intervals(df):
+    """(start, end, plan ID) for rows of `df` with a usable Date and Time Start."""
+    if df.empty:
+        return []
+    day = _day_minutes(df["Date"])
+    start = day + _clock_minutes(df["Time Start"])
+    end = day + _clock_minutes(df["Time End"])
+    valid = ~np.isnan(start)
+    end = np.where(np.isnan(end), start + DEFAULT_LENGTH, end)
+    # An end before the start means the activity runs past midnight
+    end = np.where(end <= start, end + MINUTES_PER_DAY, end)
+    ids = df["ID"].to_numpy()
+    return [(int(s), int(e), plan_id) for s, e, plan_id in zip(start[valid], end[valid], ids[valid])]
+
+
+class PlanIntervals:
+    def __init__(self, intervals=(), version=None):
+        self._entries = sorted(intervals)
+        self._by_id = {plan_id: (start, end) for start, end, plan_id in self._entries}
+        # Count of entries per length, so the longest is known again after it is removed
+        self._lengths = Counter(end - start for start, end, _ in self._entries)
+        self._max_length = max(self._lengths, default=0)
+        self._lock = threading.Lock()
+        self.version = version
+
+    @classmethod
+    def from_frame(cls, df, version=None):
+        return cls(row_intervals(df), version)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, plan_id):
+        if plan_id in self._by_id:
+            start, end = self._by_id.pop(plan_id)
+            del self._entries[bisect_left(self._entries, (start, end, plan_id))]
+            length = end - start
+            self._lengths[length] -= 1
+            if not self._lengths[length]:
+                del self._lengths[length]
+                if length == self._max_length:
+                    self._max_length = max(self._lengths, default=0)
+
+    def remove(self, plan_ids):
+        with self._lock:
+            for plan_id in plan_ids:
+                self._remove(plan_id)
+
+    def upsert(self, df):
+        """Re-index rows of `df` (ID, Date, Time Start, Time End); rows without times drop out."""
+        with self._lock:
+            for plan_id in df["ID"]:
+                self._remove(plan_id)
+            for start, end, plan_id in row_intervals(df):
+                insort(self._entries, (start, end, plan_id))
+                self._by_id[plan_id] = (start, end)
+                self._lengths[end - start] += 1
+                self._max_length = max(self._max_length, end - start)
+
+    def overlapping(self, start, end, exclude=None):
+        """(start, end, plan ID) of intervals overlapping [start, end), ordered by start."""
+        with self._lock:
+            # Nothing starting before start - max_length can still be running at `start`
+            low = bisect_left(self._entries, (start - self._max_length,))
+            high = bisect_left(self._entries, (end,))
+            return [entry for entry in self._entries[low:high] if entry[1] > start and entry[2] != exclude]
+
+    def conflicts(self, df):
+        """`{row ID: [overlapping plan IDs]}` for rows of `df` that overlap an indexed activity."""
+        found = {}
+        for start, end, row_id in row_intervals(df):
+            others = [plan_id for _, _, plan_id in self.overlapping(start, end, exclude=row_id)]
+            if others:
+                found[row_id] = others
+        return found
+
+    def free_slots(self, start, end, min_length=1, day_start=DAY_START, day_end=DAY_END):
+        """Free [start, end) gaps of at least `min_length` minutes inside each day's window."""
+        busy = self.overlapping(start, end)
+        slots = []
+        day = start - start % MINUTES_PER_DAY
+        position = 0
+        while day < end:
+            window_start = max(start, day + day_start)
+            window_end = min(end, day + day_end)
+            cursor = window_start
+            # Busy intervals are ordered by start; skip those that ended before this window
+            while position < len(busy) and busy[position][1] <= cursor:
+                position += 1
+            scan = position
+            while scan < len(busy) and busy[scan][0] < window_end:
+                if busy[scan][0] - cursor >= min_length:
+                    slots.append((cursor, busy[scan][0]))
+                cursor = max(cursor, busy[scan][1])
+                scan += 1
+            if window_end - cursor >= min_length:
+                slots.append((cursor, window_end))
+            day += MINUTES_PER_DAY
+        return slots
+
+
+def schedule_blocks(index, blocks, start, day_start=DAY_START, day_end=DAY_END):
+    """Place study blocks into free time, highest priority and earliest deadline first.
+
+    `blocks` are dicts with Event, Minutes, Priority, Deadline (minutes) and
+    optional Notes. Each block takes the earliest free slot that fits before
+    its deadline. Returns (DataFrame of placed rows in plan columns, list of
+    blocks that did not fit).
+    """
+    if not blocks:
+        return pd.DataFrame(columns=["Event", "Date", "Time Start", "Time End", "Priority", "Notes"]), []
+    horizon = max(block["Deadline"] for block in blocks)
+    slots = index.free_slots(start, horizon, 1, day_start, day_end)
+    placed, unplaced = [], []
+    ordered = sorted(blocks, key=lambda block: (PRIORITY_ORDER.get(block["Priority"], 1), block["Deadline"]))
+    for block in ordered:
+        for position, (slot_start, slot_end) in enumerate(slots):
+            if slot_start + block["Minutes"] > block["Deadline"]:
+                unplaced.append(block)
+                break
+            if slot_end - slot_start >= block["Minutes"]:
+                block_end = slot_start + block["Minutes"]
+                slots[position] = (block_end, slot_end)
+                date_text, start_text = from_minutes(slot_start)
+                _, end_text = from_minutes(block_end)
+                placed.append({
+                    "Event": block["Event"],
+                    "Date": date_text,
+                    "Time Start": start_text,
+                    "Time End": end_text,
+                    "Priority": block["Priority"],
+                    "Notes": block.get("Notes") or "Scheduled study block",
+                })
+                break
+        else:
+            unplaced.append(block)
+    placed = pd.DataFrame(placed, columns=["Event", "Date", "Time Start", "Time End", "Priority", "Notes"])
+    return placed.sort_values(["Date", "Time Start"], ignore_index=True), unplaced
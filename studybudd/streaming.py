@@ -0,0 +1,34 @@
+"""Helpers for consuming streamed Gemini text line by line."""
+import re
+
+
+CARD_LINE = re.compile(r"^(?:\d+[.)]\s*)?(Question|Answer)\s*\d*\s*:\s*(.*)$", re.IGNORECASE)
+
+
+def iter_lines(chunks):
+    """Re-split a stream of text chunks into complete lines."""
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split("\n")
+        yield from lines
+    if buffer:
+        yield buffer
+
+
+def iter_flashcards(lines):
+    """Yield {"Question", "Answer"} dicts as soon as each card is complete."""
+    question, answer = None, None
+    for line in lines:
+        match = CARD_LINE.match(line.replace("*", "").strip())
+        if match and match.group(1).lower() == "question":
+            if question and answer:
+                yield {"Question": question, "Answer": answer}
+            question, answer = match.group(2).strip(), None
+        elif match and question:
+            answer = match.group(2).strip()
+        elif answer and line.strip():
+            # Multi-line answers continue until the next card
+            answer = f"{answer} {line.strip()}"
+    if question and answer:
+        yield {"Question": question, "Answer": answer}
@@ -0,0 +1,238 @@
+"""Calendar syncs run as background jobs with per-row status.
+
+Starting a sync snapshots the rows into a job table, so the Streamlit script
+returns immediately and unsaved edits are kept. A single worker thread pushes
+the pending rows in chunks and commits each row's status after its chunk; the
+UI polls the table for progress. Cancelling sets a flag the worker checks
+between chunks, and jobs left queued or running by a restart carry on from
+their first pending row when the worker starts again.
+"""
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import pandas as pd
+
+from studybudd.plan_store import PLAN_COLUMNS, cell_text
+from studybudd.tracing import in_trace_context
+
+
+JOBS_PATH = os.path.join(".studybudd", "sync_jobs.db")
+CHUNK_SIZE = 500
+ACTIVE = ("queued", "running")
+
+
+class SyncJobStore:
+    def __init__(self, path=JOBS_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    label TEXT,
+                    status TEXT NOT NULL,
+                    total INTEGER NOT NULL,
+                    done INTEGER NOT NULL DEFAULT 0,
+                    failed INTEGER NOT NULL DEFAULT 0,
+                    inserted INTEGER NOT NULL DEFAULT 0,
+                    updated INTEGER NOT NULL DEFAULT 0,
+                    skipped INTEGER NOT NULL DEFAULT 0,
+                    cancel_requested INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS job_rows (
+                    job_id INTEGER NOT NULL REFERENCES jobs (id) ON DELETE CASCADE,
+                    position INTEGER NOT NULL,
+                    plan_id TEXT,
+                    row TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    error TEXT,
+                    PRIMARY KEY (job_id, position)
+                );
+                CREATE INDEX IF NOT EXISTS idx_job_rows_status ON job_rows (job_id, status, position);
+                """
+            )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def create(self, df, label=None):
+        """Snapshot the rows of `df` as a queued job and return its ID."""
+        now = time.time()
+        columns = [column for column in PLAN_COLUMNS if column in df.columns]
+        with self._connect() as conn:
+            job_id = conn.execute(
+                "INSERT INTO jobs (label, status, total, created_at, updated_at) VALUES (?, 'queued', ?, ?, ?)",
+                (label, len(df), now, now),
+            ).lastrowid
+            conn.executemany(
+                "INSERT INTO job_rows (job_id, position, plan_id, row) VALUES (?, ?, ?, ?)",
+                [
+                    (job_id, position, cell_text(row.get("ID")), json.dumps({column: cell_text(row[column]) for column in columns}))
+                    for position, (_, row) in enumerate(df.iterrows())
+                ],
+            )
+        return job_id
+
+    def pending(self, job_id, limit=CHUNK_SIZE):
+        """The next pending rows as (positions, DataFrame)."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT position, row FROM job_rows WHERE job_id = ? AND status = 'pending' ORDER BY position LIMIT ?",
+                (job_id, limit),
+            ).fetchall()
+        positions = [row["position"] for row in rows]
+        df = pd.DataFrame([json.loads(row["row"]) for row in rows])
+        return positions, df.reindex(columns=[column for column in PLAN_COLUMNS if column in df.columns])
+
+    def commit_chunk(self, job_id, statuses, result):
+        """Record `(position, status, error)` for a finished chunk and add its counts to the job."""
+        failed = sum(status == "failed" for _, status, _ in statuses)
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE job_rows SET status = ?, error = ? WHERE job_id = ? AND position = ?",
+                [(status, error, job_id, position) for position, status, error in statuses],
+            )
+            conn.execute(
+                "UPDATE jobs SET done = done + ?, failed = failed + ?, inserted = inserted + ?, "
+                "updated = updated + ?, skipped = skipped + ?, updated_at = ? WHERE id = ?",
+                (len(statuses), failed, result["inserted"], result["updated"], result["skipped"], time.time(), job_id),
+            )
+
+    def set_status(self, job_id, status, error=None):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, error, time.time(), job_id),
+            )
+
+    def requeue(self, job_id):
+        """Queue a cancelled or failed job again; its pending rows are kept."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'queued', cancel_requested = 0, error = NULL, updated_at = ? "
+                "WHERE id = ? AND status IN ('cancelled', 'failed')",
+                (time.time(), job_id),
+            )
+        return cursor.rowcount > 0
+
+    def request_cancel(self, job_id):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET cancel_requested = 1, updated_at = ? WHERE id = ? AND status IN ('queued', 'running')",
+                (time.time(), job_id),
+            )
+
+    def cancel_requested(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row[0])
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def recent(self, limit=10):
+        with self._connect() as conn:
+            return [dict(row) for row in conn.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,))]
+
+    def unfinished(self):
+        with self._connect() as conn:
+            return [job_id for (job_id,) in conn.execute(
+                f"SELECT id FROM jobs WHERE status IN ({', '.join('?' * len(ACTIVE))}) ORDER BY id", ACTIVE
+            )]
+
+    def failures(self, job_id, limit=50):
+        """`(plan_id, error)` for failed rows of a job."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT COALESCE(plan_id, json_extract(row, '$.Event')), error FROM job_rows "
+                "WHERE job_id = ? AND status = 'failed' ORDER BY position LIMIT ?",
+                (job_id, limit),
+            ).fetchall()
+        return [tuple(row) for row in rows]
+
+
+class SyncWorker:
+    """Runs sync jobs one at a time on a background thread.
+
+    `sync_rows(df)` pushes a chunk of rows and returns a `CalendarSync.sync`
+    style result; rows it lists as failed are marked failed, the rest done.
+    """
+
+    def __init__(self, jobs, sync_rows, chunk_size=CHUNK_SIZE):
+        self.jobs = jobs
+        self.sync_rows = sync_rows
+        self.chunk_size = chunk_size
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="calendar-sync")
+
+    def submit(self, df, label=None):
+        job_id = self.jobs.create(df, label)
+        self._schedule(job_id)
+        return job_id
+
+    def cancel(self, job_id):
+        self.jobs.request_cancel(job_id)
+
+    def resume(self, job_id):
+        if self.jobs.requeue(job_id):
+            self._schedule(job_id)
+
+    def resume_unfinished(self):
+        """Continue jobs that were queued or running when the process stopped."""
+        for job_id in self.jobs.unfinished():
+            self._schedule(job_id)
+
+    def _schedule(self, job_id):
+        # Keep the submitting page's flow tag on the worker's outbound calls
+        self._executor.submit(in_trace_context(self._run), job_id)
+
+    def _run(self, job_id):
+        self.jobs.set_status(job_id, "running")
+        while True:
+            if self.jobs.cancel_requested(job_id):
+                self.jobs.set_status(job_id, "cancelled")
+                return
+            positions, df = self.jobs.pending(job_id, self.chunk_size)
+            if not positions:
+                self.jobs.set_status(job_id, "done")
+                return
+            try:
+                result = self.sync_rows(df)
+            except Exception as e:
+                # Rows of this chunk stay pending, so resuming retries them
+                print(f"Details: sync job {job_id} failed: {e!r}")
+                self.jobs.set_status(job_id, "failed", str(e) or type(e).__name__)
+                return
+
+            errors = {str(plan_id): str(error) for plan_id, error in result["failed"]}
+            statuses = []
+            for position, (_, row) in zip(positions, df.iterrows()):
+                plan_id = row.get("ID")
+                if not plan_id or pd.isna(plan_id):
+                    statuses.append((position, "failed", errors.get(str(row.get("Event")), "Save the plan before syncing new rows")))
+                elif plan_id in errors:
+                    statuses.append((position, "failed", errors[plan_id]))
+                else:
+                    statuses.append((position, "done", None))
+            self.jobs.commit_chunk(job_id, statuses, result)
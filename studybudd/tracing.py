@@ -0,0 +1,224 @@
+"""Timing and outcome records for every outbound call and plan storage access.
+
+Each Gemini, genai, Maps, Calendar and ipinfo call (and each PlanStore
+operation) becomes a CallRecord tagged with the current menu flow and
+Streamlit rerun. Records are kept in a bounded in-memory buffer for the
+sidebar panel, and running totals back the Prometheus text export.
+"""
+import contextvars
+import functools
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+
+MAX_RECORDS = 5000
+
+_flow = contextvars.ContextVar("studybudd_flow", default=None)
+_session_id = contextvars.ContextVar("studybudd_session_id", default=None)
+_rerun_id = contextvars.ContextVar("studybudd_rerun_id", default=None)
+
+
+@dataclass
+class CallRecord:
+    service: str
+    operation: str
+    flow: Optional[str]
+    session_id: Optional[str]
+    rerun_id: Optional[int]
+    started_at: float
+    latency: float = 0.0
+    status: Optional[str] = None
+    retries: int = 0
+    errors: int = 0
+    items: Optional[int] = None
+    prompt_tokens: Optional[int] = None
+    output_tokens: Optional[int] = None
+
+
+def set_context(flow, session_id=None, rerun_id=None):
+    """Tag calls made from this thread (and pools started with `in_trace_context`) with a flow and rerun."""
+    _flow.set(flow)
+    _session_id.set(session_id)
+    _rerun_id.set(rerun_id)
+
+
+def in_trace_context(fn):
+    """Wrap `fn` so calls on worker threads keep the caller's flow and rerun tags."""
+    context = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        # A context can only be entered by one thread at a time
+        return context.copy().run(fn, *args, **kwargs)
+
+    return wrapper
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Tracer:
+    def __init__(self, max_records=MAX_RECORDS):
+        self._records = deque(maxlen=max_records)
+        self._totals = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, service, operation):
+        """Time the enclosed call; the caller may fill in status, retries, tokens, etc."""
+        record = CallRecord(service, operation, _flow.get(), _session_id.get(), _rerun_id.get(), time.time())
+        started = time.perf_counter()
+        try:
+            yield record
+        except Exception as e:
+            if record.status is None:
+                record.status = type(e).__name__
+            record.errors = max(record.errors, 1)
+            raise
+        finally:
+            record.latency = time.perf_counter() - started
+            if record.status is None:
+                record.status = "ok"
+            self.add(record)
+
+    def add(self, record):
+        record.status = str(record.status)
+        key = (record.flow or "", record.service, record.operation, record.status)
+        with self._lock:
+            self._records.append(record)
+            totals = self._totals.setdefault(key, [0, 0.0, 0, 0, 0, 0])
+            totals[0] += 1
+            totals[1] += record.latency
+            totals[2] += record.retries
+            totals[3] += record.errors
+            totals[4] += record.prompt_tokens or 0
+            totals[5] += record.output_tokens or 0
+
+    def records(self, session_id=None, rerun_id=None):
+        with self._lock:
+            records = list(self._records)
+        if session_id is not None:
+            records = [record for record in records if record.session_id == session_id]
+        if rerun_id is not None:
+            records = [record for record in records if record.rerun_id == rerun_id]
+        return records
+
+    def to_jsonl(self, records=None):
+        records = self.records() if records is None else records
+        return "".join(json.dumps(asdict(record)) + "\n" for record in records)
+
+    def to_prometheus(self):
+        """Process-wide totals in the Prometheus text exposition format."""
+        with self._lock:
+            totals = sorted(self._totals.items())
+        metrics = [
+            ("studybudd_outbound_calls_total", "counter", "Outbound calls and storage operations.", 0),
+            ("studybudd_outbound_call_seconds_total", "counter", "Total time spent in those calls.", 1),
+            ("studybudd_outbound_retries_total", "counter", "Retried attempts inside those calls.", 2),
+            ("studybudd_outbound_errors_total", "counter", "Failed calls or failed items in batches.", 3),
+        ]
+        lines = []
+        for name, kind, help_text, position in metrics:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for (flow, service, operation, status), values in totals:
+                labels = (
+                    f'flow="{_escape_label(flow)}",service="{_escape_label(service)}",'
+                    f'operation="{_escape_label(operation)}",status="{_escape_label(status)}"'
+                )
+                lines.append(f"{name}{{{labels}}} {values[position]:g}")
+
+        lines.append("# HELP studybudd_llm_tokens_total Gemini tokens by direction.")
+        lines.append("# TYPE studybudd_llm_tokens_total counter")
+        for (flow, service, operation, status), values in totals:
+            for kind, value in (("prompt", values[4]), ("output", values[5])):
+                if value:
+                    labels = f'flow="{_escape_label(flow)}",service="{_escape_label(service)}",kind="{kind}"'
+                    lines.append(f"studybudd_llm_tokens_total{{{labels}}} {value}")
+        return "\n".join(lines) + "\n"
+
+
+_tracer = Tracer()
+
+
+def get_tracer():
+    """Process-wide Tracer shared by every session."""
+    return _tracer
+
+
+def traced(service, operation):
+    """Decorator recording each call of the wrapped function as a span."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with get_tracer().span(service, operation):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _token_counts(response):
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return None, None
+    return getattr(usage, "prompt_token_count", None), getattr(usage, "candidates_token_count", None)
+
+
+class TracedModel:
+    """Wraps a `genai.GenerativeModel` so each `generate_content` call is traced."""
+
+    def __init__(self, model, tracer=None):
+        self.model = model
+        self.tracer = tracer or get_tracer()
+
+    def generate_content(self, *args, **kwargs):
+        with self.tracer.span("genai", f"generate_content {self.model.model_name}") as record:
+            response = self.model.generate_content(*args, **kwargs)
+            record.status = 200
+            record.prompt_tokens, record.output_tokens = _token_counts(response)
+            return response
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+
+class TracedMapsClient:
+    """Wraps a `googlemaps.Client` so each API method call is traced.
+
+    A response hook on the client's session counts HTTP attempts per thread,
+    which exposes the retries googlemaps performs internally.
+    """
+
+    def __init__(self, client, tracer=None):
+        self.client = client
+        self.tracer = tracer or get_tracer()
+        self._attempts = threading.local()
+        client.session.hooks["response"].append(self._on_response)
+
+    def _on_response(self, response, *args, **kwargs):
+        self._attempts.count = getattr(self._attempts, "count", 0) + 1
+        self._attempts.status = response.status_code
+
+    def __getattr__(self, name):
+        attribute = getattr(self.client, name)
+        if not callable(attribute):
+            return attribute
+
+        @functools.wraps(attribute)
+        def call(*args, **kwargs):
+            self._attempts.count, self._attempts.status = 0, None
+            with self.tracer.span("maps", name) as record:
+                try:
+                    result = attribute(*args, **kwargs)
+                finally:
+                    record.retries = max(0, self._attempts.count - 1)
+                record.status = self._attempts.status or 200
+                return result
+
+        return call
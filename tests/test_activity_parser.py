@@ -0,0 +1,67 @@
+from datetime import date
+
+import pytest
+
+from studybudd.activity_parser import parse_activity
+
+
+WEDNESDAY = date(2026, 10, 14)
+
+
+@pytest.mark.parametrize(
+    "text, event_name, day, time_start, time_end, priority",
+    [
+        ("Math test tomorrow at 5 pm", "Math test", "2026-10-15", "17:00:00", "18:00:00", "Medium"),
+        ("Physics revision on Monday from 2 to 4", "Physics revision", "2026-10-19", "14:00:00", "16:00:00", "Medium"),
+        ("Essay due 3 May, 9 pm", "Essay", "2027-05-03", "21:00:00", "22:00:00", "Medium"),
+        ("Math test tomorrow at 5 pm, high priority", "Math test", "2026-10-15", "17:00:00", "18:00:00", "High"),
+        ("Quiz Friday at 2 with low priority", "Quiz", "2026-10-16", "14:00:00", "15:00:00", "Low"),
+        ("Group study for chemistry on Friday at 10am", "Group study for chemistry", "2026-10-16", "10:00:00", "11:00:00", "Medium"),
+        ("Biology quiz in two days at 8:30", "Biology quiz", "2026-10-16", "08:30:00", "09:30:00", "Medium"),
+        ("Exam in 2 weeks at 9am", "Exam", "2026-10-28", "09:00:00", "10:00:00", "Medium"),
+        ("Programming lab next Wednesday 14:00 to 16:00", "Programming lab", "2026-10-21", "14:00:00", "16:00:00", "Medium"),
+        ("Review flashcards tonight at 9", "Review flashcards", "2026-10-14", "21:00:00", "22:00:00", "Medium"),
+        ("Statistics assignment due 2025-06-01 noon", "Statistics assignment", "2025-06-01", "12:00:00", "13:00:00", "Medium"),
+        ("Library session on the 12th from 1 to 3 pm", "Library session", "2026-11-12", "13:00:00", "15:00:00", "Medium"),
+        ("Chapter 12 review on Friday at 3pm", "Chapter 12 review", "2026-10-16", "15:00:00", "16:00:00", "Medium"),
+        ("Revise for 2 hours tomorrow at 4pm", "Revise", "2026-10-15", "16:00:00", "18:00:00", "Medium"),
+        ("Study tomorrow at 10pm", "Study", "2026-10-15", "22:00:00", "23:00:00", "Medium"),
+    ],
+)
+def test_reads_common_phrasings(text, event_name, day, time_start, time_end, priority):
+    assert parse_activity(text, WEDNESDAY) == {
+        "event_name": event_name,
+        "date": day,
+        "time_start": time_start,
+        "time_end": time_end,
+        "priority": priority,
+        "notes": "No additional notes",
+    }
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "Math test",
+        "Essay on Friday",
+        "Read chapter 4 of economics this Sunday afternoon",
+        "Gym every Monday at 6pm",
+        # The coming Monday or the one after
+        "Physics revision next Monday from 2 to 4",
+        # "on 12" is probably a date the rules did not read
+        "Math test on 12 tomorrow at 5",
+        "Chemistry lab 2025-06-01 at 14:00 and 2025-06-02",
+        "Essay due 3 May on Friday at 9pm",
+        # Past midnight
+        "Study tomorrow at 11:30 pm",
+        "Study tomorrow from 11pm to 1am",
+        "Study tomorrow from 10pm to midnight",
+    ],
+)
+def test_leaves_ambiguous_input_to_gemini(text):
+    assert parse_activity(text, WEDNESDAY) is None
+
+
+def test_next_weekday_said_on_that_weekday_is_a_week_away():
+    assert parse_activity("Physics revision next Wednesday at 2pm", WEDNESDAY)["date"] == "2026-10-21"
+    assert parse_activity("Physics revision next Wednesday at 2pm", date(2026, 10, 18)) is None
@@ -0,0 +1,96 @@
+from studybudd.bulk_import import parse_csv, parse_ics
+
+
+def calendar(*events):
+    return "BEGIN:VCALENDAR\n" + "".join(f"BEGIN:VEVENT\n{event.strip()}\nEND:VEVENT\n" for event in events) + "END:VCALENDAR\n"
+
+
+def rows(data):
+    return parse_ics(data)[["Date", "Time Start", "Time End"]].values.tolist()
+
+
+def test_utc_repeats_expand_before_moving_to_local_time():
+    # Monday/Wednesday 20:00 UTC is Tuesday/Thursday 04:00 in Kuala Lumpur
+    data = calendar("""
+UID:lecture
+SUMMARY:Lecture
+DTSTART:20250505T200000Z
+DTEND:20250505T210000Z
+RRULE:FREQ=WEEKLY;BYDAY=MO,WE;COUNT=4
+""")
+    assert rows(data) == [
+        ["2025-05-06", "04:00:00", "05:00:00"],
+        ["2025-05-08", "04:00:00", "05:00:00"],
+        ["2025-05-13", "04:00:00", "05:00:00"],
+        ["2025-05-15", "04:00:00", "05:00:00"],
+    ]
+
+
+def test_exdate_matches_the_occurrence_in_its_own_zone():
+    data = calendar("""
+UID:lecture
+SUMMARY:Lecture
+DTSTART:20250505T200000Z
+DTEND:20250505T210000Z
+RRULE:FREQ=WEEKLY;BYDAY=MO,WE;COUNT=4
+EXDATE:20250512T200000Z
+""")
+    assert [row[0] for row in rows(data)] == ["2025-05-06", "2025-05-08", "2025-05-15"]
+
+
+def test_tzid_repeats_follow_daylight_saving_in_their_zone():
+    # New York moves to daylight time on 9 March 2025; the class stays at 9 am there
+    data = calendar("""
+UID:class
+SUMMARY:Class
+DTSTART;TZID=America/New_York:20250305T090000
+DTEND;TZID=America/New_York:20250305T100000
+RRULE:FREQ=WEEKLY;UNTIL=20250312T130000Z
+""")
+    assert rows(data) == [
+        ["2025-03-05", "22:00:00", "23:00:00"],
+        ["2025-03-12", "21:00:00", "22:00:00"],
+    ]
+
+
+def test_floating_times_and_moved_occurrences():
+    data = calendar(
+        """
+UID:tutorial
+SUMMARY:Tutorial
+DTSTART:20250506T100000
+DTEND:20250506T110000
+RRULE:FREQ=DAILY;COUNT=3
+""",
+        """
+UID:tutorial
+RECURRENCE-ID:20250507T100000
+SUMMARY:Tutorial (moved)
+DTSTART:20250507T140000
+DTEND:20250507T150000
+""",
+    )
+    assert rows(data) == [
+        ["2025-05-06", "10:00:00", "11:00:00"],
+        ["2025-05-08", "10:00:00", "11:00:00"],
+        ["2025-05-07", "14:00:00", "15:00:00"],
+    ]
+
+
+def test_ics_event_past_midnight_ends_with_its_day():
+    data = calendar("""
+UID:late
+SUMMARY:Late revision
+DTSTART:20250506T233000
+DTEND:20250507T003000
+""")
+    assert rows(data) == [["2025-05-06", "23:30:00", "23:59:59"]]
+
+
+def test_csv_end_times_do_not_wrap_past_midnight():
+    df = parse_csv("Title,Date,Start,End\nLate,2025-05-06,23:15,\nOvernight,2025-05-06,23:00,01:00\nDay,2025-05-06,10:00,\n")
+    assert df[["Event", "Time Start", "Time End"]].values.tolist() == [
+        ["Late", "23:15:00", "23:59:59"],
+        ["Overnight", "23:00:00", "23:59:59"],
+        ["Day", "10:00:00", "11:00:00"],
+    ]
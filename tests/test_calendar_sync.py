@@ -0,0 +1,138 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from benchmarks.fake_servers import CalendarHandler, CountingServer
+from studybudd.calendar_sync import TIME_ZONE, CalendarSync, SyncState, build_calendar_service, event_id_for
+from studybudd.plan_store import PLAN_COLUMNS, PlanStore
+
+
+CALENDAR_ID = "primary"
+
+
+@pytest.fixture
+def server():
+    server = CountingServer(CalendarHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def service(server):
+    return build_calendar_service(api_endpoint=f"http://127.0.0.1:{server.server_port}/calendar/v3/")
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = PlanStore(str(tmp_path / "plan.db"))
+    store.add_many(pd.DataFrame(
+        [["Math", "2025-05-06", "09:00:00", "10:00:00", "High", "Ch. 1"],
+         ["Physics", "2025-05-06", "11:00:00", "12:00:00", "Medium", "Lab"]],
+        columns=PLAN_COLUMNS[1:],
+    ))
+    return store
+
+
+@pytest.fixture
+def sync(server, service, store, tmp_path):
+    sync = CalendarSync(
+        service, CALENDAR_ID, state=SyncState(str(tmp_path / "sync.db")),
+        batch_uri=f"http://127.0.0.1:{server.server_port}/batch/calendar/v3",
+    )
+    assert sync.sync(store.load())["inserted"] == 2
+    # Later writes must be strictly later than the push
+    time.sleep(0.01)
+    return sync
+
+
+def edit_event(service, plan_id, **fields):
+    service.events().patch(calendarId=CALENDAR_ID, eventId=event_id_for(CALENDAR_ID, plan_id), body=fields).execute()
+
+
+def calendar_event(service, plan_id):
+    events = service.events().list(calendarId=CALENDAR_ID).execute()["items"]
+    return next(event for event in events if event["id"] == event_id_for(CALENDAR_ID, plan_id))
+
+
+def test_own_pushes_coming_back_change_nothing(sync, store):
+    before = store.load()
+    result = sync.pull(store)
+
+    assert (result["full"], result["unchanged"], result["updated"]) == (True, 2, 0)
+    assert store.load().equals(before)
+    assert sync.sync(store.load())["skipped"] == 2
+
+
+def test_calendar_edit_made_after_the_plan_edit_wins(sync, store, service):
+    sync.pull(store)
+    edit_event(
+        service, "ID-1", summary="Math exam",
+        start={"dateTime": "2025-05-06T06:00:00Z"}, end={"dateTime": "2025-05-06T08:00:00Z"},
+    )
+
+    result = sync.pull(store)
+
+    assert (result["full"], result["updated"]) == (False, 1)
+    assert store.load().iloc[0][["Event", "Time Start", "Time End", "Notes"]].tolist() == ["Math exam", "14:00:00", "16:00:00", "Ch. 1"]
+    assert sync.sync(store.load())["skipped"] == 2
+
+
+def test_plan_edit_made_after_the_calendar_edit_wins(sync, store, service):
+    sync.pull(store)
+    edit_event(service, "ID-1", summary="Math exam")
+    time.sleep(0.01)
+    store.update_rows(pd.DataFrame([{"ID": "ID-1", "Event": "Math revision"}]))
+
+    result = sync.pull(store)
+
+    assert (result["kept"], result["updated"]) == (1, 0)
+    assert store.load().iloc[0]["Event"] == "Math revision"
+    # The kept row is pushed again even though it did not change since the last push
+    assert sync.sync(store.load())["updated"] == 1
+    assert calendar_event(service, "ID-1")["summary"] == "Math revision"
+
+
+def test_events_deleted_in_the_calendar_delete_their_rows(sync, store, service):
+    # A full listing leaves out cancelled events, so only an incremental pull sees the delete
+    sync.pull(store)
+    service.events().delete(calendarId=CALENDAR_ID, eventId=event_id_for(CALENDAR_ID, "ID-2")).execute()
+
+    assert sync.pull(store)["deleted"] == 1
+    assert store.load()["ID"].tolist() == ["ID-1"]
+
+
+def test_expired_sync_token_falls_back_to_a_full_listing(sync, store, service):
+    sync.pull(store)
+    sync.state.save_sync_token(CALENDAR_ID, "999")
+    edit_event(service, "ID-2", description="Lab report")
+
+    result = sync.pull(store)
+
+    assert (result["full"], result["updated"], result["unchanged"]) == (True, 1, 1)
+    assert store.load().iloc[1]["Notes"] == "Lab report"
+
+
+def test_events_created_in_the_calendar_are_only_imported_on_request(sync, store, service):
+    tomorrow = (pd.Timestamp.now(tz=TIME_ZONE).normalize() + pd.Timedelta(days=1)).strftime("%Y-%m-%d")
+    service.events().insert(calendarId=CALENDAR_ID, body={
+        "id": "dentist",
+        "summary": "Dentist",
+        "start": {"dateTime": f"{tomorrow}T09:00:00+08:00"},
+        "end": {"dateTime": f"{tomorrow}T10:00:00+08:00"},
+    }).execute()
+
+    assert sync.pull(store)["added"] == 0
+    assert len(store.load()) == 2
+
+    assert sync.import_events(store) == 1
+    assert sync.import_events(store) == 0
+    assert store.load().iloc[2][["ID", "Event", "Date", "Priority"]].tolist() == ["ID-3", "Dentist", tomorrow, "Medium"]
+
+    time.sleep(0.01)
+    service.events().patch(calendarId=CALENDAR_ID, eventId="dentist", body={"summary": "Dentist (moved)"}).execute()
+    assert sync.pull(store)["updated"] == 1
+    assert store.load().iloc[2]["Event"] == "Dentist (moved)"
@@ -0,0 +1,21 @@
+import polyline
+
+from studybudd.maps import ZOOM_HEADROOM, fit_zoom, metres_per_pixel, route_map_html, simplify
+
+
+def test_simplify_keeps_ends_and_corners_only():
+    line = [(0.0, 0.0), (0.0, 0.001), (0.0, 0.002), (0.001, 0.002)]
+    assert simplify(line, 1.0).tolist() == [[0.0, 0.0], [0.0, 0.002], [0.001, 0.002]]
+
+
+def test_route_keeps_bends_that_show_when_zoomed_in():
+    # A straight 10 km route with an 11 m bend: under a pixel at the fitted zoom, several once zoomed in
+    points = [(3.0, round(101.0 + i * 0.001, 3)) for i in range(91)]
+    points[45] = (3.0001, points[45][1])
+    zoom = fit_zoom(points)
+    assert len(simplify(points, metres_per_pixel(3.0, zoom))) == 2
+    assert metres_per_pixel(3.0, zoom + ZOOM_HEADROOM) < 11 / 4
+
+    _, decoded, drawn = route_map_html(polyline.encode(points))
+    assert decoded == 91
+    assert drawn > 2
@@ -0,0 +1,59 @@
+from studybudd.nearby import find_candidates, rank_by_travel_time
+
+
+def place(name, lat, place_id=True):
+    result = {"name": name, "geometry": {"location": {"lat": lat, "lng": 0.0}}}
+    if place_id:
+        result["place_id"] = f"id-{name}"
+    return result
+
+
+class Client:
+    """Nearby Search over fixed places per radius, 20 to a page, plus a Distance Matrix of fixed durations."""
+
+    def __init__(self, places_by_radius=None, durations=None):
+        self.places_by_radius = places_by_radius or {}
+        self.durations = durations or {}
+        self.requests = []
+
+    def places_nearby(self, location=None, radius=None, type=None, page_token=None):
+        self.requests.append(page_token or radius)
+        radius, page = (int(part) for part in page_token.split(":")) if page_token else (radius, 0)
+        places = self.places_by_radius[radius]
+        response = {"results": places[page * 20:(page + 1) * 20]}
+        if (page + 1) * 20 < len(places):
+            response["next_page_token"] = f"{radius}:{page + 1}"
+        return response
+
+    def distance_matrix(self, origins, destinations, mode="driving"):
+        elements = [
+            {"status": "OK", "duration": {"value": self.durations[d], "text": f"{self.durations[d]} s"}, "distance": {"text": "1 km"}}
+            for d in destinations
+        ]
+        return {"rows": [{"elements": elements}]}
+
+
+def test_widens_only_while_the_smaller_radius_ran_out_of_places():
+    # 0.01 degrees of latitude is about 1.1 km
+    client = Client({
+        5000: [place("near", 0.01)],
+        10000: [place("near", 0.01)] + [place(f"far {i}", 0.06 + i * 0.001) for i in range(5)],
+        20000: [],
+    })
+    candidates = find_candidates(client, 0.0, 0.0, "library", radii=(5000, 10000, 20000))
+    assert [candidate["name"] for candidate in candidates] == ["near", "far 0", "far 1", "far 2", "far 3", "far 4"]
+    assert client.requests == [5000, 10000]
+
+
+def test_stops_widening_when_the_page_chain_was_cut_off():
+    client = Client({5000: [place(f"p{i}", 0.2) for i in range(70)], 10000: []})
+    assert find_candidates(client, 0.0, 0.0, "school", radii=(5000, 10000), max_pages=2) == []
+    assert client.requests == [5000, "5000:1"]
+
+
+def test_ranks_places_without_an_id_by_their_coordinates():
+    candidates = [dict(place("a", 0.01), distance=1.0), dict(place("b", 0.02, place_id=False), distance=2.0)]
+    client = Client(durations={"place_id:id-a": 600, "0.02,0.0": 300})
+    ranked = rank_by_travel_time(client, 0.0, 0.0, candidates)
+    assert [candidate["name"] for candidate in ranked] == ["b", "a"]
+    assert ranked[0]["duration"] == 300
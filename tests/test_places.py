@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+from studybudd.places import validate_concurrently, validate_in_batch
+
+
+class Response:
+    def __init__(self, text):
+        self.text = text
+
+
+class Model:
+    """Answers each place's prompt from `replies`, keyed by the place name."""
+
+    def __init__(self, replies):
+        self.replies = replies
+        self.configs = []
+
+    def generate_content(self, prompt, generation_config=None):
+        self.configs.append(generation_config)
+        if prompt.startswith("For each numbered place"):
+            return Response("Sorry, I can't help with that.")
+        name = next(name for name in self.replies if f"'{name}'" in prompt)
+        return Response(self.replies[name])
+
+
+def places(*names):
+    return [{"name": name} for name in names]
+
+
+@pytest.mark.parametrize(
+    "reply, valid",
+    [
+        ('{"valid": true}', True),
+        ('{"valid": false}', False),
+        ('{"valid": "yes"}', False),
+        ("Yes", True),
+        ("yes.", True),
+        ("NO", False),
+        ("no.", False),
+        ("Not sure", False),
+        ("", False),
+    ],
+)
+def test_verdicts(reply, valid):
+    model = Model({"Place": reply})
+    assert validate_concurrently(model, places("Place"), "university") == (places("Place") if valid else [])
+
+
+def test_names_containing_no_are_not_rejected():
+    model = Model({"University of Notre Dame": '{"valid": true}', "Nottingham Trent University": '{"valid": true}'})
+    names = places("University of Notre Dame", "Nottingham Trent University")
+    assert validate_concurrently(model, names, "university") == names
+    assert all(config["response_schema"]["properties"]["valid"]["type"] == "BOOLEAN" for config in model.configs)
+
+
+def test_keeps_result_order_and_stops_at_the_limit():
+    replies = {f"Place {i}": json.dumps({"valid": i % 2 == 0}) for i in range(10)}
+    result = validate_concurrently(Model(replies), places(*replies), "school", limit=3)
+    assert result == places("Place 0", "Place 2", "Place 4")
+
+
+def test_batch_falls_back_to_one_prompt_per_place():
+    model = Model({"A": '{"valid": true}', "B": '{"valid": false}'})
+    assert validate_in_batch(model, places("A", "B"), "college") == places("A")
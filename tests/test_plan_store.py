@@ -0,0 +1,93 @@
+import openpyxl
+import pandas as pd
+import pytest
+
+from studybudd.plan_store import PLAN_COLUMNS, PlanStore, diff_plan, rebase_updates
+
+
+def plan(*rows):
+    return pd.DataFrame([dict(zip(PLAN_COLUMNS[1:], row)) for row in rows], columns=PLAN_COLUMNS[1:])
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = PlanStore(str(tmp_path / "plan.db"))
+    store.add_many(plan(
+        ("Math", "2025-05-06", "09:00:00", "10:00:00", "High", "Ch. 1"),
+        ("Physics", "2025-05-06", "11:00:00", "12:00:00", "Medium", "Lab"),
+    ))
+    return store
+
+
+def test_update_rows_skips_rows_changed_since_they_were_read(store):
+    before = store.load()
+    store.update_rows(before.assign(Notes=["Ch. 2", "Lab"]).iloc[[0]][["ID", "Notes"]])
+
+    edited = before.assign(Notes=["Ch. 3", "Lab report"])
+    store.update_rows(edited[["ID", "Notes"]], expected=before[["ID", "Notes"]])
+
+    assert store.load()["Notes"].tolist() == ["Ch. 2", "Lab report"]
+
+
+def test_update_rows_keeps_the_interval_index_current(store):
+    store.intervals()
+    before = store.load()
+    moved = before.assign(**{"Time Start": ["11:30:00", "11:00:00"], "Time End": ["12:30:00", "12:00:00"]})
+    store.update_rows(moved.iloc[[0]], expected=before.iloc[[0]])
+
+    assert store.intervals().conflicts(moved.iloc[[0]]) == {"ID-1": ["ID-2"]}
+
+
+def test_apply_changes_inserts_updates_and_deletes_together(store):
+    original = store.load()
+    edited = pd.concat([
+        original.iloc[[0]].assign(Priority="Low"),
+        pd.DataFrame([{"ID": None, "Event": "Chemistry", "Date": "2025-05-07", "Time Start": "09:00:00"}]),
+    ], ignore_index=True)
+
+    inserted, updated, deleted = diff_plan(original, edited)
+    assert (updated["ID"].tolist(), deleted, inserted["Event"].tolist()) == (["ID-1"], ["ID-2"], ["Chemistry"])
+    version = store.version()
+    store.apply_changes(inserted, updated, deleted)
+
+    assert store.version() == version + 1
+    assert store.load()[["ID", "Event", "Priority"]].values.tolist() == [
+        ["ID-1", "Math", "Low"],
+        ["ID-3", "Chemistry", None],
+    ]
+
+
+def test_diff_ignores_blank_new_rows_and_unchanged_cells(store):
+    original = store.load()
+    edited = pd.concat([original, pd.DataFrame([{"ID": None}])], ignore_index=True)
+    inserted, updated, deleted = diff_plan(original, edited)
+    assert (inserted.empty, updated.empty, deleted) == (True, True, [])
+
+
+def test_rebase_keeps_cells_changed_elsewhere(store):
+    original = store.load()
+    edited = original.assign(Notes=["Ch. 3", "Lab"])
+    store.update_rows(original.iloc[[0]].assign(Priority="Low"))
+    store.apply_changes(plan(), plan(), ["ID-2"])
+
+    rebased = rebase_updates(original, edited, store.load())
+
+    assert rebased[["ID", "Priority", "Notes"]].values.tolist() == [["ID-1", "Low", "Ch. 3"]]
+
+
+def test_import_gives_repeated_workbook_ids_new_ids(tmp_path):
+    path = tmp_path / "plan.xlsx"
+    wb = openpyxl.Workbook()
+    sheet = wb.active
+    sheet.title = "Study_Plan"
+    sheet.append(PLAN_COLUMNS)
+    sheet.append(["ID-4", "Math", "2025-05-06", "09:00:00", "10:00:00", "High", None])
+    sheet.append(["ID-4", "Physics", "2025-05-06", "11:00:00", "12:00:00", "Low", None])
+    sheet.append([None, "Chemistry", "2025-05-07", None, None, None, None])
+    wb.save(path)
+
+    store = PlanStore(str(tmp_path / "plan.db"), str(path))
+
+    assert store.duplicate_ids == ["ID-4"]
+    assert store.load()[["ID", "Event"]].values.tolist() == [["ID-4", "Math"], ["ID-5", "Physics"], ["ID-6", "Chemistry"]]
+    assert store.import_xlsx(str(path)) == 0
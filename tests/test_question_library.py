@@ -0,0 +1,79 @@
+import pytest
+
+from studybudd.question_library import QuestionLibrary, topic_key
+
+
+@pytest.mark.parametrize(
+    "first, second",
+    [
+        ("Newton's Laws of Motion", "motion: newton laws"),
+        ("Photosynthesis", "  PHOTOSYNTHESIS "),
+        ("Give me practice questions about the French Revolution", "french revolution"),
+    ],
+)
+def test_topic_key_matches_rewordings(first, second):
+    assert topic_key(first) == topic_key(second)
+
+
+@pytest.mark.parametrize(
+    "first, second",
+    [
+        ("World War 1", "World War 2"),
+        ("C programming", "R programming"),
+        ("Vitamin B", "Vitamin C"),
+    ],
+)
+def test_topic_key_keeps_digits_and_single_letters(first, second):
+    assert topic_key(first) != topic_key(second)
+
+
+@pytest.fixture
+def library(tmp_path):
+    return QuestionLibrary(str(tmp_path / "questions.db"))
+
+
+def test_find_returns_the_saved_set(library):
+    set_id = library.save("World War 1", ["When did it start?", "Who fought?"])
+
+    assert library.find("world war 1") == set_id
+    assert library.find("1 World War") == set_id
+    assert library.find("World War 2") is None
+    assert library.get(set_id) == ("World War 1", [("When did it start?", None), ("Who fought?", None)])
+
+
+def test_save_replaces_a_set_with_the_same_key(library):
+    first = library.save("C programming", ["What is a pointer?"])
+    library.save_solution(first, 0, "An address.")
+    second = library.save("programming in C", ["What does malloc do?"])
+
+    assert library.find("C programming") == second
+    assert library.get(first) is None
+    assert library.get(second) == ("programming in C", [("What does malloc do?", None)])
+
+
+def test_search_ranks_topic_words_above_question_words(library):
+    cells = library.save("Cell biology", ["Describe mitosis."])
+    mitosis = library.save("Mitosis", ["Name the phases."])
+    library.save("Algebra", ["Solve x + 2 = 5."])
+
+    results = library.search("mitosis")
+
+    assert [row[0] for row in results] == [mitosis, cells]
+    assert results[0] == (mitosis, "Mitosis", 1, 0)
+
+
+def test_search_matches_the_last_word_as_a_prefix(library):
+    set_id = library.save("Photosynthesis", ["What are the inputs?"])
+    library.save_solution(set_id, 0, "Light, water and carbon dioxide.")
+
+    assert library.search("photo") == [(set_id, "Photosynthesis", 1, 1)]
+    assert library.search("photo algebra") == []
+    assert library.search("the") == []
+
+
+def test_search_breaks_ties_by_times_opened(library):
+    first = library.save("Acids", ["What is pH?"])
+    second = library.save("Bases", ["What is pH?"])
+    library.mark_opened(first)
+
+    assert [row[0] for row in library.search("ph")] == [first, second]
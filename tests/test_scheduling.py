@@ -0,0 +1,105 @@
+import pandas as pd
+import pytest
+
+from studybudd.scheduling import PlanIntervals, from_minutes, schedule_blocks, to_minutes
+
+
+DAY = to_minutes("2025-05-06")
+
+
+def frame(*rows):
+    return pd.DataFrame(rows, columns=["ID", "Date", "Time Start", "Time End"])
+
+
+def at(clock, day=DAY):
+    hours, minutes = map(int, clock.split(":"))
+    return day + hours * 60 + minutes
+
+
+@pytest.fixture
+def index():
+    return PlanIntervals.from_frame(frame(
+        ("ID-1", "2025-05-06", "09:00:00", "10:00:00"),
+        ("ID-2", "2025-05-06", "13:00:00", None),
+        ("ID-3", "2025-05-06", "23:00:00", "01:00:00"),
+    ))
+
+
+@pytest.mark.parametrize(
+    "start, end, expected",
+    [
+        ("08:00:00", "09:00:00", {}),
+        ("10:00:00", "11:00:00", {}),
+        ("09:59:00", "11:00:00", {"new": ["ID-1"]}),
+        ("08:00:00", "11:00:00", {"new": ["ID-1"]}),
+        # No end time lasts an hour
+        ("13:30:00", "13:45:00", {"new": ["ID-2"]}),
+        ("14:00:00", "15:00:00", {}),
+        # Past midnight on either side
+        ("22:00:00", "23:30:00", {"new": ["ID-3"]}),
+    ],
+)
+def test_only_overlapping_times_conflict(index, start, end, expected):
+    assert index.conflicts(frame(("new", "2025-05-06", start, end))) == expected
+
+
+def test_rows_running_past_midnight_block_the_next_morning(index):
+    assert index.conflicts(frame(("new", "2025-05-07", "00:30:00", "02:00:00"))) == {"new": ["ID-3"]}
+    assert index.conflicts(frame(("new", "2025-05-07", "01:00:00", "02:00:00"))) == {}
+
+
+def test_a_row_does_not_conflict_with_itself(index):
+    assert index.conflicts(frame(("ID-1", "2025-05-06", "09:30:00", "10:30:00"))) == {}
+
+
+def test_overlaps_are_found_after_the_longest_row_is_removed(index):
+    index.upsert(frame(("long", "2025-05-01", "08:00:00", "07:00:00")))
+    index.remove(["long"])
+    index.upsert(frame(("ID-1", "2025-05-06", "09:00:00", "12:00:00")))
+
+    assert [plan_id for _, _, plan_id in index.overlapping(at("11:00"), at("11:30"))] == ["ID-1"]
+    assert index.overlapping(at("12:00"), at("12:30")) == []
+
+
+def test_free_slots_stay_inside_each_days_window(index):
+    slots = index.free_slots(DAY, DAY + 2 * 24 * 60)
+
+    assert [(from_minutes(start), from_minutes(end)[1]) for start, end in slots] == [
+        (("2025-05-06", "08:00:00"), "09:00:00"),
+        (("2025-05-06", "10:00:00"), "13:00:00"),
+        (("2025-05-06", "14:00:00"), "22:00:00"),
+        (("2025-05-07", "08:00:00"), "22:00:00"),
+    ]
+
+
+def test_free_slots_drop_gaps_shorter_than_asked(index):
+    index.upsert(frame(("ID-4", "2025-05-06", "08:30:00", "08:45:00")))
+
+    assert index.free_slots(at("08:00"), at("12:00"), min_length=30) == [(at("08:00"), at("08:30")), (at("10:00"), at("12:00"))]
+
+
+def test_free_slots_start_after_a_row_already_running(index):
+    assert index.free_slots(at("09:30"), at("11:00")) == [(at("10:00"), at("11:00"))]
+
+
+def block(event, minutes, priority, deadline):
+    return {"Event": event, "Minutes": minutes, "Priority": priority, "Deadline": deadline}
+
+
+def test_blocks_fill_free_time_by_priority_then_deadline(index):
+    blocks = [
+        block("Low", 60, "Low", at("22:00")),
+        block("Late deadline", 60, "High", at("22:00")),
+        block("Early deadline", 60, "High", at("12:00")),
+        block("Too long", 4 * 60, "High", at("13:00")),
+    ]
+
+    placed, unplaced = schedule_blocks(index, blocks, at("08:00"))
+
+    assert placed[["Event", "Time Start", "Time End"]].values.tolist() == [
+        ["Early deadline", "08:00:00", "09:00:00"],
+        ["Late deadline", "10:00:00", "11:00:00"],
+        ["Low", "11:00:00", "12:00:00"],
+    ]
+    assert [item["Event"] for item in unplaced] == ["Too long"]
+    assert set(placed["Notes"]) == {"Scheduled study block"}
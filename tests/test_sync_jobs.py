@@ -0,0 +1,113 @@
+import time
+
+import pandas as pd
+import pytest
+
+from studybudd.sync_jobs import ACTIVE, SyncJobStore, SyncWorker
+
+
+def rows(count):
+    return pd.DataFrame([
+        {"ID": f"ID-{n}", "Event": f"Event {n}", "Date": "2025-05-06", "Time Start": "09:00:00"}
+        for n in range(1, count + 1)
+    ])
+
+
+def result(df, failed=()):
+    return {"inserted": len(df) - len(failed), "updated": 0, "skipped": 0, "failed": list(failed)}
+
+
+def wait(jobs, job_id):
+    deadline = time.monotonic() + 10
+    while jobs.get(job_id)["status"] in ACTIVE:
+        assert time.monotonic() < deadline, "sync job did not finish"
+        time.sleep(0.01)
+    return jobs.get(job_id)
+
+
+@pytest.fixture
+def jobs(tmp_path):
+    return SyncJobStore(str(tmp_path / "jobs" / "sync_jobs.db"))
+
+
+def test_rows_are_synced_in_chunks_with_their_failures(jobs):
+    chunks = []
+
+    def sync_rows(df):
+        chunks.append(df["ID"].tolist())
+        return result(df, [("ID-4", "Bad date")] if "ID-4" in chunks[-1] else [])
+
+    job = wait(jobs, SyncWorker(jobs, sync_rows, chunk_size=2).submit(rows(5)))
+
+    assert chunks == [["ID-1", "ID-2"], ["ID-3", "ID-4"], ["ID-5"]]
+    assert (job["status"], job["done"], job["failed"], job["inserted"]) == ("done", 5, 1, 4)
+    assert jobs.failures(job["id"]) == [("ID-4", "Bad date")]
+
+
+def test_resume_after_a_failed_chunk_starts_at_the_first_pending_row(jobs):
+    chunks = []
+
+    def sync_rows(df):
+        chunks.append(df["ID"].tolist())
+        if len(chunks) == 2:
+            raise ConnectionError("calendar unreachable")
+        return result(df)
+
+    worker = SyncWorker(jobs, sync_rows, chunk_size=2)
+    job_id = worker.submit(rows(5))
+    job = wait(jobs, job_id)
+    assert (job["status"], job["done"], job["error"]) == ("failed", 2, "calendar unreachable")
+
+    worker.resume(job_id)
+    job = wait(jobs, job_id)
+
+    assert chunks == [["ID-1", "ID-2"], ["ID-3", "ID-4"], ["ID-3", "ID-4"], ["ID-5"]]
+    assert (job["status"], job["done"]) == ("done", 5)
+
+
+def test_cancel_stops_between_chunks_and_resume_finishes(jobs):
+    chunks = []
+
+    def sync_rows(df):
+        chunks.append(df["ID"].tolist())
+        if len(chunks) == 1:
+            # The job's ID may not be returned to this test yet
+            for running in jobs.unfinished():
+                worker.cancel(running)
+        return result(df)
+
+    worker = SyncWorker(jobs, sync_rows, chunk_size=2)
+    job_id = worker.submit(rows(5))
+    job = wait(jobs, job_id)
+    assert (job["status"], job["done"], chunks) == ("cancelled", 2, [["ID-1", "ID-2"]])
+
+    worker.resume(job_id)
+    job = wait(jobs, job_id)
+
+    assert chunks[1:] == [["ID-3", "ID-4"], ["ID-5"]]
+    assert (job["status"], job["done"]) == ("done", 5)
+
+
+def test_jobs_left_running_by_a_restart_carry_on(jobs):
+    job_id = jobs.create(rows(3))
+    jobs.set_status(job_id, "running")
+    jobs.commit_chunk(job_id, [(0, "done", None)], result(rows(1)))
+    chunks = []
+
+    def sync_rows(df):
+        chunks.append(df["ID"].tolist())
+        return result(df)
+
+    SyncWorker(jobs, sync_rows).resume_unfinished()
+    job = wait(jobs, job_id)
+
+    assert chunks == [["ID-2", "ID-3"]]
+    assert (job["status"], job["done"]) == ("done", 3)
+
+
+def test_rows_without_an_id_fail_instead_of_syncing(jobs):
+    df = pd.concat([rows(1), pd.DataFrame([{"ID": None, "Event": "Unsaved"}])], ignore_index=True)
+
+    job = wait(jobs, SyncWorker(jobs, result).submit(df))
+
+    assert jobs.failures(job["id"]) == [("Unsaved", "Save the plan before syncing new rows")]